@@ -0,0 +1,320 @@
+'''
+Benchmarks for the degree planner, run from the src folder
+
+    python benchmark.py                 runs every benchmark
+    python benchmark.py -b <benchmark>  runs a single benchmark
+    python benchmark.py -n <repeats>    number of timed repetitions (default 20)
+'''
+
+import sys
+import random
+import logging
+import timeit
+import tempfile
+import shutil
+from datetime import datetime
+
+from degree_planner.planner import Planner
+from degree_planner.io.output import Output
+from degree_planner.dp.degree import total_unfulfilled_slots
+from degree_planner.dp.degree import total_filled_slots
+from degree_planner.dp.degree import FULFILLMENT_ENGINES
+from degree_planner.dp.degree import course_classes
+from degree_planner.math.profiler import Profiler
+from degree_planner.dp.match_table import Match_Table
+from degree_planner.dp.match_table import match_table_key
+from degree_planner.dp.degree import Degree
+from degree_planner.dp.template import Template
+from degree_planner.dp.course import Course
+
+# transcripts taken from test.py's recommender test, plus a heavy one for a student near graduation
+TRANSCRIPTS = {
+    'user1': ['csci 4100 machine learning from data', 'ecse 4850 introduction to deep learning', 'csci 4270 computational vision',
+        'ecse 6480 adaptive systems and reinforcement learning', 'csci 4350 data science', 'math 2400 introduction to differential equations'],
+    'stress': ['csci 1200 data structures', 'csci 4430 programming languages', 'csci 2300 introduction to algorithms',
+        'csci 4100 machine learning from data', 'csci 2500 computer organization'],
+    'heavy': ['csci 1200 data structures', 'csci 2200 foundations of computer science', 'csci 2300 introduction to algorithms',
+        'csci 2500 computer organization', 'csci 2600 principles of software', 'csci 4430 programming languages',
+        'csci 4210 operating systems', 'csci 4100 machine learning from data', 'csci 4270 computational vision',
+        'csci 4350 data science', 'csci 4380 database systems', 'csci 4440 software design and documentation',
+        'csci 4560 numerical computing', 'math 1020 calculus ii', 'math 2400 introduction to differential equations',
+        'math 4040 foundations of mathematics', 'phys 1200 physics ii', 'phys 1100 physics i', 'biol 1010 introduction to biology',
+        'arts 1050 art history', 'arts 4090 3d animation', 'arts 2220 introduction to 3d modeling'],
+}
+
+
+def load_planner(match_table_folder:str) -> Planner:
+    planner = Planner(io=Output(Output.OUT.NONE), enable_tensorflow=False, match_table_folder=match_table_folder)
+    planner.import_data()
+    return planner
+
+
+def transcript(planner:Planner, name:str) -> set:
+    courses = set()
+    for course_name in TRANSCRIPTS.get(name):
+        course = planner.catalog.get_course(course_name)
+        if course is not None:
+            courses.add(course)
+    return courses
+
+
+def time_call(function, repeats:int) -> float:
+    '''
+    returns the best time per call in milliseconds
+    '''
+    return min(timeit.repeat(function, number=1, repeat=repeats)) * 1000
+
+
+def benchmark_compact_sets(planner:Planner, repeats:int):
+    '''
+    python sets against bitsets for fulfillment sets on the computer science degree
+    '''
+    degree = planner.catalog.get_degree('computer science')
+    print(f"{'transcript'.ljust(12)}{'courses'.ljust(10)}{'set (ms)'.ljust(12)}{'bitset (ms)'.ljust(14)}{'speedup'.ljust(10)}same result")
+    for name in TRANSCRIPTS.keys():
+        courses = transcript(planner, name)
+        set_result = degree.fulfillment(courses, compact=False)
+        bitset_result = degree.fulfillment(courses, compact=True)
+        same = (total_unfulfilled_slots(set_result) == total_unfulfilled_slots(bitset_result)
+            and total_filled_slots(set_result) == total_filled_slots(bitset_result))
+
+        set_time = time_call(lambda: degree.fulfillment(courses, compact=False, cached=False), repeats)
+        bitset_time = time_call(lambda: degree.fulfillment(courses, compact=True, cached=False), repeats)
+        print(f'{name.ljust(12)}{str(len(courses)).ljust(10)}{f"{set_time:.3f}".ljust(12)}{f"{bitset_time:.3f}".ljust(14)}{f"{set_time / bitset_time:.2f}x".ljust(10)}{same}')
+
+
+def benchmark_engines(planner:Planner, repeats:int):
+    '''
+    fulfillment engines on the computer science degree, time in ms (unfulfilled slots / filled slots)
+    '''
+    degree = planner.catalog.get_degree('computer science')
+    print(f"{'transcript'.ljust(12)}{'courses'.ljust(10)}" + ''.join([engine.ljust(24) for engine in FULFILLMENT_ENGINES]))
+    for name in TRANSCRIPTS.keys():
+        courses = transcript(planner, name)
+        line = f'{name.ljust(12)}{str(len(courses)).ljust(10)}'
+        for engine in FULFILLMENT_ENGINES:
+            result = degree.fulfillment(courses, engine=engine)
+            engine_time = time_call(lambda: degree.fulfillment(courses, engine=engine, cached=False), repeats)
+            line += f'{engine_time:.3f} ({total_unfulfilled_slots(result)} / {total_filled_slots(result)})'.ljust(24)
+        print(line)
+
+
+def benchmark_classes(planner:Planner, repeats:int):
+    '''
+    taken courses against classes of courses wanted by the same templates on the computer science degree, time of the weighted engine
+    '''
+    degree = planner.catalog.get_degree('computer science')
+    print(f"{'transcript'.ljust(12)}{'courses'.ljust(10)}{'classes'.ljust(10)}weighted (ms)")
+    for name in TRANSCRIPTS.keys():
+        courses = transcript(planner, name)
+        max_fulfillments = dict()
+        for possibilities in degree.max_fulfillment_possibilities(courses):
+            max_fulfillments.update({possibilities[0].get_template():possibilities[0]})
+        classes = course_classes(max_fulfillments, courses)
+        weighted_time = time_call(lambda: degree.fulfillment(courses, engine='weighted', cached=False), repeats)
+        print(f'{name.ljust(12)}{str(len(courses)).ljust(10)}{str(len(classes)).ljust(10)}{weighted_time:.3f}')
+
+
+def benchmark_parallel(planner:Planner, repeats:int):
+    '''
+    serial against process pool computation of wildcard combinations on the computer science degree
+    '''
+    degree = planner.catalog.get_degree('computer science')
+    print(f"{'transcript'.ljust(12)}{'combinations'.ljust(14)}{'serial (ms)'.ljust(14)}{'2 workers'.ljust(12)}{'4 workers'.ljust(12)}same result")
+    for name in TRANSCRIPTS.keys():
+        courses = transcript(planner, name)
+        serial_result = degree.fulfillment(courses, workers=0)
+        parallel_result = degree.fulfillment(courses, workers=4)
+        same = all([serial_result.get(template).get_fulfillment_set() == parallel_result.get(template).get_fulfillment_set() for template in serial_result.keys()])
+
+        line = f'{name.ljust(12)}{str(len(degree.generate_template_combinations(courses))).ljust(14)}'
+        for workers in (0, 2, 4):
+            line += f'{time_call(lambda: degree.fulfillment(courses, workers=workers, cached=False), repeats):.3f}'.ljust(14 if workers == 0 else 12)
+        print(line + str(same))
+
+
+def benchmark_cache(planner:Planner, repeats:int):
+    '''
+    fulfillment of a cohort of 200 students sharing the transcripts above in shuffled order, with and without the result cache
+    '''
+    degree = planner.catalog.get_degree('computer science')
+    random.seed(0)
+    cohort = list()
+    for i in range(200):
+        courses = list(transcript(planner, random.choice(list(TRANSCRIPTS.keys()))))
+        random.shuffle(courses)
+        cohort.append(courses)
+
+    uncached_time = time_call(lambda: [degree.fulfillment(set(courses), cached=False) for courses in cohort], 1)
+    degree.cache.clear()
+    degree.cache.hits = 0
+    degree.cache.misses = 0
+    cached_time = time_call(lambda: [degree.fulfillment(set(courses)) for courses in cohort], 1)
+    print(f"{'uncached (ms)'.ljust(16)}{'cached (ms)'.ljust(14)}{'speedup'.ljust(10)}cache")
+    print(f'{f"{uncached_time:.3f}".ljust(16)}{f"{cached_time:.3f}".ljust(14)}{f"{uncached_time / cached_time:.2f}x".ljust(10)}{degree.cache.stats()}')
+
+
+def benchmark_audit(planner:Planner, repeats:int):
+    '''
+    Planner.audit_many over a cohort of 1000 students with 4 random courses from each transcript above, in audits/sec
+    '''
+    random.seed(0)
+    cohort = list()
+    for i in range(1000):
+        course_names = list()
+        for name in TRANSCRIPTS.keys():
+            course_names.extend(random.sample(TRANSCRIPTS.get(name), 4))
+        cohort.append((i, 'computer science', course_names))
+
+    print(f"{'workers'.ljust(10)}{'seconds'.ljust(10)}audits/sec")
+    for workers in (0, 2, 4):
+        planner.catalog.get_degree('computer science').cache.clear()
+        report = planner.audit_many(cohort, workers=workers)
+        seconds = report.get('seconds')
+        print(f"{str(workers).ljust(10)}{f'{seconds:.3f}'.ljust(10)}{report.get('audits per second'):.1f}")
+
+
+def benchmark_rank(planner:Planner, repeats:int):
+    '''
+    Planner.rank_degrees over every degree of the catalog for the transcripts above
+    '''
+    print(f"{'transcript'.ljust(12)}{'degrees'.ljust(10)}{'serial (ms)'.ljust(14)}{'2 workers'.ljust(12)}closest degree")
+    for name in TRANSCRIPTS.keys():
+        courses = transcript(planner, name)
+        ranking = planner.rank_degrees(courses)
+        line = f'{name.ljust(12)}{str(len(ranking)).ljust(10)}'
+        for workers in (0, 2):
+            line += f'{time_call(lambda: planner.rank_degrees(courses, workers=workers), repeats):.3f}'.ljust(14 if workers == 0 else 12)
+        print(line + f"{ranking[0].get('degree')} ({ranking[0].get('unfulfilled')} unfulfilled)")
+
+
+def benchmark_profile(planner:Planner, repeats:int):
+    '''
+    phases of the computer science degree fulfillment over every transcript above, profiles of every run merged per engine
+    '''
+    degree = planner.catalog.get_degree('computer science')
+    for engine in FULFILLMENT_ENGINES:
+        total = Profiler()
+        for name in TRANSCRIPTS.keys():
+            courses = transcript(planner, name)
+            for i in range(repeats):
+                profiler = Profiler()
+                degree.fulfillment(courses, engine=engine, cached=False, profiler=profiler)
+                total.merge(profiler)
+        print(f'\n{engine} engine, {repeats} runs of {len(TRANSCRIPTS)} transcripts')
+        print(total)
+
+    print(f"{'transcript'.ljust(12)}{'off (ms)'.ljust(12)}{'on (ms)'.ljust(12)}overhead")
+    for name in TRANSCRIPTS.keys():
+        courses = transcript(planner, name)
+        off_time = time_call(lambda: degree.fulfillment(courses, cached=False), repeats)
+        on_time = time_call(lambda: degree.fulfillment(courses, cached=False, profiler=Profiler()), repeats)
+        print(f'{name.ljust(12)}{f"{off_time:.3f}".ljust(12)}{f"{on_time:.3f}".ljust(12)}{(on_time / off_time - 1) * 100:.1f}%')
+
+
+def benchmark_tables(planner:Planner, repeats:int):
+    '''
+    match tables of the computer science degree: keying, loading and compiling them, and recommendations reading them
+    '''
+    degree = planner.catalog.get_degree('computer science')
+    courses = list(planner.catalog.courses())
+    table = planner.catalog.match_table(degree)
+    course_names = {course.unique_name:course for course in courses}
+    key_time = time_call(lambda: match_table_key(courses, degree), repeats)
+    compile_time = time_call(lambda: Match_Table(table.key).compile(planner.catalog, degree), repeats)
+    line = f'key {key_time:.3f} ms, compile {compile_time:.3f} ms'
+    if planner.catalog.match_table_folder is not None:
+        load_time = time_call(lambda: Match_Table.load(planner.catalog.match_table_folder, table.key, course_names), repeats)
+        line += f', load {load_time:.3f} ms'
+    print(line)
+
+    print(f"{'transcript'.ljust(12)}recommend (ms)")
+    for name in TRANSCRIPTS.keys():
+        taken = transcript(planner, name)
+        fulfillment = degree.fulfillment(taken)
+        print(f'{name.ljust(12)}{time_call(lambda: degree.recommend(taken, best_fulfillments=fulfillment), repeats):.3f}')
+
+
+def synthetic_degree(templates:int) -> tuple:
+    '''
+    degree of templates each wanting two courses of one bin, and a tenth fewer courses than wanted that
+    are each in two bins, so every template competes with a few others and most steal paths are long
+
+    Returns:
+        degree (Degree): the synthetic degree
+        taken_courses (set): every course
+    '''
+    degree = Degree(f'synthetic {templates}')
+    degree.io = Output(Output.OUT.NONE)
+    for i in range(templates):
+        degree.add_template(Template(f't{i}', [f'bin.{i}'], i % 5 == 4, 2))
+    taken_courses = set()
+    for j in range(2 * templates - templates // 10):
+        course = Course(f'c{j}', 'SYN', 1000)
+        course.add_attribute(f'bin.{j % templates}')
+        course.add_attribute(f'bin.{(7 * j + 1) % templates}')
+        taken_courses.add(course)
+    return degree, taken_courses
+
+
+def benchmark_graphs(planner:Planner, repeats:int):
+    '''
+    steal engine on synthetic degrees of 50 to 500 templates solved as one component, steal graphs stored as grids and as
+    adjacency dicts. Grids take seconds at the larger sizes, so runs are capped at 3
+    '''
+    print(f"{'templates'.ljust(12)}{'graphs'.ljust(10)}{'ms'.ljust(12)}{'nr steal ms'.ljust(14)}unfulfilled")
+    for templates in (50, 100, 200, 500):
+        degree, taken_courses = synthetic_degree(templates)
+        degree.decompose = False
+        for sparse in (False, True):
+            degree.sparse_graphs = sparse
+            profiler = Profiler()
+            fulfillment = degree.fulfillment(taken_courses, cached=False, profiler=profiler)
+            steal_time = sum([entry.get('ms') for path, entry in profiler.report().get('phases').items() if path.endswith('nr steal')])
+            fulfillment_time = time_call(lambda: degree.fulfillment(taken_courses, cached=False), min(repeats, 3))
+            print(f"{str(templates).ljust(12)}{('sparse' if sparse else 'dense').ljust(10)}{f'{fulfillment_time:.3f}'.ljust(12)}"
+                f"{f'{steal_time:.3f}'.ljust(14)}{total_unfulfilled_slots(fulfillment)}")
+
+
+BENCHMARKS = {
+    'compact': benchmark_compact_sets,
+    'engine': benchmark_engines,
+    'classes': benchmark_classes,
+    'parallel': benchmark_parallel,
+    'cache': benchmark_cache,
+    'audit': benchmark_audit,
+    'rank': benchmark_rank,
+    'profile': benchmark_profile,
+    'tables': benchmark_tables,
+    'graphs': benchmark_graphs,
+}
+
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    repeats = 20
+    selected = list(BENCHMARKS.keys())
+    for i in range(len(sys.argv)):
+        if sys.argv[i] == '-n' and i + 1 < len(sys.argv):
+            repeats = int(sys.argv[i + 1])
+        if sys.argv[i] == '-b' and i + 1 < len(sys.argv):
+            selected = [sys.argv[i + 1]]
+
+    print(f'beginning benchmarks {datetime.now()}')
+    # match tables go to a folder of their own so benchmarks never touch the user's cache
+    match_table_folder = tempfile.mkdtemp()
+    try:
+        planner = load_planner(match_table_folder)
+        for name in selected:
+            benchmark = BENCHMARKS.get(name, None)
+            if benchmark is None:
+                print(f'invalid benchmark {name}, choose from {list(BENCHMARKS.keys())}')
+                continue
+            print(f'\n{name}: {benchmark.__doc__.strip()}')
+            benchmark(planner, repeats)
+    finally:
+        shutil.rmtree(match_table_folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,12 @@ import json
 
 from .course import Course
 from .degree import Degree
+from .template import Template
+from .match_table import Match_Table
+from .match_table import match_table_key
 from ..math.search import Search
+from ..math.attribute_index import Attribute_Index
+from ..math.bitset import Bitset_Index
 from ..recommender.recommender import Recommender
 from ..io.output import Output
 
@@ -29,18 +34,33 @@ class Catalog():
         self.tags = dict() # { subject : [tags] }
         self.recommender = Recommender(self, enable_tensorflow=enable_tensorflow)
         self.searcher = Search()
+        self.attribute_index = Attribute_Index() # {attribute : courses} for template matching
+        self.course_index = Bitset_Index() # dense course ids for compact course sets
+        self.match_tables = dict() # {degree name : Match_Table} of catalog wide template matches
+        self.match_table_folder = None # folder match tables are persisted to, None to keep them in memory only
+        self.version = 0 # increases every time courses are added or removed
         self.debug = Output(Output.OUT.DEBUG)
 
     def reindex(self, recompute_cache=True):
         '''
         1) computes search index
-        2) recaches recommender if tensorflow is enabled
+        2) computes attribute index
+        3) invalidates the match table of every degree, they are compiled again when first used
+        4) recaches recommender if tensorflow is enabled
         '''
         self.debug.info('starting search indexing')
         self.searcher.update_items(self.course_names())
         self.searcher.generate_index()
         self.debug.info('finished search indexing')
 
+        self.debug.info('starting attribute indexing')
+        self.attribute_index.clear()
+        for course in self.__course_list.values():
+            self.attribute_index.add_item(course, course.attributes)
+        self.debug.info('finished attribute indexing')
+
+        self.version += 1 # attributes may have changed in place
+
         if recompute_cache:
             self.debug.info('starting recommender reindex')
             self.recommender.recache()
@@ -54,20 +74,31 @@ class Catalog():
             for course in courses:
                 self.add_course(course)
             return
+        replaced = self.__course_list.get(courses.unique_name, None)
+        if replaced is not None:
+            self.attribute_index.remove_item(replaced, replaced.attributes)
+            self.course_index.remove(replaced)
         self.__course_list.update({courses.unique_name:courses})
+        self.attribute_index.add_item(courses, courses.attributes)
+        self.course_index.add(courses)
+        self.version += 1
 
     def remove_course(self, courses):
         '''
         may take a list of courses or a single course object/name
         '''
-        if hasattr(courses, '__iter__'):
+        if hasattr(courses, '__iter__') and not isinstance(courses, str):
             for course in courses:
                 self.remove_course(course)
             return
         if isinstance(courses, str):
-            self.__course_list.pop(courses, None)
+            removed = self.__course_list.pop(courses, None)
         else:
-            self.__course_list.pop(courses.unique_name, None)
+            removed = self.__course_list.pop(courses.unique_name, None)
+        if removed is not None:
+            self.attribute_index.remove_item(removed, removed.attributes)
+            self.course_index.remove(removed)
+            self.version += 1
 
     def add_degree(self, degree:Degree):
         '''
@@ -100,6 +131,53 @@ class Catalog():
             self.debug.warn(f"CATALOG ERROR: non unique course name found: {str(name)}")
         return self.__course_list.get(name[0], None)
 
+    def course_match(self, template:Template, courses=None) -> list:
+        '''
+        Finds all courses that fulfills the template using the attribute index
+
+        Parameters:
+            template (Template): template to match
+            courses (iterable): pool of courses to match from, None for the entire catalog
+
+        Returns:
+            fulfillment_sets (list): same as Template.get_course_match
+        '''
+        return template.get_course_match(courses, self.attribute_index)
+
+    def match_table(self, degree:Degree) -> Match_Table:
+        '''
+        catalog wide matches of every template of the degree. The table is compiled again when the
+        catalog or the degree changed since, or loaded from match_table_folder if it was compiled for
+        the same contents before
+
+        Parameters:
+            degree (Degree): degree to get the table of
+
+        Returns:
+            table (Match_Table): table of the degree
+        '''
+        table = self.match_tables.get(degree.name, None)
+        version = (self.version, degree.version())
+        if table is not None and table.version == version:
+            return table
+
+        key = match_table_key(self.__course_list.values(), degree)
+        table = None
+        if self.match_table_folder is not None:
+            table = Match_Table.load(self.match_table_folder, key, self.__course_list)
+        if table is None:
+            table = Match_Table(key)
+            table.compile(self, degree)
+            if self.match_table_folder is not None:
+                # a folder that can't be written to only costs compiling again next time
+                try:
+                    table.store(self.match_table_folder)
+                except OSError as e:
+                    self.debug.warn(f'could not store match table {key} in {self.match_table_folder}: {e}')
+        table.version = version
+        self.match_tables.update({degree.name:table})
+        return table
+
     def search(self, course_name:str) -> str:
         '''
         returns a list of course names that matches input
@@ -2,6 +2,8 @@ import re
 from ..user.user import User
 from ..io.output import Output
 from ..dp.command import Command
+from ..math.budget import budget_deadline
+from ..math.profiler import Profiler
 
 class command_handler():
 
@@ -176,8 +178,19 @@ class command_handler():
                 else:
                     io.store(f"{schedule.name} Fulfillment")
                     io.store(f"  taken courses: {[str(e) for e in schedule.courses()]}")
-                    fulfillment = schedule.degree.fulfillment(schedule.courses())
+                    if 'profile' in command.arguments:
+                        # computed in full instead of from the cache or the last fulfillment, so every phase is profiled
+                        profiler = Profiler()
+                        fulfillment = schedule.degree.fulfillment(schedule.courses(), cached=False, budget_ms=planner.budget_ms, profiler=profiler)
+                    else:
+                        profiler = None
+                        fulfillment = schedule.fulfillment(budget_ms=planner.budget_ms)
                     io.store(Output.print_fulfillment(fulfillment))
+                    if fulfillment.truncated:
+                        io.store(f"  stopped at the {planner.budget_ms} ms time limit after {fulfillment.explored} combinations, a better fulfillment may exist")
+                    if profiler is not None:
+                        io.store(f"{schedule.name} Fulfillment Profile")
+                        io.store(profiler.report() if io.output_type == Output.OUTTYPE.JSON else str(profiler))
                     io.view_cache()
                 user.command_queue.task_done()
                 continue
@@ -187,8 +200,13 @@ class command_handler():
                     io.print(f"no degree specified")
                 else:
                     io.store(f"{schedule.name} Recommended path of completion:")
-                    recommendation = schedule.degree.recommend(schedule.courses(), custom_tags=command.arguments)
+                    # fulfillment and ranking share the time budget
+                    deadline = budget_deadline(planner.budget_ms)
+                    fulfillment = schedule.fulfillment(deadline=deadline)
+                    recommendation = schedule.degree.recommend(schedule.courses(), best_fulfillments=fulfillment, custom_tags=command.arguments, deadline=deadline)
                     io.store(Output.print_recommendation(recommendation))
+                    if fulfillment.truncated or recommendation.truncated:
+                        io.store(f"  stopped at the {planner.budget_ms} ms time limit, recommendations may be incomplete")
                     io.view_cache()
 
                 user.command_queue.task_done()
@@ -132,6 +132,12 @@ class Course():
             return attributes
         return [attributes]
 
+    def has_attribute(self, attr:str) -> bool:
+        '''
+        whether attr matches any attribute within self, same as attr(attr) is not None
+        '''
+        return self.attributes.has_attr(attr)
+
     def get_attributes_by_head(self, attr) -> list:
         return self.attributes.get_attributes_by_head(attr)
 
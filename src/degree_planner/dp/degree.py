@@ -5,6 +5,8 @@ contains degree class and a set of helper functions
 import json
 import timeit
 import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from .template import Template
 from ..math.graph import Graph
@@ -12,14 +14,27 @@ from ..math.graph import Backwards_Overlap
 from ..math.array_math import array_functions as af
 from ..io.output import Output
 from ..math.sorting import sorting
+from ..math.bitset import Bitset
+from ..math.bitset import Bitset_Index
+from ..math.flow import Flow_Network
+from ..math.flow import Cost_Flow_Network
+from ..math.lru_cache import LRU_Cache
+from ..math.budget import Budgeted_Result
+from ..math.budget import budget_deadline
+from ..math.budget import budget_expired
+from ..math.profiler import Profiler
 from .course import Course
 from .fulfillment_status import Fulfillment_Status
+from .fulfillment_table import Fulfillment_Table
+from .fulfillment_table import fulfillment_table
 
 class Bind_Type(Enum):
     NR = False
     R = True
     ALL = 2 # must be distinct in value since False gets converted to 1 in some instances
 
+FULFILLMENT_ENGINES = ('steal', 'flow', 'weighted')
+
 class Degree():
     '''
     Stores a list of rules, inserted in order of importance
@@ -37,6 +52,33 @@ class Degree():
         self.catalog = catalog
         self.io = Output(Output.OUT.CONSOLE, auto_clear=True)
 
+        # store fulfillment sets as bitsets over the catalog's course ids instead of python sets
+        self.compact = False
+
+        # how courses are assigned to non replacement templates, one of FULFILLMENT_ENGINES
+        self.engine = 'steal'
+
+        # number of processes wildcard combinations are spread over, 0 or 1 to compute them in this process
+        self.workers = 0
+        self.chunk_size = 8 # combinations sent to a process at a time
+
+        # solve templates that share no taken courses separately, see template_components
+        self.decompose = True
+
+        # store steal graphs as adjacency dicts instead of grids, each template connects to few others
+        self.sparse_graphs = True
+
+        # records phase times and counts of every fulfillment when enabled, a profiler given to a
+        # fulfillment call is used for that call instead
+        self.profiler = Profiler(enabled=False)
+
+        # fulfillment results by (template version, catalog version, engine, taken course names and attribute versions), stored as
+        # snapshots since callers may modify the statuses they get back, with the combinations they took
+        self.cache = LRU_Cache(size=256)
+        self.template_version = 0
+        self.template_signature = tuple()
+        self.template_stamp = None # version of every template when template_signature was computed
+
         self.MAX_IMPORTANCE = 1000 # essentially the maximum number of templates possible
 
 
@@ -48,6 +90,7 @@ class Degree():
             template.importance = self.MAX_IMPORTANCE
         else:
             template.importance = self.templates[-1].importance - 1
+        template.compile()
         self.templates.append(template)
 
     def remove_template(self, template:Template):
@@ -62,6 +105,36 @@ class Degree():
         return None
 
 
+    def course_match(self, template:Template, courses=None) -> list:
+        '''
+        Template.get_course_match through the catalog's attribute index when this degree belongs to a
+        catalog. courses may be None to match against the entire catalog.
+        '''
+        if self.catalog is None:
+            return template.get_course_match(courses)
+        return self.catalog.course_match(template, courses)
+
+    def catalog_match(self, template:Template) -> list:
+        '''
+        course_match of the template as it was before wildcards were replaced, named '<name> original' and
+        requiring one course, over the entire catalog. Read from the catalog's match table when this degree
+        belongs to a catalog, the fulfillment sets are new sets either way
+        '''
+        specifications = template.original_specifications if template.original_specifications is not None else template.specifications
+        original = Template(f'{template.name} original', specifications=list(specifications), replacement=template.replacement, courses_required=1)
+        if self.catalog is None:
+            return self.course_match(original)
+        return self.catalog.match_table(self).get_course_match(self.catalog, original)
+
+    def course_index(self) -> Bitset_Index:
+        '''
+        index used for compact course sets, shared with the catalog when there is one
+        '''
+        if self.catalog is None:
+            return Bitset_Index()
+        return self.catalog.course_index
+
+
     ##############################################################################################
     # fulfillment computation
     ##############################################################################################
@@ -70,36 +143,97 @@ class Degree():
         '''
         generates a list of all possible template combinations resulted from wildcard usage
         '''
-        # max fulfillment set for every template, including wildcards
+        max_fulfillment_possibilities = self.max_fulfillment_possibilities(taken_courses)
+        all_template_combinations = list()
+        for combo in self.template_combinations(max_fulfillment_possibilities):
+            all_template_combinations.append([fulfillment_status.get_template() for fulfillment_status in combo])
+        return all_template_combinations
+
+    def max_fulfillment_possibilities(self, taken_courses, matches:dict=None) -> list:
+        '''
+        max fulfillment set for every template, one list per template with an entry for every
+        template that can result from its wildcards
+
+        Parameters:
+            taken_courses (set): courses to match
+            matches (dict): {specifications : [(wildcard free specifications, courses)]} of templates
+                matched before, over taken_courses or any larger set of courses. Templates with the same
+                specifications, in this degree or another one, are matched once and the results added
+        '''
+        if matches is None:
+            for template in self.templates:
+                self.profiler.count('matches', template=template)
+            return [self.course_match(template, taken_courses) for template in self.templates]
+
         max_fulfillment_possibilities = list()
         for template in self.templates:
-            max_fulfillment_possibilities.append(template.get_course_match(taken_courses))
+            key = tuple(template.specifications)
+            if key not in matches:
+                self.profiler.count('matches', template=template)
+                possibilities = self.course_match(template, taken_courses)
+                matches.update({key:[(tuple(e.get_template().specifications), e.get_fulfillment_set()) for e in possibilities]})
+                max_fulfillment_possibilities.append(possibilities)
+                continue
 
-        # if template contains wildcards, this is how many templates can result from the wildcard
-        bound_array = [len(e) for e in max_fulfillment_possibilities]
+            self.profiler.count('matches shared', template=template)
+            if template.original_specifications is None:
+                template.original_specifications = list(template.specifications)
+            possibilities = list()
+            for specifications, courses in matches.get(key):
+                match = template if list(specifications) == template.specifications else template.derive(specifications)
+                possibilities.append(Fulfillment_Status(match, template.courses_required, set([course for course in courses if course in taken_courses])))
+            max_fulfillment_possibilities.append(possibilities)
+        return max_fulfillment_possibilities
+
+    def template_combinations(self, max_fulfillment_possibilities:list, prune=None):
+        '''
+        Lazily generates every combination of wildcard templates as a list of their max fulfillments,
+        in the same order as af.generate_combinatorics (the first template varies the fastest)
 
-        # all possible combinations using all generated templates
-        combos = af.generate_combinatorics(bound_array, 1)
-        all_template_combinations = list()
+        Combinations are built from the last template to the first, and a partial combination is
+        skipped entirely if prune says none of its completions can beat the best fulfillment found so far.
 
-        for combo in combos:
-            templates_to_use = []
+        Parameters:
+            max_fulfillment_possibilities (list): from max_fulfillment_possibilities
+            prune (function): prune(lower_unfulfilled, upper_filled) -> bool, called with the fewest
+                unfulfilled slots and the most filled slots any completion can reach. None to never prune
 
-            # generates the combination of templates to use
-            for i in range(0, len(combo)):
-                # gets the fulfillment status to use based on the number in combo
-                fulfillment_status = max_fulfillment_possibilities[i][combo[i] - 1]
-                templates_to_use.append(fulfillment_status.get_template())
-            all_template_combinations.append(templates_to_use)
+        Yields:
+            combo (list): one max fulfillment status per template
+        '''
+        if prune is None:
+            for combo in af.iterate_combinatorics([len(e) for e in max_fulfillment_possibilities], 0):
+                yield [max_fulfillment_possibilities[i][combo[i]] for i in range(0, len(combo))]
+            return
 
-        return all_template_combinations
+        # best case of the templates that are not chosen yet, templates [0, i) are left when choosing template i
+        lower_unfulfilled = [0]
+        upper_filled = [0]
+        for possibilities in max_fulfillment_possibilities:
+            lower_unfulfilled.append(lower_unfulfilled[-1] + min([e.unfulfilled_count() for e in possibilities]))
+            upper_filled.append(upper_filled[-1] + max([e.get_actual_count() for e in possibilities]))
+
+        combo = [None] * len(max_fulfillment_possibilities)
+        def choose(i, unfulfilled, filled):
+            if i < 0:
+                yield list(combo)
+                return
+            for fulfillment_status in max_fulfillment_possibilities[i]:
+                combo_unfulfilled = unfulfilled + fulfillment_status.unfulfilled_count()
+                combo_filled = filled + fulfillment_status.get_actual_count()
+                if prune(combo_unfulfilled + lower_unfulfilled[i], combo_filled + upper_filled[i]):
+                    continue
+                combo[i] = fulfillment_status
+                yield from choose(i - 1, combo_unfulfilled, combo_filled)
+
+        yield from choose(len(max_fulfillment_possibilities) - 1, 0, 0)
 
 
     ##############################################################################################
     # MAIN FULFILLMENT FUNCTION
     ##############################################################################################
 
-    def fulfillment(self, taken_courses:set) -> dict:
+    def fulfillment(self, taken_courses:set, compact:bool=None, engine:str=None, workers:int=None, cached:bool=True, budget_ms:float=None, deadline:float=None, matches:dict=None, profiler:Profiler=None) -> Budgeted_Result:
         '''
         Generates the best fulfillment set by assigning courses to the templates stored along with
         each degree.
@@ -111,96 +245,537 @@ class Degree():
         the concentration that provided the best fulfillment, and would have an attribute such as
         [concentration.ai].)
 
+        Templates that share no taken courses can't affect each other, so unless self.decompose is False,
+        every connected component of templates (see template_components) is solved on its own and only
+        branches over its own wildcards. The component results are merged in order of importance. The search
+        always runs to completion instead of stopping at the first combination that fulfills every template,
+        so solving by components and solving the whole degree give the same fulfillment.
+
+        With a budget, no more combinations are started once the deadline passes and the best fulfillment
+        found so far is returned. At least one combination of every component is always computed, and one
+        that already started is finished, so the deadline can be overrun by the time of a combination (a
+        chunk of them with workers).
+
         parameters:
             taken_courses (set): all courses that is to be used to generate the fulfillment sets
+            compact (bool): store fulfillment sets as bitsets, defaults to self.compact. The returned
+                fulfillment statuses behave the same either way
+            engine (str): how courses are assigned to non replacement templates, defaults to self.engine
+                'steal': first come first serve fill followed by stealing along bfs paths
+                'flow': maximum flow, fills the most required slots possible, favoring important templates
+                'weighted': heuristic, importance weighted minimum cost flows over every template, replacement
+                    included. It can leave slots unfulfilled that the other engines fill, see template_weighted_fill
+            workers (int): number of processes to compute wildcard combinations in, defaults to self.workers.
+                The result is the same as computing them in this process
+            cached (bool): look the result up in and store it to self.cache. Only the set of taken courses
+                matters, so transcripts with the same courses in different semesters share an entry. Components
+                are also cached by the courses they want, so transcripts that only differ in one component
+                reuse the others. Fulfillments cut short by the deadline aren't cached
+            budget_ms (float): milliseconds the search may take, None for no limit
+            deadline (float): timeit.default_timer time the search must end by, None for no limit. The
+                earlier of deadline and budget_ms is used
+            matches (dict): template matches shared with other calls, see max_fulfillment_possibilities
+            profiler (Profiler): records this call instead of self.profiler, which records every call when
+                enabled. Phases are matching, decomposition and the search over combinations, with every
+                stage of every combination inside it. Counts include matches, combinations, bfs runs, course
+                moves and graphs built, per template where they belong to one
 
         returns:
-            all_fulfillment (dict): {template : Fulfillment_set}
+            all_fulfillment (Budgeted_Result): {template : Fulfillment_set}
                 template is the template evaluated, with all wildcard tokens replaced by the best token
                 fulfillment_set objects contain the courses that fulfill that template
+                optimal is True if every combination was computed or pruned, truncated if the deadline
+                stopped the search, explored is the number of combinations computed, or that computing it took
+                if it came from the cache (cached)
         '''
+        if profiler is not None:
+            previous_profiler = self.profiler
+            self.profiler = profiler
+            try:
+                return self.fulfillment(taken_courses, compact, engine, workers, cached, budget_ms, deadline, matches)
+            finally:
+                self.profiler = previous_profiler
+
         start = timeit.default_timer()
-        # all fulfillment sets based on each possible combination of templates resulted from wildcard templates
-        potential_fulfillments = list()
+        deadline = budget_deadline(budget_ms, deadline)
+
+        if compact is None:
+            compact = self.compact
+        index = self.course_index() if compact else None
+
+        if engine is None:
+            engine = self.engine
+        if engine not in FULFILLMENT_ENGINES:
+            raise ValueError(f'unknown fulfillment engine {engine}, choose from {FULFILLMENT_ENGINES}')
+
+        if index is not None:
+            # ids are handed out in the same order no matter which process computes which combination
+            index.mask(taken_courses)
+
+        # courses are keyed by name and the version of their attributes, so attributes changed in place
+        # miss the cache even when the catalog isn't reindexed or there is no catalog
+        version = self.version()
+        catalog_version = self.catalog.version if self.catalog is not None else None
+        key = (version, catalog_version, engine, frozenset([(course.unique_name, course.attributes.version) for course in taken_courses]))
+        if cached:
+            entry = self.cache.get(key)
+            if entry is not None:
+                snapshot, combinations = entry
+                self.profiler.count('cache hits')
+                self.io.info(f'\nfulfillment runtime: {timeit.default_timer() - start}, cached\n')
+                return Budgeted_Result(restore_fulfillment(snapshot, index), explored=combinations, cached=True)
+
+        if workers is None:
+            workers = self.workers
+
+        with self.profiler.phase('match'):
+            max_fulfillment_possibilities = self.max_fulfillment_possibilities(taken_courses, matches)
+        with self.profiler.phase('components'):
+            components = self.template_components(max_fulfillment_possibilities) if self.decompose else [list(range(len(self.templates)))]
+        if len(components) == 1:
+            best_fulfillment, combinations, truncated = self.solve_fulfillment(taken_courses, max_fulfillment_possibilities, index, engine, workers, deadline)
+        else:
+            # templates of different components share no courses, each component is solved and cached on its own
+            # and only branches over its own wildcards
+            best_fulfillment = dict()
+            combinations = 0
+            truncated = False
+            for component in components:
+                component_possibilities = [max_fulfillment_possibilities[i] for i in component]
+                component_courses = set()
+                for possibilities in component_possibilities:
+                    for max_fulfillment in possibilities:
+                        component_courses.update(max_fulfillment.get_fulfillment_set())
+
+                component_key = (version, catalog_version, engine, tuple([self.templates[i].name for i in component]), frozenset([(course.unique_name, course.attributes.version) for course in component_courses]))
+                entry = self.cache.get(component_key) if cached else None
+                if entry is not None:
+                    snapshot, component_combinations = entry
+                    self.profiler.count('cache hits')
+                    best_fulfillment.update(restore_fulfillment(snapshot, index))
+                    combinations += component_combinations
+                    continue
+                component_fulfillment, component_combinations, component_truncated = self.solve_fulfillment(component_courses, component_possibilities, index, engine, workers, deadline)
+                combinations += component_combinations
+                truncated = truncated or component_truncated
+                if cached and not component_truncated:
+                    self.cache.put(component_key, (snapshot_fulfillment(component_fulfillment), component_combinations))
+                best_fulfillment.update(component_fulfillment)
+            best_fulfillment = {template:best_fulfillment.get(template) for template in sorted(best_fulfillment.keys(), key=lambda template: template.importance, reverse=True)}
 
-        
+        end = timeit.default_timer()
+        self.io.info(f'\nfulfillment runtime: {end - start}, {combinations} combinations computed over {len(components)} components'
+            + (', stopped at the deadline\n' if truncated else '\n'))
+        if cached and not truncated:
+            self.cache.put(key, (snapshot_fulfillment(best_fulfillment), combinations))
+        return Budgeted_Result(best_fulfillment, not truncated, truncated, combinations)
 
-        for template_set in self.generate_template_combinations(taken_courses):
 
-            # all courses that fulfills each template
-            max_fulfillments = dict()
-            for template in template_set:
-                max_fulfillments.update({template:template.get_course_match(taken_courses)[0]})
+    def solve_fulfillment(self, taken_courses:set, max_fulfillment_possibilities:list, index:Bitset_Index, engine:str, workers:int, deadline:float=None) -> tuple:
+        '''
+        best fulfillment over every wildcard combination of the templates in max_fulfillment_possibilities,
+        see fulfillment
+
+        No combination is started after deadline once one has been computed.
+
+        Returns:
+            best_fulfillment ({Template:Fulfillment_Status}): fulfillment status of every template
+            combinations (int): number of combinations computed
+            truncated (bool): whether the deadline stopped the search
+        '''
+        combination_count = 1
+        for possibilities in max_fulfillment_possibilities:
+            combination_count *= len(possibilities)
+
+        if workers > 1 and combination_count > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            with self.profiler.phase('search'):
+                return self.parallel_fulfillment(taken_courses, max_fulfillment_possibilities, index, engine, workers, deadline)
+
+        # branch and bound over the combinations of templates resulted from wildcard templates, a combination
+        # is only computed if it can have fewer unfulfilled slots than the best, or as many and more filled slots
+        best_fulfillment = None
+        best_unfulfilled = 0
+        best_filled = 0
+        def prune(lower_unfulfilled:int, upper_filled:int) -> bool:
+            return best_fulfillment is not None and (lower_unfulfilled > best_unfulfilled
+                or (lower_unfulfilled == best_unfulfilled and upper_filled <= best_filled))
+
+        combinations = 0
+        truncated = False
+        shared = dict() if combination_count > 1 else None # stages combinations compute the same way, see combination_fulfillment
+        # time in the search outside of its combinations is spent choosing and comparing them
+        with self.profiler.phase('search'):
+            for combo in self.template_combinations(max_fulfillment_possibilities, prune):
+                if best_fulfillment is not None and budget_expired(deadline):
+                    truncated = True
+                    break
+                combinations += 1
+                self.profiler.count('combinations')
+                with self.profiler.phase('combination'):
+                    fulfillment = self.evaluate_combination(combo, index, engine, shared)
+
+                # checks all fulfillment sets and keep the best one, the first one found wins ties
+                if best_fulfillment is None or total_unfulfilled_slots(fulfillment) < best_unfulfilled:
+                    best_fulfillment = fulfillment
+                elif total_unfulfilled_slots(fulfillment) == best_unfulfilled and total_filled_slots(fulfillment) > best_filled:
+                    best_fulfillment = fulfillment
+                best_unfulfilled = total_unfulfilled_slots(best_fulfillment)
+                best_filled = total_filled_slots(best_fulfillment)
+
+        return best_fulfillment, combinations, truncated
+
+
+    def template_components(self, max_fulfillment_possibilities:list) -> list:
+        '''
+        connected components of templates, two templates are connected when any of their possible max
+        fulfillments share a course. Templates of different components can't take courses from each other,
+        so their fulfillments don't depend on each other
+
+        Returns:
+            components ([[int]]): positions of the templates of each component in self.templates, each in
+                order and components in order of their first template
+        '''
+        parent = list(range(len(max_fulfillment_possibilities)))
+        def find(i:int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        owner = dict() # {course : first template wanting it}
+        for i, possibilities in enumerate(max_fulfillment_possibilities):
+            for max_fulfillment in possibilities:
+                for course in max_fulfillment.get_fulfillment_set():
+                    j = owner.setdefault(course, i)
+                    if find(i) != find(j):
+                        parent[find(i)] = find(j)
+
+        components = dict() # {root : template positions}
+        for i in range(len(max_fulfillment_possibilities)):
+            components.setdefault(find(i), list()).append(i)
+        return list(components.values())
+
+
+    def evaluate_combination(self, combo:list, index:Bitset_Index, engine:str, shared:dict=None) -> dict:
+        '''
+        computes the fulfillment of one combination from template_combinations
+
+        Parameters:
+            combo (list): max fulfillment status of every template
+            index (Bitset_Index): index for compact course sets, None for python sets
+            engine (str): one of FULFILLMENT_ENGINES
+            shared (dict): passed on to combination_fulfillment
+
+        Returns:
+            all_fulfillment ({Template:Fulfillment_Status}): fulfillment status of every template
+        '''
+        # all courses that fulfills each template
+        max_fulfillments = Fulfillment_Table()
+        for max_fulfillment in combo:
+            course_set = copy.copy(max_fulfillment.get_fulfillment_set())
+            if index is not None:
+                course_set = Bitset(index, course_set)
+            max_fulfillments.update({max_fulfillment.get_template():Fulfillment_Status(max_fulfillment.get_template(), max_fulfillment.get_required_count(), course_set)})
+
+        return self.combination_fulfillment([e.get_template() for e in combo], max_fulfillments, engine, shared)
+
+
+    def parallel_fulfillment(self, taken_courses:set, max_fulfillment_possibilities:list, index:Bitset_Index, engine:str, workers:int, deadline:float=None) -> tuple:
+        '''
+        Computes the wildcard combinations in a pool of forked processes, chunk_size combinations at a time.
+        Processes only send back the template and course names of each fulfillment, which are reduced here
+        in the order of the combinations so the best one is picked exactly as it is when computed serially.
+        Once deadline passes, chunks that haven't started
+        are cancelled and the ones running are waited for. Processes profile their own chunks, so the phase
+        times of combinations add up over the processes.
+
+        Returns:
+            best_fulfillment ({Template:Fulfillment_Status}): same as fulfillment
+            combinations (int): number of combinations computed
+            truncated (bool): whether the deadline stopped the search
+        '''
+        global parallel_state
+
+        # forked processes inherit the degree and matches instead of having them pickled
+        parallel_state = (self, max_fulfillment_possibilities, index, engine)
+        combos = af.iterate_combinatorics([len(e) for e in max_fulfillment_possibilities], 0)
+        chunks = list()
+        for combo in combos:
+            if not len(chunks) or len(chunks[-1]) == self.chunk_size:
+                chunks.append(list())
+            chunks[-1].append(combo)
+
+        best = None # (combo, unfulfilled, filled, fulfillment names)
+        combinations = 0
+        truncated = False
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+                futures = [executor.submit(fulfill_combinations, chunk) for chunk in chunks]
+                for future in futures:
+                    results, profiler = future.result()
+                    if profiler is not None:
+                        self.profiler.merge(profiler, self.profiler.stack[-1] if len(self.profiler.stack) else None)
+                    for result in results:
+                        combinations += 1
+                        if best is None or result[1] < best[1] or (result[1] == best[1] and result[2] > best[2]):
+                            best = result
+                    if future is not futures[-1] and budget_expired(deadline):
+                        truncated = True
+                    if truncated:
+                        for remaining in futures:
+                            remaining.cancel()
+                        break
+        finally:
+            parallel_state = None
+
+        # rebuild the best fulfillment out of the names
+        combo, unfulfilled, filled, fulfillment_names = best
+        templates = {max_fulfillment_possibilities[i][combo[i]].get_template().name:max_fulfillment_possibilities[i][combo[i]].get_template() for i in range(0, len(combo))}
+        courses = {course.unique_name:course for course in taken_courses}
+        best_fulfillment = dict()
+        for template_name, course_names in fulfillment_names:
+            template = templates.get(template_name)
+            course_set = [courses.get(course_name) for course_name in course_names]
+            course_set = set(course_set) if index is None else Bitset(index, course_set)
+            best_fulfillment.update({template:Fulfillment_Status(template, template.courses_required, course_set)})
+        return best_fulfillment, combinations, truncated
+
+
+    def relevant(self, course:Course) -> bool:
+        '''
+        whether the course can fulfill any template of this degree, courses that can't never change a fulfillment
+        '''
+        return any([template.get_predicate().evaluate(course)[0] for template in self.templates])
+
+    def signature(self) -> tuple:
+        '''
+        everything about the templates that fulfillment depends on, changes whenever the rules change
+        '''
+        return tuple([(template.name, tuple(template.specifications), template.replacement, template.courses_required) for template in self.templates])
+
+    def version(self) -> int:
+        '''
+        increases every time the templates are found to have changed, clearing cached fulfillments. Templates
+        may be modified in place, so the signature is computed again whenever the version of a template changed
+        '''
+        stamp = tuple([(id(template), template.version) for template in self.templates])
+        if stamp == self.template_stamp:
+            return self.template_version
+        self.template_stamp = stamp
+        signature = self.signature()
+        if signature != self.template_signature:
+            self.template_signature = signature
+            self.template_version += 1
+            self.cache.clear()
+        return self.template_version
+
+    def can_improve(self, taken_courses:set, unfulfilled:int, filled:int, deadline:float=None) -> bool:
+        '''
+        whether any combination of wildcard templates could have a fulfillment with fewer unfulfilled slots, or as
+        many and more filled slots. Combinations are bounded the same way fulfillment prunes them, and those left
+        are bounded again per course: a course fills at most every replacement template that wants it, or a
+        single slot if only non replacement templates want it. Once deadline passes nothing more can be proven,
+        so it is True
+        '''
+        def prune(lower_unfulfilled:int, upper_filled:int) -> bool:
+            return lower_unfulfilled > unfulfilled or (lower_unfulfilled == unfulfilled and upper_filled <= filled)
+
+        for combo in self.template_combinations(self.max_fulfillment_possibilities(taken_courses), prune):
+            if budget_expired(deadline):
+                return True
+            bindings = dict() # {course : [replacement bindings, non replacement bindings]}
+            for fulfillment_status in combo:
+                for course in fulfillment_status.get_fulfillment_set():
+                    bindings.setdefault(course, [0, 0])[0 if fulfillment_status.get_template().replacement else 1] += 1
+            upper_filled = sum([max(r_count, min(nr_count, 1)) for r_count, nr_count in bindings.values()])
+            if not prune(sum([e.unfulfilled_count() for e in combo]), upper_filled):
+                return True
+        return False
 
-            Output.visualize('degree', max_fulfillments, 'max fulfillment')
+    def repair_fulfillment(self, fulfillment:dict, taken_courses:set, added:set, removed:set, deadline:float=None) -> Budgeted_Result:
+        '''
+        Updates a previous fulfillment after courses were added or removed by local moves instead of
+        computing it again. Templates that lost a removed course are refilled from unused courses, added
+        courses are placed directly or through a one step augmenting move (a template gives up a course to
+        an unfulfilled template and takes the added course instead), and unused courses are handed out last.
+
+        The repair is only returned if can_improve proves no wildcard combination can have fewer unfulfilled
+        or more filled slots, so a full fulfillment can't score better. Course choices among equally good
+        fulfillments may differ.
 
-            all_fulfillment = dict()
+        Parameters:
+            fulfillment ({Template:Fulfillment_Status}): previous result of fulfillment, not modified
+            taken_courses (set): all courses now taken
+            added (set): courses taken since the previous fulfillment
+            removed (set): courses no longer taken since the previous fulfillment
+            deadline (float): timeit.default_timer time the proof must end by, None for no limit
 
+        Returns:
+            all_fulfillment (Budgeted_Result): {Template:Fulfillment_Status} repaired fulfillment, optimal like a
+                full one. None if it could not be proven as good as a full fulfillment before the deadline
+        '''
+        all_fulfillment = Fulfillment_Table()
+        for template, status in fulfillment.items():
+            all_fulfillment.update({template:Fulfillment_Status(template, status.get_required_count(), copy.copy(status.get_fulfillment_set()))})
+        templates = sorted(all_fulfillment.keys(), key=lambda template: template.importance, reverse=True)
+
+        for course in removed:
+            lost = [template for template in templates if all_fulfillment.get(template).remove_fulfillment_course(course)]
+            for template in lost:
+                for replacement in sorted(taken_courses, key=lambda course: course.unique_name):
+                    if all_fulfillment.get(template).fulfilled() and not template.replacement:
+                        break
+                    if course_available(all_fulfillment, template, replacement):
+                        all_fulfillment.get(template).add_fulfillment_course(replacement)
+
+        for course in sorted(added, key=lambda course: course.unique_name):
+            place_course(all_fulfillment, templates, course)
+
+        for course in sorted(taken_courses, key=lambda course: course.unique_name):
+            if not num_bindings(all_fulfillment, course):
+                place_course(all_fulfillment, templates, course)
+
+        if self.can_improve(taken_courses, total_unfulfilled_slots(all_fulfillment), total_filled_slots(all_fulfillment), deadline):
+            return None
+        return Budgeted_Result(all_fulfillment)
+
+
+    def combination_fulfillment(self, template_set:list, max_fulfillments:dict, engine:str, shared:dict=None) -> dict:
+        '''
+        assigns courses to one combination of wildcard free templates
+
+        Combinations of the same degree mostly differ in a few wildcard templates. The non replacement stage
+        of the steal engine only depends on the non replacement templates and on how many replacement templates
+        want each of their courses, so with shared it is computed once per such key and later combinations start
+        from a copy of its result.
+
+        Parameters:
+            template_set (list): templates in order of importance
+            max_fulfillments ({Template:Fulfillment_Status}): all taken courses that can possibly fulfill each template
+            engine (str): one of FULFILLMENT_ENGINES, see fulfillment
+            shared (dict): {stage key : snapshot} kept between combinations of the same fulfillment call, None to
+                compute every stage
+
+        Returns:
+            all_fulfillment ({Template:Fulfillment_Status}): fulfillment status of every template
+        '''
+        Output.visualize('degree', max_fulfillments, 'max fulfillment')
+
+        if engine == 'weighted':
             '''
-            NR TEMPLATE FIRST COME FIRST SERVE FILL
+            ALL TEMPLATES IMPORTANCE WEIGHTED MINIMUM COST FLOWS
             '''
-            for template in template_set:
-                if template.replacement:
-                    continue
-                all_fulfillment.update({template:self.template_fill(template, all_fulfillment, max_fulfillments)})
+            with self.profiler.phase('weighted fill'):
+                all_fulfillment = self.template_weighted_fill(template_set, max_fulfillments)
 
-            self.io.debug(f'after NR fulfillment: {Output.print_fulfillment(all_fulfillment)}')
+            Output.visualize('degree', all_fulfillment, 'completed fulfillment calculations')
+            return all_fulfillment
 
+        # both tables share rows so binding questions compare them with integer masks
+        if not isinstance(max_fulfillments, Fulfillment_Table):
+            max_fulfillments = Fulfillment_Table(max_fulfillments)
+        all_fulfillment = Fulfillment_Table(rows=max_fulfillments.rows)
+        nr_key = self.nr_stage_key(template_set, max_fulfillments) if shared is not None and engine == 'steal' else None
+
+        if engine == 'flow':
             '''
-            NR TEMPLATE STEAL
+            NR TEMPLATE MAXIMUM FLOW
             '''
-            graph = self.generate_graph(all_fulfillment, max_fulfillments)
-            for template in template_set:
-                self.template_steal(template, all_fulfillment, max_fulfillments, graph)
-            
-            self.io.debug(f'after NR steal: {Output.print_fulfillment(all_fulfillment)}')
+            with self.profiler.phase('nr flow'):
+                all_fulfillment.update(self.template_flow_fill(template_set, max_fulfillments))
 
+            self.io.debug(lambda: f'after NR flow: {Output.print_fulfillment(all_fulfillment)}')
+
+        elif shared is not None and nr_key in shared:
+            '''
+            NR TEMPLATE FILL AND STEAL, SAME AS AN EARLIER COMBINATION
             '''
-            R TEMPLATE FIRST COME FIRST SERVE FILL
+            self.profiler.count('nr stages reused')
+            restore_stage(all_fulfillment, shared.get(nr_key))
+
+        else:
+            '''
+            NR TEMPLATE FIRST COME FIRST SERVE FILL
+            '''
+            if shared is not None and nr_key[0] in shared:
+                # the fill only looks at non replacement templates
+                self.profiler.count('nr fills reused')
+                restore_stage(all_fulfillment, shared.get(nr_key[0]))
+            else:
+                with self.profiler.phase('nr fill'):
+                    for template in template_set:
+                        if template.replacement:
+                            continue
+                        all_fulfillment.update({template:self.template_fill(template, all_fulfillment, max_fulfillments)})
+                if shared is not None:
+                    shared.update({nr_key[0]:stage_snapshot(all_fulfillment)})
+
+            self.io.debug(lambda: f'after NR fulfillment: {Output.print_fulfillment(all_fulfillment)}')
+
+            '''
+            NR TEMPLATE STEAL
             '''
+            with self.profiler.phase('nr steal'):
+                graph = self.generate_graph(all_fulfillment, max_fulfillments)
+                for template in template_set:
+                    self.template_steal(template, all_fulfillment, max_fulfillments, graph)
+
+            self.io.debug(lambda: f'after NR steal: {Output.print_fulfillment(all_fulfillment)}')
+
+            if shared is not None:
+                shared.update({nr_key:stage_snapshot(all_fulfillment)})
+
+        '''
+        R TEMPLATE FIRST COME FIRST SERVE FILL
+        '''
+        with self.profiler.phase('r fill'):
             for template in template_set:
                 if not template.replacement:
                     continue
                 all_fulfillment.update({template:self.template_fill(template, all_fulfillment, max_fulfillments)})
 
-            self.io.debug(f'after R fulfillment: {Output.print_fulfillment(all_fulfillment)}')
+        self.io.debug(lambda: f'after R fulfillment: {Output.print_fulfillment(all_fulfillment)}')
 
-            '''
-            R TEMPLATE STEAL/TRADE
-            '''
+        '''
+        R TEMPLATE STEAL/TRADE
+        '''
+        with self.profiler.phase('r steal'):
             for template in template_set:
                 #continue
                 self.replacement_template_steal(template, all_fulfillment, max_fulfillments)
 
-            self.io.debug(f'after R steal: {Output.print_fulfillment(all_fulfillment)}')
+        self.io.debug(lambda: f'after R steal: {Output.print_fulfillment(all_fulfillment)}')
 
-            '''
-            R TEMPLATE FORCE STEAL/TRADE
-            '''
+        '''
+        R TEMPLATE FORCE STEAL/TRADE
+        '''
+        with self.profiler.phase('r force steal'):
             for template in template_set:
                 self.replacement_template_steal(template, all_fulfillment, max_fulfillments, template.importance)
 
-            potential_fulfillments.append(all_fulfillment)
-
-            Output.visualize('degree', all_fulfillment, 'completed fulfillment calculations')
-
-        # checks all fulfillment sets and return the best one
-        best_fulfillment = None
-        for fulfillment in potential_fulfillments:
-            if best_fulfillment is None or total_unfulfilled_slots(fulfillment) < total_unfulfilled_slots(best_fulfillment):
-                best_fulfillment = fulfillment
-            elif total_unfulfilled_slots(fulfillment) == total_unfulfilled_slots(best_fulfillment) and total_filled_slots(fulfillment) > total_filled_slots(best_fulfillment):
-                best_fulfillment = fulfillment
+        Output.visualize('degree', all_fulfillment, 'completed fulfillment calculations')
+        return all_fulfillment
 
-        end = timeit.default_timer()
-        self.io.info(f'\nfulfillment runtime: {end - start}\n')
-        return best_fulfillment
 
+    def nr_stage_key(self, template_set:list, max_fulfillments:Fulfillment_Table) -> tuple:
+        '''
+        everything the non replacement fill and steal of a combination depends on: its non replacement
+        templates, and the number of replacement max fulfillments each course that can be passed along a
+        steal path is in, which decides the course passed. Only courses wanted by two or more non replacement
+        templates can be passed
+        '''
+        nr_templates = tuple([template for template in template_set if not template.replacement])
+        wanted = 0
+        for template in nr_templates:
+            wanted |= 1 << max_fulfillments.rows.add(template)
+        r_bindings = tuple(sorted([(course.unique_name, max_fulfillments.count(course, True)) for course, column in max_fulfillments.columns.items() if (column & wanted).bit_count() > 1]))
+        return (nr_templates, r_bindings)
 
     def generate_graph(self, all_fulfillment:dict, max_fulfillments:dict):
+        self.profiler.count('graphs built')
         bfs_roots = set()
         overlap_calculator = Backwards_Overlap(all_fulfillment, max_fulfillments)
-        graph = Graph(set(all_fulfillment.keys()), overlap_calculator)
+        graph = Graph(list(all_fulfillment.keys()), overlap_calculator, sparse=self.sparse_graphs)
         
         # generate links between fulfillment statuses
         for fulfillment_status1 in all_fulfillment.values():
@@ -213,15 +788,239 @@ class Degree():
                     continue
                 graph.update_connection(fulfillment_status1.get_template(), fulfillment_status2.get_template())
         graph.roots = bfs_roots
-        self.io.debug(str(graph))
+        self.io.debug(lambda: str(graph))
         return graph
 
+    def refresh_graph(self, graph:Graph, all_fulfillment:dict, changed:set) -> None:
+        '''
+        brings a graph from generate_graph up to date after the templates in changed had their fulfillment
+        or max fulfillment changed, giving the same graph as generating it again. The templates in the graph
+        must be the same
+        '''
+        self.profiler.count('graphs refreshed')
+        bfs_roots = set()
+        for fulfillment_status1 in all_fulfillment.values():
+            if fulfillment_status1.get_template().replacement:
+                continue
+            if fulfillment_status1.excess_count() > 0:
+                bfs_roots.add(fulfillment_status1.get_template())
+            if fulfillment_status1.get_template() not in changed:
+                continue
+            for fulfillment_status2 in all_fulfillment.values():
+                if fulfillment_status2.get_template().replacement:
+                    continue
+                graph.update_connection(fulfillment_status1.get_template(), fulfillment_status2.get_template())
+                graph.update_connection(fulfillment_status2.get_template(), fulfillment_status1.get_template())
+        graph.roots = bfs_roots
+
+
+    def template_flow_fill(self, template_set:list, max_fulfillments:dict) -> dict:
+        '''
+        Assigns courses to every non replacement template at once by solving a maximum flow:
+
+            source -> template (capacity: courses required) -> course class (capacity: class size) -> sink (capacity: class size)
+
+        Courses of a class (see course_classes) are wanted by exactly the same templates, so the flow only
+        decides how many courses of each class a template gets, and the courses themselves are handed out
+        afterwards in order of their names.
+
+        The flow is augmented one template at a time in order of importance. Augmenting paths never
+        unfill a template, so a more important template is never left short for a less important one
+        and the total number of filled required slots is the maximum possible.
+
+        Courses left over are handed out as excess to the first template that wants them, the same
+        way template_fill does, so they can still be traded to replacement templates later.
+
+        Parameters:
+            template_set (list): templates in order of importance, must not contain wildcards
+            max_fulfillments ({Template:Fulfillment_Status}): all taken courses that can possibly fulfill each template
+
+        Returns:
+            all_fulfillment ({Template:Fulfillment_Status}): fulfillment statuses of the non replacement templates
+        '''
+        nr_templates = [template for template in template_set if not template.replacement]
+
+        courses = set()
+        for template in nr_templates:
+            courses.update(max_fulfillments.get(template).get_fulfillment_set())
+
+        # classes wanted by fewer replacement templates are tried first, so they are the ones held exclusively
+        classes = course_classes(max_fulfillments, courses)
+        r_bindings = num_bindings(max_fulfillments, [course_class[0] for course_class in classes], Bind_Type.R)
+        classes.sort(key=lambda course_class: (r_bindings.get(course_class[0]), course_class[0].unique_name))
+
+        source = 0
+        sink = 1
+        network = Flow_Network(2 + len(nr_templates) + len(classes))
+        for i, course_class in enumerate(classes):
+            network.add_edge(2 + len(nr_templates) + i, sink, len(course_class))
+
+        edges = dict() # {template : [(course class, edge id)]}
+        for i, template in enumerate(nr_templates):
+            requested_courses = max_fulfillments.get(template).get_fulfillment_set()
+            edges.update({template:[(j, network.add_edge(2 + i, 2 + len(nr_templates) + j, len(course_class)))
+                for j, course_class in enumerate(classes) if course_class[0] in requested_courses]})
+
+        for i, template in enumerate(nr_templates):
+            network.add_edge(source, 2 + i, template.courses_required)
+            network.max_flow(source, sink)
+
+        all_fulfillment = dict()
+        assigned = [0] * len(classes) # courses of each class handed out so far
+        for template in nr_templates:
+            this_fulfillment = Fulfillment_Status(template, template.courses_required, empty_course_set(max_fulfillments.get(template).get_fulfillment_set()))
+            for j, e in edges.get(template):
+                flow = network.flow(e)
+                this_fulfillment.add_fulfillment_course(classes[j][assigned[j]:assigned[j] + flow])
+                assigned[j] += flow
+            all_fulfillment.update({template:this_fulfillment})
+
+        for template in nr_templates:
+            for j, e in edges.get(template):
+                all_fulfillment.get(template).add_fulfillment_course(classes[j][assigned[j]:])
+                assigned[j] = len(classes[j])
+
+        return all_fulfillment
+
+
+    def template_weighted_fill(self, template_set:list, max_fulfillments:dict) -> dict:
+        '''
+        Heuristic that assigns courses to every template, replacement or not, by importance weighted minimum
+        cost flows:
+
+            source -> template (capacity: courses required, cost: -weight) -> course class (capacity: class size) -> sink (capacity: class size)
+
+        Courses of a class (see course_classes) are wanted by exactly the same templates, so the flow only
+        decides how many courses of each class a template gets, and the courses themselves are handed out
+        afterwards in order of their names.
+
+        Each template is weighted by base ** rank, with base larger than any number of slots, so within one
+        flow a slot of a template is worth more than every slot of all the less important templates combined.
+        This takes the place of the importance_level checks of the steal passes, and no dummy templates are needed.
+
+        Replacement templates share courses with each other, which a flow cannot express, so they are added
+        one at a time in order of importance. Each one competes with every non replacement template for the
+        courses it still needs, and the courses it wins are reserved for replacement templates from then on
+        (later replacement templates use them for free). Within a template, the lowest order term of the cost
+        prefers courses that fewer replacement templates want for non replacement templates, and courses
+        more replacement templates want for replacement templates.
+
+        Reserving greedily is what makes this a heuristic rather than an optimum. A replacement template only
+        weighs the courses it takes against the non replacement templates, not against the replacement
+        templates after it that would share them. With courses c1 {bin.1, bin.2} and c5 {bin.4}, and from most
+        to least important the replacement templates 'bin.4 | bin.2' and 'bin.2' and the non replacement templates
+        'bin.1' and 'bin.4' each requiring 1 course, the first template takes c5 so 'bin.1' can have c1, which
+        leaves 'bin.2' and 'bin.4' short (2 unfulfilled slots) where giving it c1 leaves only 'bin.1' short.
+        Use the 'steal' or 'flow' engine when the fewest unfulfilled slots matter.
+
+        Parameters:
+            template_set (list): templates to fulfill, must not contain wildcards
+            max_fulfillments ({Template:Fulfillment_Status}): all taken courses that can possibly fulfill each template
+
+        Returns:
+            all_fulfillment ({Template:Fulfillment_Status}): fulfillment status of every template
+        '''
+        template_set = sorted(template_set, key=lambda template: template.importance, reverse=True)
+        nr_templates = [template for template in template_set if not template.replacement]
+        r_templates = [template for template in template_set if template.replacement]
+
+        courses = set()
+        for template in template_set:
+            courses.update(max_fulfillments.get(template).get_fulfillment_set())
+        classes = course_classes(max_fulfillments, courses)
+        r_bindings = num_bindings(max_fulfillments, [course_class[0] for course_class in classes], Bind_Type.R)
+
+        base = len(courses) * (len(r_templates) + 1) + sum([template.courses_required for template in template_set]) + 1
+        weights = {template:base ** (len(template_set) - i) for i, template in enumerate(template_set)}
+
+        # replacement templates in order of importance, each reserving the courses it needs. Courses no non
+        # replacement template wants are never contested, so they start out reserved
+        nr_bindings = num_bindings(max_fulfillments, [course_class[0] for course_class in classes], Bind_Type.NR)
+        reserved = [0 if nr_bindings.get(course_class[0]) else len(course_class) for course_class in classes] # courses of each class reserved
+        for r_template in r_templates:
+            requested_courses = max_fulfillments.get(r_template).get_fulfillment_set()
+            demand = r_template.courses_required - sum([reserved[j] for j, course_class in enumerate(classes) if course_class[0] in requested_courses])
+            if demand <= 0:
+                continue
+
+            network, class_nodes, edges = self.weighted_network(nr_templates, classes, reserved, max_fulfillments, weights, r_bindings)
+            r_node = network.add_node()
+            network.add_edge(0, r_node, demand, -weights.get(r_template))
+            r_edges = [(j, network.add_edge(r_node, node, len(classes[j]) - reserved[j], 1 - r_bindings.get(classes[j][0])))
+                for j, node in class_nodes.items() if classes[j][0] in requested_courses]
+            network.min_cost_flow(0, 1)
+            for j, e in r_edges:
+                reserved[j] += network.flow(e)
+
+        network, class_nodes, edges = self.weighted_network(nr_templates, classes, reserved, max_fulfillments, weights, r_bindings)
+        network.min_cost_flow(0, 1)
+
+        # the first courses of a class go to non replacement templates, the reserved ones are its last
+        all_fulfillment = dict()
+        nr_courses = set()
+        assigned = [0] * len(classes)
+        for template in nr_templates:
+            this_fulfillment = Fulfillment_Status(template, template.courses_required, empty_course_set(max_fulfillments.get(template).get_fulfillment_set()))
+            for j, e in edges.get(template):
+                flow = network.flow(e)
+                this_fulfillment.add_fulfillment_course(classes[j][assigned[j]:assigned[j] + flow])
+                nr_courses.update(classes[j][assigned[j]:assigned[j] + flow])
+                assigned[j] += flow
+            all_fulfillment.update({template:this_fulfillment})
+
+        # replacement templates take every course they want that no non replacement template holds
+        for template in r_templates:
+            requested_courses = max_fulfillments.get(template).get_fulfillment_set()
+            this_fulfillment = Fulfillment_Status(template, template.courses_required, empty_course_set(requested_courses))
+            this_fulfillment.add_fulfillment_course([course for course in requested_courses if course not in nr_courses])
+            all_fulfillment.update({template:this_fulfillment})
+
+        # courses nobody else can use are excess of the first non replacement template that wants them
+        for template in nr_templates:
+            for j, e in edges.get(template):
+                if not r_bindings.get(classes[j][0]):
+                    all_fulfillment.get(template).add_fulfillment_course(classes[j][assigned[j]:])
+                    assigned[j] = len(classes[j])
+
+        return {template:all_fulfillment.get(template) for template in template_set}
+
+
+    def weighted_network(self, nr_templates:list, classes:list, reserved:list, max_fulfillments:dict, weights:dict, r_bindings:dict) -> tuple:
+        '''
+        builds the flow network of template_weighted_fill for the non replacement templates, node 0 is the source
+        and node 1 is the sink. Reserved courses are left out of their class, and classes with every course
+        reserved are left out entirely.
+
+        Returns:
+            network (Cost_Flow_Network): the network
+            class_nodes ({int:int}): node of every class, by its position in classes, with courses not reserved
+            edges ({Template:[(int, int)]}): (class, edge id) of every template to class edge of every non replacement template
+        '''
+        network = Cost_Flow_Network(2)
+        class_nodes = dict()
+        for j, course_class in enumerate(classes):
+            if reserved[j] == len(course_class):
+                continue
+            class_nodes.update({j:network.add_node()})
+            network.add_edge(class_nodes.get(j), 1, len(course_class) - reserved[j])
+
+        edges = dict()
+        for template in nr_templates:
+            node = network.add_node()
+            network.add_edge(0, node, template.courses_required, -weights.get(template))
+            requested_courses = max_fulfillments.get(template).get_fulfillment_set()
+            edges.update({template:[(j, network.add_edge(node, class_node, len(classes[j]) - reserved[j], r_bindings.get(classes[j][0])))
+                for j, class_node in class_nodes.items() if classes[j][0] in requested_courses]})
+        return network, class_nodes, edges
+
 
     def course_move(self, giver_fulfillment:Fulfillment_Status, receiver_fulfillment:Fulfillment_Status, course:Course, graph:Graph) -> None:
         '''
         manages the graph such that it remains consistent with course moves. This method must be used
-        if you want to be able to modify fulfillment sets without rebuilding the entire graph
+        if you want to be able to modify fulfillment sets without rebuilding the entire graph. The
+        fulfillment tables holding the statuses are told about the move by the statuses themselves
         '''
+        self.profiler.count('course moves', template=receiver_fulfillment.get_template())
         giver_fulfillment.remove_fulfillment_course(course)
         receiver_fulfillment.add_fulfillment_course(course)
 
@@ -254,13 +1053,15 @@ class Degree():
         '''
 
         requested_courses = max_fulfillments.get(template).get_fulfillment_set()
+        this_fulfillment = Fulfillment_Status(template, template.courses_required, empty_course_set(requested_courses))
 
-        self.io.debug(f"template {template} requests: {[str(e) for e in requested_courses]}")
+        self.io.debug(lambda: f"template {template} requests: {[str(e) for e in requested_courses]}")
 
         if template.replacement:
-            requested_courses = sorting.dictionary_sort(num_wanted_bindings(all_fulfillment, max_fulfillments, requested_courses, Bind_Type.R))
+            requested_courses = sorting.dictionary_sort(num_wanted_bindings(all_fulfillment, max_fulfillments, course_order(requested_courses), Bind_Type.R))
             requested_courses.reverse()
-        this_fulfillment = Fulfillment_Status(template, template.courses_required, set())
+        else:
+            requested_courses = course_order(requested_courses)
 
         """
         we grab all courses from potential_courses that won't disturb
@@ -315,6 +1116,7 @@ class Degree():
         '''
         if less_important_templates is None:
             less_important_templates = get_less_important_templates(all_fulfillment, importance_level)
+        self.profiler.count('bfs runs', template=template)
         bfs = graph.bfs(less_important_templates)
 
         # Optimization: we can leave immediately if BFS doesn't even contain the target at all
@@ -328,7 +1130,10 @@ class Degree():
         
         # the path to move courses, recorded as a list of templates traversed
         path = bfs.get_path(target_template)
-        self.io.debug('path: ' + ' -> '.join([str(e) for e in path]) + ' --> ' + str(template))
+        if path is None:
+            # no template with excess can make up for the course the holder gives away
+            return False
+        self.io.debug(lambda: 'path: ' + ' -> '.join([str(e) for e in path]) + ' --> ' + str(template))
 
         # shifts courses along the path such that we obtain a new course
         for i in range(0, len(path) - 1):
@@ -337,14 +1142,14 @@ class Degree():
             transferred_courses = graph.edge_data(giver, receiver, False)
 
             # avoid being greedy and taking courses that fulfill replaceable templates for yourself!
-            transferred_course = sorting.bucket_sort(num_bindings(max_fulfillments, transferred_courses, Bind_Type.R))[0]
+            transferred_course = sorting.bucket_sort(num_bindings(max_fulfillments, course_order(transferred_courses), Bind_Type.R))[0]
 
-            self.io.debug(f'transferring course {transferred_course} from {giver} to {receiver}')
+            self.io.debug(lambda: f'transferring course {transferred_course} from {giver} to {receiver}')
             self.course_move(all_fulfillment.get(giver), all_fulfillment.get(receiver), transferred_course, graph)
 
             Output.visualize('degree', all_fulfillment, 'course steal')
 
-        self.io.debug(f'transferring course {course} from {path[-1]} to {all_fulfillment.get(template)}')
+        self.io.debug(lambda: f'transferring course {course} from {path[-1]} to {all_fulfillment.get(template)}')
         self.course_move(all_fulfillment.get(path[-1]), all_fulfillment.get(template), course, graph)
 
         Output.visualize('degree', all_fulfillment, 'course steal')
@@ -358,11 +1163,12 @@ class Degree():
             return
 
         this_fulfillment = all_fulfillment.get(template)
+        self.profiler.count('bfs runs', template=template)
         bfs = graph.bfs()
         if not bfs.contains_child(template):
             return
 
-        for course in max_fulfillments.get(template).get_fulfillment_set():
+        for course in course_order(max_fulfillments.get(template).get_fulfillment_set()):
             if this_fulfillment.fulfilled():
                 return
             if course in all_fulfillment.get(template).get_fulfillment_set():
@@ -418,12 +1224,19 @@ class Degree():
             return
 
         requested_courses = max_fulfillments.get(template).get_fulfillment_set().difference(all_fulfillment.get(template).get_fulfillment_set())
-        requested_courses_sorted = sorting.bucket_sort(num_bindings(all_fulfillment, requested_courses, Bind_Type.R))
+        requested_courses_sorted = sorting.bucket_sort(num_bindings(all_fulfillment, course_order(requested_courses), Bind_Type.R))
+
+        # generated for the first trade and refreshed for the templates each trade changed afterwards
+        graph = None
 
         for course in requested_courses_sorted:
             if this_fulfillment.fulfilled():
                 return
 
+            # everything until the trade is known to work is undone through the journals if it doesn't
+            checkpoint = all_fulfillment.checkpoint()
+            max_checkpoint = max_fulfillments.checkpoint()
+
             # we bind the wanted course (which at this point, we know is unbound since the requested courses filtered out already bound courses)
             course_bind_to_R_templates(all_fulfillment, max_fulfillments, course)
 
@@ -439,55 +1252,151 @@ class Degree():
             dummy_donor_template = Template('dummy donor', courses_required = 0)
             dummy_donor_fulfillment = Fulfillment_Status(dummy_donor_template, fulfillment_set=donateable_courses)
             all_fulfillment.update({dummy_donor_template:dummy_donor_fulfillment})
-            max_fulfillments.update({dummy_donor_template:copy.deepcopy(dummy_donor_fulfillment)})
+            max_fulfillments.update({dummy_donor_template:Fulfillment_Status(dummy_donor_template, fulfillment_set=copy.copy(donateable_courses))})
 
             dummy_receiver_template = Template('dummy receiver', courses_required = 999)
-            dummy_receiver_fulfillment = Fulfillment_Status(dummy_receiver_template, fulfillment_set=set())
-            dummy_receiver_max_fulfillment = Fulfillment_Status(dummy_receiver_template, fulfillment_set={course})
+            dummy_receiver_fulfillment = Fulfillment_Status(dummy_receiver_template, fulfillment_set=empty_course_set(requested_courses))
+            dummy_receiver_max_fulfillment = Fulfillment_Status(dummy_receiver_template, fulfillment_set=empty_course_set(requested_courses))
+            dummy_receiver_max_fulfillment.add_fulfillment_course(course)
             all_fulfillment.update({dummy_receiver_template:dummy_receiver_fulfillment})
             max_fulfillments.update({dummy_receiver_template:dummy_receiver_max_fulfillment})
 
-            graph = self.generate_graph(all_fulfillment, max_fulfillments)
+            changed = all_fulfillment.take_changed()
+            if graph is None:
+                graph = self.generate_graph(all_fulfillment, max_fulfillments)
+            else:
+                # the dummies' max fulfillments are new as well
+                changed.update([dummy_donor_template, dummy_receiver_template])
+                self.refresh_graph(graph, all_fulfillment, changed)
 
+            self.profiler.count('bfs runs', template=template)
             bfs = graph.bfs(less_important_templates)
             template_with_course = templates_containing_course(all_fulfillment, course, True)
 
             if not bfs.contains_node(template_with_course):
-                self.io.debug(f'R template attempting to steal course {course} failed, not found in bfs tree {bfs}')
+                self.io.debug(lambda: f'R template attempting to steal course {course} failed, not found in bfs tree {bfs}')
+                all_fulfillment.rollback(checkpoint)
+                max_fulfillments.rollback(max_checkpoint)
                 course_bindings_clear(all_fulfillment, course, Bind_Type.R)
-                all_fulfillment.pop(dummy_donor_template)
-                max_fulfillments.pop(dummy_donor_template)
-                all_fulfillment.pop(dummy_receiver_template)
-                max_fulfillments.pop(dummy_receiver_template)
                 continue
-            self.io.debug(f'R template stealing course {course}')
+            self.io.debug(lambda: f'R template stealing course {course}')
             self.course_steal(dummy_receiver_template, course, all_fulfillment, max_fulfillments, graph, less_important_templates=less_important_templates)
 
-            traded_course = max_fulfillments.get(dummy_donor_template).get_fulfillment_set() - dummy_donor_fulfillment.get_fulfillment_set()
-            if len(traded_course) == 1:
-                traded_course = list(traded_course)[0]
-
-            course_bindings_clear(all_fulfillment, traded_course, Bind_Type.R)
+            # only a single traded course is taken back from the replacement templates
+            traded_courses = max_fulfillments.get(dummy_donor_template).get_fulfillment_set() - dummy_donor_fulfillment.get_fulfillment_set()
+            if len(traded_courses) == 1:
+                course_bindings_clear(all_fulfillment, list(traded_courses)[0], Bind_Type.R)
 
             this_fulfillment.add_fulfillment_course(course)
             all_fulfillment.pop(dummy_donor_template)
             max_fulfillments.pop(dummy_donor_template)
             all_fulfillment.pop(dummy_receiver_template)
             max_fulfillments.pop(dummy_receiver_template)
+            all_fulfillment.commit(checkpoint)
+            max_fulfillments.commit(max_checkpoint)
 
 
     ##############################################################################################
     # fulfillment recommendation
     ##############################################################################################
 
-    def recommend(self, taken_courses, best_fulfillments:dict=None, custom_tags=None) -> dict:
+    def marginal_gain(self, taken_courses:set, candidates, base:dict=None, matches:dict=None) -> dict:
+        '''
+        Number of unfulfilled slots each candidate course would fill if it were taken, without computing a
+        fulfillment per candidate.
+
+        The base fulfillment is kept and each candidate is placed by one augmenting move: into every unfulfilled
+        replacement template that wants it, or into a non replacement template, which can pass one of its courses
+        on to another non replacement template that wants it, and so on, until a course lands in an unfulfilled
+        non replacement template (one slot) or leaves for the unfulfilled replacement templates that want it.
+        Where a template can pass courses to doesn't depend on the candidate, so the best gain of a template
+        receiving a course is found once, and each candidate only looks at the templates that want it.
+
+        Gains are measured against the base and its wildcard choices. A full fulfillment with the candidate
+        may choose other wildcards and gain more.
+
+        The courses each template wants are read from matches made before instead of matching the templates
+        again: the catalog's match table of this degree, or matches when given.
+
+        Parameters:
+            taken_courses (set): courses taken
+            candidates (iterable): courses to score, taken courses gain nothing
+            base (dict): fulfillment of taken_courses, computed if None
+            matches (dict): {specifications : [(wildcard free specifications, courses)]} like the matches of
+                max_fulfillment_possibilities, but over a set of courses including the candidates. Defaults to
+                the match table of the catalog, templates are matched against the candidates without either
+
+        Returns:
+            gains ({Course:int}): unfulfilled slots each candidate fills
         '''
-        gives possible courses to take
+        if base is None:
+            base = self.fulfillment(taken_courses)
+        candidates = set(candidates)
+        pool = candidates.union(taken_courses)
+        if matches is None and self.catalog is not None:
+            matches = self.catalog.match_table(self).matches
+
+        def wanted(template) -> set:
+            # the match of the template's wildcard choice, courses held in the base are wanted whatever it says
+            specifications = template.original_specifications if template.original_specifications is not None else template.specifications
+            for match, courses in matches.get(tuple(specifications), list()) if matches is not None else list():
+                if list(match) == template.specifications:
+                    return set([course for course in courses if course in pool]).union(base.get(template).get_fulfillment_set())
+            return self.course_match(template, pool)[0].get_fulfillment_set()
+        wants = {template:wanted(template) for template in base.keys()}
+        nr_templates = [template for template in base.keys() if not template.replacement]
+        short_r_templates = [template for template in base.keys() if template.replacement and not base.get(template).fulfilled()]
+
+        def r_gain(course) -> int:
+            # courses held by non replacement templates are in no replacement template
+            return len([template for template in short_r_templates if course in wants.get(template) and course not in base.get(template).get_fulfillment_set()])
+
+        # gain of a non replacement template receiving a course and keeping it or giving up one of its own
+        terminal = dict()
+        passes = dict() # {template : non replacement templates wanting one of its courses}
+        for template in nr_templates:
+            held = base.get(template).get_fulfillment_set()
+            terminal.update({template:max([0 if base.get(template).fulfilled() else 1] + [r_gain(course) for course in held])})
+            passes.update({template:[other for other in nr_templates if other is not template and any([course in wants.get(other) for course in held])]})
+
+        # best gain over every template a course can be passed on to
+        value = dict()
+        for template in nr_templates:
+            reached = set([template])
+            stack = [template]
+            while len(stack):
+                for other in passes.get(stack.pop()):
+                    if other not in reached:
+                        reached.add(other)
+                        stack.append(other)
+            value.update({template:max([terminal.get(other) for other in reached])})
+
+        gains = dict()
+        for course in candidates:
+            if course in taken_courses:
+                gains.update({course:0})
+                continue
+            gains.update({course:max([r_gain(course)] + [value.get(template) for template in nr_templates if course in wants.get(template)])})
+        return gains
+
 
-        returns: recommendation (dict): {best template : {alternative template : fulfillment list}}
+    def recommend(self, taken_courses, best_fulfillments:dict=None, custom_tags=None, budget_ms:float=None, deadline:float=None) -> Budgeted_Result:
         '''
+        gives possible courses to take, each scored by its relevance to the taken courses plus the unfulfilled
+        slots it would fill (see marginal_gain), with the number of replacement templates wanting it breaking ties
+
+        With a budget the fulfillment (when not given) and the ranking share the deadline, and once it passes
+        no more templates are ranked. The first template is always ranked.
+
+        returns: recommendation (Budgeted_Result): {best template : {alternative template : fulfillment list}}
+            truncated if the deadline stopped the fulfillment or the ranking, explored is the number of
+            templates ranked
+        '''
+        deadline = budget_deadline(budget_ms, deadline)
+        truncated = False
         if best_fulfillments is None:
-            best_fulfillments = self.fulfillment(taken_courses)
+            best_fulfillments = self.fulfillment(taken_courses, deadline=deadline)
+            truncated = best_fulfillments.truncated
         if custom_tags is not None and not len(custom_tags):
             custom_tags = None
 
@@ -497,35 +1406,39 @@ class Degree():
         compute max_fulfillments for the sake of potential bindings calculation
         """
         max_fulfillments = dict()
-        
+        catalog_matches = dict() # {best template : catalog wide matches of its original template}
 
         for best_template, best_fulfillment in best_fulfillments.items():
-            original_specification = best_template.original_specifications
-            best_template_original = Template(best_template.name + ' original', specifications=original_specification, replacement=best_template.replacement, courses_required=1)
-            matches = best_template_original.get_course_match(self.catalog.courses())
+            matches = self.catalog_match(best_template)
+            catalog_matches.update({best_template:matches})
 
-            status = matches[0]
+            # the matches are ranked below, so their courses are collected into a status of their own
+            status = Fulfillment_Status(matches[0].get_template(), 1, set())
             for matched_fulfillment in matches:
                 status.add_fulfillment_course(matched_fulfillment.get_fulfillment_set())
-                max_fulfillments.update({best_template_original:status})
+            max_fulfillments.update({status.get_template():status})
+
+        # unfulfilled slots every course of the catalog would fill, courses are ranked by it first
+        gains = self.marginal_gain(taken_courses, self.catalog.courses(), best_fulfillments)
 
         recommendation = dict() # {best template : {alternative template : fulfillment list}}
         # note that best template == alternative template if best template does not contain wildcards
 
         for best_template, best_fulfillment in best_fulfillments.items():
 
+            if len(recommendation) and budget_expired(deadline):
+                truncated = True
+                break
+
             """
             compute matches by calling get_course_match and receiving matches based on wildcard combinations
 
             each combination is stored as an 'alternative template' under their respective best template inside recommender
             """
 
-            original_specification = best_template.original_specifications
-            # remaking the original template
-            best_template_original = Template(f'{best_template.name} original', specifications=original_specification, replacement=best_template.replacement, courses_required=1)
-
-            # here we receive the list of fulfillment sets from get course match
-            matches = best_template_original.get_course_match(self.catalog.courses())
+            # the list of fulfillment sets of the original template from get course match
+            matches = catalog_matches.get(best_template)
+            best_template_original = matches[0].get_template()
             matches_dict = {}
 
             for matched_fulfillment in matches:
@@ -534,7 +1447,7 @@ class Degree():
                 for each match, rank the matched courses
                 """
 
-                self.io.debug(f'max match for template {best_template_original}: \n{matches}\n')
+                self.io.debug(lambda: f'max match for template {best_template_original}: \n{matches}\n')
                 # remove the courses already taken
                 recommended_courses = matched_fulfillment.get_fulfillment_set()
                 for course in best_fulfillment.get_fulfillment_set():
@@ -546,6 +1459,7 @@ class Degree():
                 final_score = dict()
                 for course in recommended_courses:
                     score = course_relevances.get(course)
+                    score += gains.get(course, 0)
                     score += (course_R_bindings.get(course) / 50.0)
                     final_score.update({course : score})
 
@@ -560,7 +1474,7 @@ class Degree():
         end = timeit.default_timer()
         self.io.info(f'\rrecommendation runtime: {end - start}\n')
        
-        return recommendation
+        return Budgeted_Result(recommendation, not truncated, truncated, len(recommendation))
     
 
     def json(self) -> json:
@@ -597,23 +1511,45 @@ class Degree():
 ######################################
 
 
+parallel_state = None # (degree, max fulfillment possibilities, index, engine) inherited by forked processes
+
+def fulfill_combinations(chunk:list) -> list:
+    '''
+    process pool task of Degree.parallel_fulfillment
+
+    Returns:
+        results (list): [(combo, unfulfilled slots, filled slots, [(template name, [course unique names])])]
+        profiler (Profiler): what the chunk recorded if the degree is profiling, None otherwise
+    '''
+    degree, max_fulfillment_possibilities, index, engine = parallel_state
+    if degree.profiler.enabled:
+        # the process has its own copy of the degree, only this chunk is recorded and sent back
+        degree.profiler = Profiler()
+    results = list()
+    shared = dict()
+    for combo in chunk:
+        degree.profiler.count('combinations')
+        with degree.profiler.phase('combination'):
+            fulfillment = degree.evaluate_combination([max_fulfillment_possibilities[i][combo[i]] for i in range(0, len(combo))], index, engine, shared)
+        fulfillment_names = [(template.name, [course.unique_name for course in status.get_fulfillment_set()]) for template, status in fulfillment.items()]
+        results.append((combo, total_unfulfilled_slots(fulfillment), total_filled_slots(fulfillment), fulfillment_names))
+    return results, degree.profiler if degree.profiler.enabled else None
+
+
 def num_bindings(all_fulfillment:dict, course:Course, bind_type:Bind_Type=Bind_Type.ALL):
     '''
     Total number of appearances of course in fulfillment sets that allow replacement
 
     returns integer if input is a course, returns dictionary of course:int if input is a list of courses
     '''
-    if isinstance(course, list) or isinstance(course, set):
+    table = fulfillment_table(all_fulfillment)
+    replacement = None if bind_type == Bind_Type.ALL else bind_type.value
+    if isinstance(course, (list, set, Bitset)):
         dictionary_return = dict()
         for c in course:
-            dictionary_return.update({c:num_bindings(all_fulfillment, c, bind_type)})
+            dictionary_return.update({c:table.count(c, replacement)})
         return dictionary_return
-    
-    count = 0
-    for template, fulfillment_status in all_fulfillment.items():
-        if (bind_type == Bind_Type.ALL or template.replacement == bind_type.value) and course in fulfillment_status.get_fulfillment_set():
-            count += 1
-    return count
+    return table.count(course, replacement)
 
 
 def num_wanted_bindings(all_fulfillment:dict, max_fulfillments:dict, requested_courses:list, bind_type:Bind_Type=Bind_Type.ALL) -> list:
@@ -621,18 +1557,14 @@ def num_wanted_bindings(all_fulfillment:dict, max_fulfillments:dict, requested_c
     sorts courses inside requested_courses by the number of bindings they have
     with courses within all_fulfillment, from least to most
     '''
-    num_wanted = dict()
+    table = fulfillment_table(all_fulfillment)
+    max_table = fulfillment_table(max_fulfillments, table.rows)
 
+    # a course is wanted by every unfulfilled template whose max fulfillment contains it
+    wanting = table.unfulfilled & table.type_mask(None if bind_type == Bind_Type.ALL else bind_type.value)
+    num_wanted = dict()
     for course in requested_courses:
-        # determine the appropriate bucket to put each course in
-        num_appearances = 0
-        for template, fulfillment_status in all_fulfillment.items():
-            # if the course appears inside a max fulfillment set and the fulfillment set is not fulfilled
-            if ((bind_type == Bind_Type.ALL or template.replacement == bind_type.value)
-                and (not fulfillment_status.fulfilled() and course in max_fulfillments.get(template).get_fulfillment_set())):
-                num_appearances += 1
-        num_wanted.update({course:num_appearances})
-
+        num_wanted.update({course:(max_table.column(course) & wanting).bit_count()})
     return num_wanted
 
 
@@ -649,16 +1581,18 @@ def get_less_important_templates(all_fulfillment:dict, importance_level, bind_ty
 
 
 def get_weakly_bound_courses(all_fulfillment:dict, bind_type:Bind_Type=Bind_Type.ALL) -> set:
-    loosely_bound = set()
-    strongly_bound = set()
-    for template, fulfillment in all_fulfillment.items():
-        if bind_type != Bind_Type.ALL and template.replacement != bind_type.value:
-            continue
-        if template.courses_required < fulfillment.get_actual_count():
-            loosely_bound.update(fulfillment.get_fulfillment_set())
-        else:
-            strongly_bound.update(fulfillment.get_fulfillment_set())
-    return loosely_bound - strongly_bound
+    '''
+    courses only held by templates with excess
+    '''
+    if not len(all_fulfillment):
+        return set()
+    table = fulfillment_table(all_fulfillment)
+    rows = table.type_mask(None if bind_type == Bind_Type.ALL else bind_type.value)
+    loosely_bound = rows & table.excess
+    strongly_bound = rows & ~table.excess
+    weakly_bound = empty_course_set(next(iter(all_fulfillment.values())).get_fulfillment_set())
+    weakly_bound.update([course for course, column in table.columns.items() if column & loosely_bound and not column & strongly_bound])
+    return weakly_bound
 
 
 def course_weakly_bound(all_fulfillment:dict, course, importance_level:int=-1) -> bool:
@@ -666,31 +1600,139 @@ def course_weakly_bound(all_fulfillment:dict, course, importance_level:int=-1) -
     true if removing this course from all existing fulfillment sets will not cause a fulfilled
     template to become unfulfilled
     '''
-    for fulfillment_status in all_fulfillment.values():
-        if course in fulfillment_status.get_fulfillment_set() and fulfillment_status.excess_count() == 0 and fulfillment_status.get_template().importance >= importance_level:
-            return False
-    return True
+    table = fulfillment_table(all_fulfillment)
+    return not table.column(course) & ~table.excess & table.importance_mask(importance_level)
 
 
 def course_bindings_clear(all_fulfillment:dict, course, bind_type:Bind_Type=Bind_Type.ALL) -> None:
     '''
     Removes course from all existing fulfillment sets
     '''
-    for template, fulfillment_status in all_fulfillment.items():
-        if bind_type != Bind_Type.ALL and template.replacement != bind_type.value:
-            continue
-        if course in fulfillment_status.get_fulfillment_set():
-            fulfillment_status.remove_fulfillment_course(course)
+    table = fulfillment_table(all_fulfillment)
+    for template in table.templates(table.column(course) & table.type_mask(None if bind_type == Bind_Type.ALL else bind_type.value)):
+        all_fulfillment.get(template).remove_fulfillment_course(course)
 
 
 def course_bind_to_R_templates(all_fulfillment:dict, max_fulfillments:dict, course:Course) -> None:
     '''
     add the course to all fulfillment sets that are replacement enabled
     '''
-    for fulfillment_status in all_fulfillment.values():
-        if (fulfillment_status.get_template().replacement 
-                and course in max_fulfillments.get(fulfillment_status.get_template()).get_fulfillment_set()):
-            fulfillment_status.add_fulfillment_course(course)
+    table = fulfillment_table(all_fulfillment)
+    max_table = fulfillment_table(max_fulfillments, table.rows)
+    for template in table.templates(table.replacement & max_table.column(course)):
+        all_fulfillment.get(template).add_fulfillment_course(course)
+
+
+def course_classes(max_fulfillments:dict, courses) -> list:
+    '''
+    groups courses wanted by exactly the same templates of max_fulfillments. Any course of a class can
+    take the place of another in a fulfillment, so solvers can decide how many courses of a class each
+    template gets instead of which ones
+
+    Returns:
+        classes ([[Course]]): courses of every class sorted by name, classes in order of their first course
+    '''
+    table = fulfillment_table(max_fulfillments)
+    classes = dict() # {rows wanting the course : courses}
+    for course in sorted(courses, key=lambda course: course.unique_name):
+        classes.setdefault(table.column(course), list()).append(course)
+    return list(classes.values())
+
+
+def course_available(all_fulfillment:dict, template:Template, course:Course) -> bool:
+    '''
+    whether the course fulfills the template and can be added to it without taking it from another template
+    '''
+    if course in all_fulfillment.get(template).get_fulfillment_set() or not template.get_predicate().evaluate(course)[0]:
+        return False
+    if template.replacement:
+        return not num_bindings(all_fulfillment, course, Bind_Type.NR)
+    return not num_bindings(all_fulfillment, course)
+
+
+def place_course(all_fulfillment:dict, templates:list, course:Course) -> None:
+    '''
+    places a course no template holds, in the same order of preference as the fulfillment passes: an unfulfilled
+    non replacement template, then an unfulfilled one through a template that trades it a course, then every
+    replacement template, then any non replacement template as excess
+
+    Parameters:
+        templates (list): templates of all_fulfillment in order of importance
+    '''
+    nr_matches = [template for template in templates if not template.replacement and course_available(all_fulfillment, template, course)]
+    r_matches = [template for template in templates if template.replacement and course_available(all_fulfillment, template, course)]
+
+    for template in nr_matches:
+        if not all_fulfillment.get(template).fulfilled():
+            all_fulfillment.get(template).add_fulfillment_course(course)
+            return
+
+    unfulfilled = [template for template in templates if not template.replacement and not all_fulfillment.get(template).fulfilled()]
+    for giver in nr_matches:
+        for traded_course in list(all_fulfillment.get(giver).get_fulfillment_set()):
+            for receiver in unfulfilled:
+                if receiver.get_predicate().evaluate(traded_course)[0]:
+                    all_fulfillment.get(giver).remove_fulfillment_course(traded_course)
+                    all_fulfillment.get(giver).add_fulfillment_course(course)
+                    all_fulfillment.get(receiver).add_fulfillment_course(traded_course)
+                    return
+
+    if len(r_matches):
+        for template in r_matches:
+            all_fulfillment.get(template).add_fulfillment_course(course)
+        return
+
+    if len(nr_matches):
+        all_fulfillment.get(nr_matches[0]).add_fulfillment_course(course)
+
+
+def snapshot_fulfillment(all_fulfillment:dict) -> tuple:
+    '''
+    immutable copy of a fulfillment, ((template, required count, frozenset of courses), ...)
+    '''
+    return tuple([(template, status.get_required_count(), frozenset(status.get_fulfillment_set())) for template, status in all_fulfillment.items()])
+
+
+def restore_fulfillment(snapshot:tuple, index:Bitset_Index=None) -> dict:
+    '''
+    new fulfillment from snapshot_fulfillment that can be modified without changing the snapshot, with
+    bitsets over index as course sets if given
+    '''
+    if index is not None:
+        return {template:Fulfillment_Status(template, required, Bitset(index, courses)) for template, required, courses in snapshot}
+    return {template:Fulfillment_Status(template, required, set(courses)) for template, required, courses in snapshot}
+
+
+def stage_snapshot(all_fulfillment:dict) -> tuple:
+    '''
+    copy of a fulfillment part way through combination_fulfillment, keeps the course set representation
+    '''
+    return tuple([(template, status.get_required_count(), copy.copy(status.get_fulfillment_set())) for template, status in all_fulfillment.items()])
+
+
+def restore_stage(all_fulfillment:dict, snapshot:tuple) -> None:
+    '''
+    adds copies of the statuses in a stage_snapshot to all_fulfillment
+    '''
+    for template, required, course_set in snapshot:
+        all_fulfillment.update({template:Fulfillment_Status(template, required, copy.copy(course_set))})
+
+
+def course_order(courses) -> list:
+    '''
+    courses sorted by unique name. Passes look at courses in this order so results don't depend on the order
+    course sets iterate in, which is by hash for python sets and by course id for bitsets
+    '''
+    return sorted(courses, key=lambda course: course.unique_name)
+
+
+def empty_course_set(course_set) -> set:
+    '''
+    returns a new empty set with the same representation (set or Bitset) as course_set
+    '''
+    if isinstance(course_set, Bitset):
+        return course_set.empty()
+    return set()
 
 
 def total_unfulfilled_slots(all_fulfillment:dict) -> int:
@@ -714,13 +1756,8 @@ def templates_containing_course(all_fulfillment:dict, course:Course, first_occur
     '''
     returns a set of all templates that contain the specified course
     '''
-    templates = set()
-    for template, fulfillment_status in all_fulfillment.items():
-        if course in fulfillment_status.get_fulfillment_set():
-            if first_occurance_only:
-                return template
-            templates.add(template)
-
-    if first_occurance_only and not len(templates):
-        return None
-    return templates
+    table = fulfillment_table(all_fulfillment)
+    templates = table.templates(table.column(course))
+    if first_occurance_only:
+        return templates[0] if len(templates) else None
+    return set(templates)
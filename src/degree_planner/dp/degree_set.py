@@ -0,0 +1,198 @@
+'''
+Degree_Set class
+'''
+
+import timeit
+from .degree import Degree
+from ..io.output import Output
+from ..math.flow import Cost_Flow_Network
+from ..math.budget import Budgeted_Result
+from ..math.budget import budget_deadline
+
+
+class Degree_Set():
+    '''
+    Several degrees audited together over one set of taken courses, such as a double major or a
+    major and a minor.
+
+    Degrees may count the same course, but only shared_limit courses in total may count toward more
+    than one degree (a course counted by three degrees uses two). Which degree gets which course is
+    decided once for all of them by an importance weighted minimum cost flow over every template:
+
+        source -> template (capacity: courses required, cost: -weight) -> course in a degree (capacity: 1)
+            -> course -> sink (capacity: 1)
+                      -> shared -> sink (capacity: shared_limit)
+
+    A course reaches the sink once for free and once more through the shared node for every other degree
+    counting it, at a cost below any template slot, so a course is only shared when it fills a slot no
+    other course can. Templates are weighted together in order of importance, ties broken by the order of
+    the degrees, so the first templates of every degree come before the last ones of any. Wildcard
+    templates want every course any of their matches want.
+
+    That makes the allocation an approximation, since a wildcard template ends up counting the courses of
+    only one match. With courses c1 {concentration.x} and c2 {concentration.y}, a first degree requiring 2
+    'concentration.*' courses, a second requiring 1 'concentration.y' course and no sharing, both courses go
+    to the first degree, which can only count c1, and the second degree is left short.
+
+    Every degree is then fulfilled by its own engine over the courses given to it: the ones the flow used
+    for it, and courses the flow left unused, which go to the first degree that wants them. Two degrees
+    only have a course in common if the flow shared it, so the limit holds whatever the engine does.
+    Without a limit degrees don't compete for courses and every degree gets every course.
+
+    Templates with the same specifications in different degrees are matched once.
+    '''
+
+    def __init__(self, degrees:list=None, shared_limit:int=None):
+        self.degrees = list() # in order of priority, the first degree wins ties for a course
+        self.shared_limit = shared_limit # most courses that may count toward more than one degree, None for no limit
+        self.io = Output(Output.OUT.CONSOLE, auto_clear=True)
+        if degrees is not None:
+            for degree in degrees:
+                self.add_degree(degree)
+
+    def add_degree(self, degree:Degree) -> None:
+        ''' degrees should be added in order of priority, names must be unique '''
+        if self.get_degree(degree.name) is not None:
+            return
+        self.degrees.append(degree)
+
+    def remove_degree(self, degree:Degree) -> None:
+        self.degrees.remove(degree)
+
+    def get_degree(self, degree_name:str) -> Degree:
+        for degree in self.degrees:
+            if degree.name == degree_name:
+                return degree
+        return None
+
+    def relevant(self, course) -> bool:
+        return any([degree.relevant(course) for degree in self.degrees])
+
+    def version(self) -> tuple:
+        return tuple([degree.version() for degree in self.degrees]) + (self.shared_limit,)
+
+
+    ##############################################################################################
+    # fulfillment
+    ##############################################################################################
+
+    def fulfillment(self, taken_courses:set, engine:str=None, cached:bool=True, budget_ms:float=None, deadline:float=None) -> Budgeted_Result:
+        '''
+        fulfillment of every degree over one set of taken courses, respecting shared_limit
+
+        Parameters:
+            taken_courses (set): all courses taken
+            engine (str): fulfillment engine of every degree, defaults to each degree's own
+            cached (bool): passed on to Degree.fulfillment
+            budget_ms (float): milliseconds all degrees may take together, None for no limit
+            deadline (float): timeit.default_timer time all degrees must be done by, None for no limit
+
+        Returns:
+            fulfillments (Budgeted_Result): {degree name : Degree.fulfillment result}, truncated if the
+                deadline cut short any degree, explored is the number of combinations computed
+        '''
+        start = timeit.default_timer()
+        deadline = budget_deadline(budget_ms, deadline)
+        taken_courses = set(taken_courses)
+
+        matches = dict() # shared by every degree
+        if self.shared_limit is None:
+            allocation = {degree.name:taken_courses for degree in self.degrees}
+        else:
+            max_fulfillments = {degree.name:degree.max_fulfillment_possibilities(taken_courses, matches) for degree in self.degrees}
+            allocation = self.allocate(max_fulfillments)
+
+        fulfillments = Budgeted_Result()
+        for degree in self.degrees:
+            fulfillment = degree.fulfillment(allocation.get(degree.name), engine=engine, cached=cached, deadline=deadline, matches=matches)
+            fulfillments.update({degree.name:fulfillment})
+            fulfillments.truncated = fulfillments.truncated or fulfillment.truncated
+            fulfillments.explored += fulfillment.explored
+        fulfillments.optimal = not fulfillments.truncated
+
+        end = timeit.default_timer()
+        self.io.info(f'\ndegree set fulfillment runtime: {end - start}, {len(shared_courses(fulfillments))} shared courses\n')
+        return fulfillments
+
+    def allocate(self, max_fulfillments:dict) -> dict:
+        '''
+        decides which degrees may count each course, see the class description
+
+        Parameters:
+            max_fulfillments (dict): {degree name : Degree.max_fulfillment_possibilities}
+
+        Returns:
+            allocation (dict): {degree name : courses the degree may count}
+        '''
+        # every course a template wants, through any of its wildcard matches
+        wanted = dict() # {degree name : [(template, courses)]}
+        courses = set()
+        for degree in self.degrees:
+            wanted.update({degree.name:list()})
+            for possibilities in max_fulfillments.get(degree.name):
+                template_courses = set()
+                for possibility in possibilities:
+                    template_courses.update(possibility.get_fulfillment_set())
+                wanted.get(degree.name).append((possibilities[0].get_template(), template_courses))
+                courses.update(template_courses)
+        courses = sorted(courses, key=lambda course: course.unique_name)
+
+        templates = list() # (degree position, template, courses) in order of weight
+        for i, degree in enumerate(self.degrees):
+            templates.extend([(i, template, template_courses) for template, template_courses in wanted.get(degree.name)])
+        templates.sort(key=lambda entry: (-entry[1].importance, entry[0]))
+        base = sum([template.courses_required for i, template, template_courses in templates]) + len(courses) * len(self.degrees) + 1
+
+        network = Cost_Flow_Network(3)
+        shared = 2
+        network.add_edge(shared, 1, self.shared_limit)
+        course_nodes = dict()
+        for course in courses:
+            course_nodes.update({course:network.add_node()})
+            network.add_edge(course_nodes.get(course), 1, 1)
+            network.add_edge(course_nodes.get(course), shared, len(self.degrees) - 1, 1)
+
+        degree_nodes = dict() # {(degree position, course) : node of the course in the degree}
+        degree_edges = dict() # {(degree position, course) : edge from the course in the degree to the course}
+        for rank, (i, template, template_courses) in enumerate(templates):
+            node = network.add_node()
+            network.add_edge(0, node, template.courses_required, -base ** (len(templates) - rank))
+            for course in sorted(template_courses, key=lambda course: course.unique_name):
+                if (i, course) not in degree_nodes:
+                    degree_nodes.update({(i, course):network.add_node()})
+                    degree_edges.update({(i, course):network.add_edge(degree_nodes.get((i, course)), course_nodes.get(course), 1)})
+                network.add_edge(node, degree_nodes.get((i, course)), 1)
+        network.min_cost_flow(0, 1)
+
+        allocation = {degree.name:set() for degree in self.degrees}
+        used = set()
+        for (i, course), e in degree_edges.items():
+            if network.flow(e):
+                allocation.get(self.degrees[i].name).add(course)
+                used.add(course)
+
+        # courses the flow didn't need can't fill a slot without going over the limit, they go to the first
+        # degree that wants them so they are still counted, as excess or by replacement templates
+        for (i, course), e in sorted(degree_edges.items(), key=lambda entry: entry[0][0]):
+            if course not in used:
+                allocation.get(self.degrees[i].name).add(course)
+                used.add(course)
+        return allocation
+
+
+def shared_courses(fulfillments:dict) -> set:
+    '''
+    courses counted toward more than one degree
+
+    Parameters:
+        fulfillments (dict): {degree name : {Template : Fulfillment_Status}}, as from Degree_Set.fulfillment
+    '''
+    counted = set()
+    shared = set()
+    for fulfillment in fulfillments.values():
+        degree_courses = set()
+        for status in fulfillment.values():
+            degree_courses.update(status.get_fulfillment_set())
+        shared.update(counted.intersection(degree_courses))
+        counted.update(degree_courses)
+    return shared
@@ -16,6 +16,7 @@ class Fulfillment_Status():
         self.template = template
         self.required = required_count
         self.fulfillment_set = fulfillment_set
+        self.table = None # Fulfillment_Table told about every course added or removed
 
     def fulfilled(self):
         return self.get_actual_count() - self.get_required_count() >= 0
@@ -25,6 +26,8 @@ class Fulfillment_Status():
     
     def set_required_count(self, requires) -> None:
         self.required = requires
+        if self.table is not None:
+            self.table.recount(self.template, self)
 
     def get_actual_count(self) -> int:
         return len(self.fulfillment_set)
@@ -33,7 +36,10 @@ class Fulfillment_Status():
         return self.fulfillment_set
     
     def set_fulfillment_set(self, fulfillment_set:set) -> None:
+        previous_set = self.fulfillment_set
         self.fulfillment_set = fulfillment_set
+        if self.table is not None:
+            self.table.rebind(self, previous_set)
 
     def set_template(self, template) -> None:
         self.template = template
@@ -47,9 +53,15 @@ class Fulfillment_Status():
     def add_fulfillment_course(self, course) -> bool:
         len_original = len(self.fulfillment_set)
         if hasattr(course, '__iter__'):
+            if self.table is not None:
+                for c in course:
+                    self.add_fulfillment_course(c)
+                return
             self.fulfillment_set.update(course)
             return
         self.fulfillment_set.add(course)
+        if self.table is not None and len_original != len(self.fulfillment_set):
+            self.table.bind(self, course)
         return len_original != len(self.fulfillment_set)
 
     """
@@ -58,6 +70,8 @@ class Fulfillment_Status():
     def remove_fulfillment_course(self, course:Course) -> bool:
         len_original = len(self.fulfillment_set)
         self.fulfillment_set.discard(course)
+        if self.table is not None and len_original != len(self.fulfillment_set):
+            self.table.unbind(self, course)
         return len_original != len(self.fulfillment_set)
 
     def unfulfilled_count(self) -> int:
@@ -104,3 +118,9 @@ class Fulfillment_Status():
     
     def __hash__(self):
         return hash(self.template) + self.required + 10
+
+    def __getstate__(self):
+        # copies don't belong to the table this status reports to
+        state = dict(self.__dict__)
+        state.update({'table':None})
+        return state
@@ -0,0 +1,276 @@
+'''
+Fulfillment_Table class
+'''
+
+from .fulfillment_status import Fulfillment_Status
+from ..math.bitset import Bitset_Index
+
+
+class Fulfillment_Table(dict):
+    '''
+    {Template : Fulfillment_Status} that keeps a template x course incidence structure up to date,
+    so questions about one course (how many templates hold it, which ones, can it be taken away)
+    are answered with a few integer operations instead of scanning every fulfillment set.
+
+    Templates are rows, each given a bit by a Bitset_Index. Every course bound to some template has a
+    column, the mask of rows holding it, and rows are also grouped into masks by replacement and by
+    how full they are. Tables that share their rows index line up row for row, which is how a table of
+    current fulfillments is compared with a table of max fulfillments.
+
+    Statuses added to a tracked table report every course they gain or lose to it, so the incidence
+    stays consistent through Fulfillment_Status.add_fulfillment_course, remove_fulfillment_course and
+    set_fulfillment_set. A status reports to one table at a time, the last one it was added to.
+
+    Changes can also be journaled: checkpoint starts recording course moves and template insertions
+    and removals, rollback undoes everything after a checkpoint in reverse order, and commit keeps it.
+    Speculative moves are then undone in the number of moves made, whatever the size of the table.
+    Templates removed and restored by a rollback are added back at the end of the table.
+    '''
+
+    def __init__(self, fulfillments:dict=None, rows:Bitset_Index=None, track:bool=True):
+        super().__init__()
+        self.rows = rows if rows is not None else Bitset_Index()
+        self.track = track # if False statuses aren't told about this table, for one off views of plain dictionaries
+        self.columns = dict() # {course : mask of rows holding it}
+        self.present = 0 # rows of templates in this table
+        self.replacement = 0 # rows of replacement templates
+        self.excess = 0 # rows with more courses than required
+        self.unfulfilled = 0 # rows with fewer courses than required
+        self.order = dict() # {template : insertion number}, so the first template holding a course is found in dict order
+        self.row_templates = dict() # {row : template key in this table}
+        self.inserted = 0
+        self.importance_masks = dict() # {importance level : rows of at least that importance}
+        self.journal = None # [(change, ...)] since the first open checkpoint, None when not recording
+        self.changed = set() # templates whose courses changed since the last take_changed
+        if fulfillments is not None:
+            self.update(fulfillments)
+
+    ##############################################################################################
+    # dictionary interface, every insertion and removal of a status goes through link/unlink
+    ##############################################################################################
+
+    def __setitem__(self, template, status:Fulfillment_Status):
+        previous = dict.get(self, template, None)
+        if previous is status:
+            return
+        if self.journal is not None:
+            self.journal.append(('insert', template) if previous is None else ('replace', template, previous))
+        if previous is not None:
+            # replaced in place, the template keeps its position like in a dictionary
+            self.unlink(template, previous)
+            dict.__setitem__(self, template, status)
+            self.link(template, status)
+            return
+        dict.__setitem__(self, template, status)
+        self.order.update({template:self.inserted})
+        self.inserted += 1
+        self.link(template, status)
+
+    def update(self, fulfillments=None, **kwargs):
+        if fulfillments is not None:
+            items = fulfillments.items() if hasattr(fulfillments, 'items') else fulfillments
+            for template, status in items:
+                self[template] = status
+
+    def __delitem__(self, template):
+        self.pop(template)
+
+    def pop(self, template, *default):
+        if template not in self:
+            if len(default):
+                return default[0]
+            raise KeyError(template)
+        status = dict.pop(self, template)
+        if self.journal is not None:
+            self.journal.append(('pop', template, status))
+        self.order.pop(template, None)
+        self.unlink(template, status)
+        return status
+
+    def clear(self):
+        for template in list(self.keys()):
+            self.pop(template)
+
+    def link(self, template, status:Fulfillment_Status) -> None:
+        row = self.rows.add(template)
+        bit = 1 << row
+        self.row_templates.update({row:template})
+        self.changed.add(template)
+        self.present |= bit
+        if template.replacement:
+            self.replacement |= bit
+        self.importance_masks.clear()
+        for course in status.get_fulfillment_set():
+            self.columns.update({course:self.columns.get(course, 0) | bit})
+        self.recount(template, status)
+        if self.track:
+            status.table = self
+
+    def unlink(self, template, status:Fulfillment_Status) -> None:
+        row = self.rows.add(template)
+        bit = 1 << row
+        self.row_templates.pop(row, None)
+        self.changed.add(template)
+        self.present &= ~bit
+        self.replacement &= ~bit
+        self.excess &= ~bit
+        self.unfulfilled &= ~bit
+        self.importance_masks.clear()
+        for course in status.get_fulfillment_set():
+            self.unbind_bit(course, bit)
+        if status.table is self:
+            status.table = None
+
+    ##############################################################################################
+    # updates reported by statuses
+    ##############################################################################################
+
+    def bind(self, status:Fulfillment_Status, course) -> None:
+        if self.journal is not None:
+            self.journal.append(('bind', status, course))
+        self.changed.add(status.get_template())
+        bit = 1 << self.rows.add(status.get_template())
+        self.columns.update({course:self.columns.get(course, 0) | bit})
+        self.recount(status.get_template(), status)
+
+    def unbind(self, status:Fulfillment_Status, course) -> None:
+        if self.journal is not None:
+            self.journal.append(('unbind', status, course))
+        self.changed.add(status.get_template())
+        self.unbind_bit(course, 1 << self.rows.add(status.get_template()))
+        self.recount(status.get_template(), status)
+
+    def rebind(self, status:Fulfillment_Status, previous_set) -> None:
+        '''
+        the status replaced its fulfillment set, previous_set is the set it had before
+        '''
+        if self.journal is not None:
+            self.journal.append(('set', status, previous_set))
+        self.changed.add(status.get_template())
+        bit = 1 << self.rows.add(status.get_template())
+        for course in previous_set:
+            self.unbind_bit(course, bit)
+        for course in status.get_fulfillment_set():
+            self.columns.update({course:self.columns.get(course, 0) | bit})
+        self.recount(status.get_template(), status)
+
+    def unbind_bit(self, course, bit:int) -> None:
+        mask = self.columns.get(course, 0) & ~bit
+        if mask:
+            self.columns.update({course:mask})
+        else:
+            self.columns.pop(course, None)
+
+    def recount(self, template, status:Fulfillment_Status) -> None:
+        bit = 1 << self.rows.add(template)
+        self.excess = self.excess | bit if status.get_actual_count() > status.get_required_count() else self.excess & ~bit
+        self.unfulfilled = self.unfulfilled | bit if status.get_actual_count() < status.get_required_count() else self.unfulfilled & ~bit
+
+    ##############################################################################################
+    # journal
+    ##############################################################################################
+
+    def checkpoint(self) -> int:
+        '''
+        starts recording changes if not already, returns the point to rollback or commit to
+        '''
+        if self.journal is None:
+            self.journal = list()
+        return len(self.journal)
+
+    def rollback(self, point:int) -> None:
+        '''
+        undoes every change made after the checkpoint
+        '''
+        journal = self.journal
+        self.journal = None # undoing isn't recorded
+        while len(journal) > point:
+            change = journal.pop()
+            if change[0] == 'bind':
+                change[1].remove_fulfillment_course(change[2])
+            elif change[0] == 'unbind':
+                change[1].add_fulfillment_course(change[2])
+            elif change[0] == 'set':
+                change[1].set_fulfillment_set(change[2])
+            elif change[0] == 'insert':
+                self.pop(change[1])
+            else:
+                self[change[1]] = change[2]
+        self.journal = journal if point > 0 else None
+
+    def commit(self, point:int) -> None:
+        '''
+        keeps every change made after the checkpoint, they can still be undone by rolling back an earlier one
+        '''
+        if point == 0:
+            self.journal = None
+
+    def take_changed(self) -> set:
+        '''
+        templates that gained or lost courses, or were added or removed, since the last call
+        '''
+        changed = self.changed
+        self.changed = set()
+        return changed
+
+    ##############################################################################################
+    # queries
+    ##############################################################################################
+
+    def type_mask(self, replacement=None) -> int:
+        '''
+        rows of replacement templates if replacement is True, non replacement templates if False, all if None
+        '''
+        if replacement is None:
+            return self.present
+        return self.replacement if replacement else self.present & ~self.replacement
+
+    def importance_mask(self, importance_level:int) -> int:
+        '''
+        rows of templates with importance of at least importance_level
+        '''
+        mask = self.importance_masks.get(importance_level, None)
+        if mask is None:
+            mask = 0
+            for template in self.keys():
+                if template.importance >= importance_level:
+                    mask |= 1 << self.rows.add(template)
+            self.importance_masks.update({importance_level:mask})
+        return mask
+
+    def column(self, course) -> int:
+        try:
+            return self.columns.get(course, 0)
+        except TypeError:
+            # a set of courses (set or Bitset) is in no column, like a set looked up in a set
+            return 0
+
+    def count(self, course, replacement=None) -> int:
+        return (self.columns.get(course, 0) & self.type_mask(replacement)).bit_count()
+
+    def templates(self, mask:int) -> list:
+        '''
+        templates of the rows in mask, in the order they were added to this table
+        '''
+        templates = list()
+        while mask:
+            low = mask & -mask
+            templates.append(self.row_templates.get(low.bit_length() - 1))
+            mask ^= low
+        templates.sort(key=lambda template: self.order.get(template))
+        return templates
+
+    def bound_courses(self) -> list:
+        '''
+        every course held by at least one template
+        '''
+        return list(self.columns.keys())
+
+
+def fulfillment_table(fulfillments:dict, rows:Bitset_Index=None) -> Fulfillment_Table:
+    '''
+    fulfillments itself if it is a table over rows (any rows if None), otherwise an untracked table built from it
+    '''
+    if isinstance(fulfillments, Fulfillment_Table) and (rows is None or fulfillments.rows is rows):
+        return fulfillments
+    return Fulfillment_Table(fulfillments, rows, track=False)
@@ -0,0 +1,127 @@
+'''
+Match_Table class
+'''
+
+import os
+import json
+import hashlib
+import tempfile
+
+from .template import Template
+from .fulfillment_status import Fulfillment_Status
+from .predicate import Attribute_Predicate
+
+MATCH_TABLE_FORMAT = 1 # part of every key, changed whenever matching or the file layout changes
+
+
+class Match_Table():
+    '''
+    Every template of a degree matched against the entire catalog, along with every wildcard free
+    template its wildcards expand to. Catalog wide matches only change with the catalog or the degree,
+    so they are compiled once per version instead of on every recommendation.
+
+    Tables are keyed by a hash of the contents of the catalog and the degree (see match_table_key) and
+    can be stored to and loaded from a folder, one json file per key, so a restart with the same catalog
+    and degree loads them instead of matching again.
+    '''
+
+    def __init__(self, key:str):
+        self.key = key
+        self.matches = dict() # {specifications : [(wildcard free specifications, set of courses)]}
+        self.version = None # (catalog version, degree version) the table was compiled for, set by the catalog
+
+    def compile(self, catalog, degree) -> None:
+        for template in degree.templates:
+            specifications = template.original_specifications if template.original_specifications is not None else template.specifications
+            self.add(catalog, Template(template.name, list(specifications), template.replacement, template.courses_required))
+
+    def add(self, catalog, template:Template) -> list:
+        matches = [(tuple(status.get_template().specifications), set(status.get_fulfillment_set())) for status in catalog.course_match(template)]
+        self.matches.update({tuple(template.specifications):matches})
+        return matches
+
+    def get_course_match(self, catalog, template:Template) -> list:
+        '''
+        same as Catalog.course_match of the template over the entire catalog, the fulfillment sets are
+        new sets that may be modified. Templates that aren't in the table are matched and added to it
+        '''
+        matches = self.matches.get(tuple(template.specifications))
+        if matches is None:
+            matches = self.add(catalog, template)
+
+        if template.original_specifications is None:
+            template.original_specifications = list(template.specifications)
+        fulfillment_sets = list()
+        for specifications, courses in matches:
+            match = template if list(specifications) == template.specifications else template.derive(specifications)
+            fulfillment_sets.append(Fulfillment_Status(match, template.courses_required, set(courses)))
+        return fulfillment_sets
+
+    def store(self, folder:str) -> None:
+        '''
+        writes the table to folder/<key>.json, raises OSError if the folder can't be written to
+        '''
+        data = {'key':self.key, 'matches':[[list(specifications), [[list(match), sorted([course.unique_name for course in courses])]
+            for match, courses in matches]] for specifications, matches in self.matches.items()]}
+        os.makedirs(folder, exist_ok=True)
+        # written aside and moved in place, so a process reading the table never sees half of it. Every
+        # writer gets its own temporary file, processes storing the same table can't write into each other's
+        descriptor, temporary_path = tempfile.mkstemp(dir=folder, prefix=f'{self.key}.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump(data, f)
+            os.replace(temporary_path, os.path.join(folder, f'{self.key}.json'))
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    @staticmethod
+    def load(folder:str, key:str, courses:dict):
+        '''
+        Parameters:
+            folder (str): folder tables are stored in
+            key (str): key of the table, see match_table_key
+            courses (dict): {unique name : Course} of the catalog
+
+        Returns:
+            table (Match_Table): the stored table, None if there is none or it doesn't fit the catalog
+        '''
+        path = os.path.join(folder, f'{key}.json')
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('key') != key:
+                return None
+            table = Match_Table(key)
+            for specifications, matches in data.get('matches'):
+                table.matches.update({tuple(specifications):[(tuple(match), set([courses[name] for name in names])) for match, names in matches]})
+            return table
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def match_table_key(courses, degree) -> str:
+    '''
+    hash of everything the matches of a degree depend on: the specifications of every template, and the
+    name of every course with its attributes under the heads the specifications test (all of them if
+    a specification builds attributes from brackets)
+    '''
+    digest = hashlib.sha256(str(MATCH_TABLE_FORMAT).encode())
+    heads = set()
+    for template in degree.templates:
+        specifications = template.original_specifications if template.original_specifications is not None else template.specifications
+        digest.update(json.dumps([template.name, specifications, template.replacement, template.courses_required]).encode())
+        for attribute in Template(template.name, list(specifications)).get_predicate().attributes():
+            if heads is not None and isinstance(attribute, Attribute_Predicate):
+                heads.add(attribute.key.split('.')[0])
+            else:
+                heads = None
+
+    # one string for every course, fields separated by characters that can't be in names or attributes
+    def tested(course) -> list:
+        return sorted([attribute for attribute in course.attributes if heads is None or attribute.split('.')[0] in heads])
+    digest.update('\n'.join(sorted(['\0'.join([course.unique_name] + tested(course)) for course in courses])).encode())
+    return digest.hexdigest()
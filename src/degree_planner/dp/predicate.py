@@ -0,0 +1,415 @@
+'''
+Compiled template specifications
+
+A template specification such as "level.4+ & (subject.csci | subject.ecse)" is parsed
+once into an immutable expression tree. Evaluating a course against the tree is a plain
+walk over the nodes with no string slicing or re-parsing.
+'''
+
+from .course import Course
+from ..math.attribute_index import Attribute_Index
+from ..math.attribute_index import EMPTY
+
+
+class Predicate():
+    '''
+    Base class of every node inside a compiled specification
+    '''
+
+    __slots__ = ()
+
+    def evaluate(self, course:Course, conditions:dict, groups:list) -> bool:
+        '''
+        Parameters:
+            course (Course): course being tested
+            conditions (dict): wildcard values that evaluated to true are added to this dictionary
+                in the form of {wildcard attribute : [matched attributes]}
+            groups (list): values of the bracketed sub-expressions of the enclosing expression
+
+        Returns:
+            truth (bool): whether the course satisfies this node
+        '''
+        raise NotImplementedError
+
+    def match(self, index:Attribute_Index, universe:set, groups:list) -> set:
+        '''
+        Set version of evaluate, finds every course in the index satisfying this node
+
+        Parameters:
+            index (Attribute_Index): inverted index of the courses to search
+            universe (set): only courses within this set are returned, None for all indexed courses
+            groups (list): matched sets of the bracketed sub-expressions of the enclosing expression
+
+        Returns:
+            matches (set): courses satisfying this node, must not be modified by the caller
+        '''
+        raise NotImplementedError
+
+    def attributes(self) -> list:
+        ''' every attribute node below this node, in order of appearance '''
+        return []
+
+    def conjuncts(self) -> list:
+        ''' nodes that must all be true for this node to be true '''
+        return [self]
+
+
+class Constant_Predicate(Predicate):
+
+    __slots__ = ('value',)
+
+    def __init__(self, value:bool):
+        self.value = value
+
+    def evaluate(self, course, conditions, groups):
+        return self.value
+
+    def match(self, index, universe, groups):
+        if not self.value:
+            return EMPTY
+        return index.items if universe is None else universe
+
+    def __repr__(self):
+        return str(self.value)
+
+
+class Group_Predicate(Predicate):
+    '''
+    References the value of a bracketed sub-expression. Brackets are always evaluated before
+    the expression that contains them, from left to right, so wildcards inside brackets report
+    their conditions even if the surrounding operator short circuits.
+    '''
+
+    __slots__ = ('index',)
+
+    def __init__(self, index:int):
+        self.index = index
+
+    def evaluate(self, course, conditions, groups):
+        return groups[self.index]
+
+    def match(self, index, universe, groups):
+        return groups[self.index]
+
+    def __repr__(self):
+        return f'({self.index})'
+
+
+class And_Predicate(Predicate):
+
+    __slots__ = ('left', 'right')
+
+    def __init__(self, left:Predicate, right:Predicate):
+        self.left = left
+        self.right = right
+
+    def evaluate(self, course, conditions, groups):
+        return self.left.evaluate(course, conditions, groups) and self.right.evaluate(course, conditions, groups)
+
+    def match(self, index, universe, groups):
+        left = self.left.match(index, universe, groups)
+        if not len(left):
+            return EMPTY
+        return left & self.right.match(index, universe, groups)
+
+    def attributes(self):
+        return self.left.attributes() + self.right.attributes()
+
+    def conjuncts(self):
+        return self.left.conjuncts() + self.right.conjuncts()
+
+    def __repr__(self):
+        return f'[{self.left!r} & {self.right!r}]'
+
+
+class Or_Predicate(Predicate):
+
+    __slots__ = ('left', 'right')
+
+    def __init__(self, left:Predicate, right:Predicate):
+        self.left = left
+        self.right = right
+
+    def evaluate(self, course, conditions, groups):
+        return self.left.evaluate(course, conditions, groups) or self.right.evaluate(course, conditions, groups)
+
+    def match(self, index, universe, groups):
+        return self.left.match(index, universe, groups) | self.right.match(index, universe, groups)
+
+    def attributes(self):
+        return self.left.attributes() + self.right.attributes()
+
+    def __repr__(self):
+        return f'[{self.left!r} | {self.right!r}]'
+
+
+class Attribute_Predicate(Predicate):
+    '''
+    A single attribute test. The kind of test is decided once at compile time:
+
+        EXACT     course has the attribute (subject.csci)
+        GE / LE   course has an attribute under the head that is >= or <= the tail (level.4+)
+        WILDCARD  course has any attribute under the head, reports the matches (concentration.*)
+        ANY       course has any attribute under the head (concentration.#)
+    '''
+
+    EXACT = 0
+    GE = 1
+    LE = 2
+    WILDCARD = 3
+    ANY = 4
+
+    __slots__ = ('text', 'kind', 'key')
+
+    def __init__(self, text:str):
+        self.text = text
+        if len(text) and text[-1] == '+':
+            self.kind = Attribute_Predicate.GE
+            self.key = text[:-1]
+        elif len(text) and text[-1] == '-':
+            self.kind = Attribute_Predicate.LE
+            self.key = text[:-1]
+        elif '*' in text:
+            self.kind = Attribute_Predicate.WILDCARD
+            self.key = text[:text.find('*') - 1]
+        elif '#' in text:
+            self.kind = Attribute_Predicate.ANY
+            self.key = text[:text.find('#') - 1]
+        else:
+            self.kind = Attribute_Predicate.EXACT
+            self.key = text
+
+    def evaluate(self, course, conditions, groups):
+        if self.kind == Attribute_Predicate.EXACT:
+            return course.has_attribute(self.key)
+        if self.kind == Attribute_Predicate.GE:
+            return len(course.get_attributes_ge(self.key)) > 0
+        if self.kind == Attribute_Predicate.LE:
+            return len(course.get_attributes_le(self.key)) > 0
+        if self.kind == Attribute_Predicate.WILDCARD:
+            matches = course.get_attributes_by_head(self.key)
+            if len(matches) and conditions is not None:
+                conditions.update({self.text:matches})
+            return len(matches) > 0
+        return len(course.get_attributes_by_head(self.key)) > 0
+
+    def match(self, index, universe, groups):
+        if self.kind == Attribute_Predicate.GE:
+            matches = index.items_ge(self.key)
+        elif self.kind == Attribute_Predicate.LE:
+            matches = index.items_le(self.key)
+        else:
+            # wildcards and # only need the head to be present, same as an exact match on the head
+            matches = index.items_with(self.key)
+        if universe is None:
+            return matches
+        return universe & matches if len(universe) < len(matches) else matches & universe
+
+    def attributes(self):
+        return [self]
+
+    def __repr__(self):
+        return self.text
+
+
+class Composite_Predicate(Predicate):
+    '''
+    An attribute that was written directly against a bracket, such as "bin.(1)". The text
+    of the attribute is only known once the bracket is evaluated, so this is the one node
+    that still builds a string at evaluation time. Valid specifications never produce it.
+    '''
+
+    __slots__ = ('pieces',)
+
+    def __init__(self, pieces:tuple):
+        self.pieces = pieces # alternating text and group indices, starting with text
+
+    def evaluate(self, course, conditions, groups):
+        text = ''
+        for i in range(0, len(self.pieces)):
+            text += self.pieces[i] if i % 2 == 0 else str(groups[self.pieces[i]])
+        return compile_atom(text.strip()).evaluate(course, conditions, groups)
+
+    def match(self, index, universe, groups):
+        # group values are sets here, so every course is evaluated with its own group values
+        courses = index.items if universe is None else universe
+        return {course for course in courses if self.evaluate(course, None, [course in e for e in groups])}
+
+    def attributes(self):
+        # an attribute too, though which one is only known at evaluation time
+        return [self]
+
+    def __repr__(self):
+        return ''.join([e if i % 2 == 0 else f'({e})' for i, e in enumerate(self.pieces)])
+
+
+class Expression():
+    '''
+    A compiled expression: the bracketed sub-expressions that must be evaluated first and
+    the operator tree that combines them
+    '''
+
+    __slots__ = ('groups', 'root')
+
+    def __init__(self, groups:tuple, root:Predicate):
+        self.groups = groups
+        self.root = root
+
+    def evaluate(self, course:Course, conditions:dict=None) -> bool:
+        values = [group.evaluate(course, conditions) for group in self.groups]
+        return self.root.evaluate(course, conditions, values)
+
+    def match(self, index:Attribute_Index, universe:set=None) -> set:
+        values = [group.match(index, universe) for group in self.groups]
+        return self.root.match(index, universe, values)
+
+    def attributes(self) -> list:
+        attributes = list()
+        for group in self.groups:
+            attributes.extend(group.attributes())
+        attributes.extend(self.root.attributes())
+        return attributes
+
+    def conjunctive_attributes(self) -> list:
+        '''
+        attribute nodes that must be true for the expression to be true, following brackets
+        that are themselves conjuncts
+        '''
+        attributes = list()
+        for node in self.root.conjuncts():
+            if isinstance(node, Attribute_Predicate):
+                attributes.append(node)
+            elif isinstance(node, Group_Predicate):
+                attributes.extend(self.groups[node.index].conjunctive_attributes())
+        return attributes
+
+    def __repr__(self):
+        if not len(self.groups):
+            return repr(self.root)
+        return f"{self.root!r} where {', '.join([f'({i}) = {g!r}' for i, g in enumerate(self.groups)])}"
+
+
+class Specification():
+    '''
+    All specifications of a template compiled together. A course fulfills the template
+    if it satisfies every specification.
+    '''
+
+    __slots__ = ('expressions', 'wildcards', 'conjunctive')
+
+    def __init__(self, specifications:list):
+        expressions = list()
+        for attr in specifications:
+            if 'NA' in attr or 'ANY' in attr or '-1' in attr:
+                continue
+            expressions.append(compile_attribute(attr))
+        self.expressions = tuple(expressions)
+        wildcards = [e for e in self.attributes() if isinstance(e, Attribute_Predicate) and e.kind == Attribute_Predicate.WILDCARD]
+        self.wildcards = len(wildcards) > 0
+
+        # when every wildcard is a conjunct, a matched course reports every wildcard and fulfills the
+        # template with a wildcard replaced by a value exactly when it has that value
+        conjuncts = set()
+        for expression in self.expressions:
+            conjuncts.update([id(e) for e in expression.conjunctive_attributes()])
+        self.conjunctive = all([id(e) in conjuncts for e in wildcards])
+
+    def evaluate(self, course:Course):
+        '''
+        Returns:
+            good_match (bool): whether the course fulfills all specifications
+            conditions (dict): wildcard values used to reach the match, empty if not matched
+        '''
+        conditions = dict()
+        for expression in self.expressions:
+            if not expression.evaluate(course, conditions):
+                return False, {}
+        return True, conditions
+
+    def match(self, index:Attribute_Index, universe:set=None) -> set:
+        '''
+        Returns:
+            matches (set): a new set of all courses in universe (or the index if None) that fulfills
+                all specifications. Wildcard values are not reported, evaluate the matches if needed
+        '''
+        matches = index.items if universe is None else universe
+        for expression in self.expressions:
+            if not len(matches):
+                break
+            matches = matches & expression.match(index, universe)
+        return set(matches)
+
+    def attributes(self) -> list:
+        attributes = list()
+        for expression in self.expressions:
+            attributes.extend(expression.attributes())
+        return attributes
+
+    def __repr__(self):
+        return ' && '.join([repr(e) for e in self.expressions])
+
+
+######################################
+# COMPILATION
+######################################
+
+GROUP_MARK = '\x00' # brackets are replaced by GROUP_MARK + index + GROUP_MARK before splitting on operators
+
+def compile_attribute(input_text:str) -> Expression:
+    '''
+    Input -> Attribute
+    Input -> True|False
+    Input -> (Input)
+    Input -> Input & Input
+    Input -> Input | Input
+
+    Brackets bind tightest, then |, then &. Operators associate to the right and a missing
+    closing bracket is assumed to be at the end of the input.
+    '''
+    groups = list()
+    text = ''
+    remaining = input_text
+    while '(' in remaining:
+        open_bracket_loc = remaining.find('(')
+        close_bracket_loc = len(remaining) # we allow close brackets to be omitted if it's at the end of the input
+        passed_bracket_count = 0
+
+        # calculate the location of the closing bracket for the current bracket
+        for i in range(open_bracket_loc + 1, len(remaining)):
+            if remaining[i] == '(':
+                passed_bracket_count += 1
+            if remaining[i] == ')':
+                if passed_bracket_count == 0:
+                    close_bracket_loc = i
+                    break
+                passed_bracket_count -= 1
+
+        groups.append(compile_attribute(remaining[open_bracket_loc + 1 : close_bracket_loc]))
+        text += remaining[: open_bracket_loc] + f'{GROUP_MARK}{len(groups) - 1}{GROUP_MARK}'
+        remaining = remaining[close_bracket_loc + 1:]
+    text += remaining
+
+    return Expression(tuple(groups), compile_operators(text))
+
+
+def compile_operators(text:str) -> Predicate:
+    if '&' in text:
+        and_loc = text.find('&')
+        return And_Predicate(compile_operators(text[: and_loc]), compile_operators(text[and_loc + 1:]))
+    if '|' in text:
+        or_loc = text.find('|')
+        return Or_Predicate(compile_operators(text[: or_loc]), compile_operators(text[or_loc + 1:]))
+    return compile_atom(text.strip())
+
+
+def compile_atom(text:str) -> Predicate:
+    if GROUP_MARK in text:
+        pieces = text.split(GROUP_MARK)
+        if len(pieces) == 3 and pieces[0] == '' and pieces[2] == '':
+            return Group_Predicate(int(pieces[1]))
+        return Composite_Predicate(tuple([int(e) if i % 2 else e for i, e in enumerate(pieces)]))
+    if text in ('', 'True'):
+        return Constant_Predicate(True)
+    if text == 'False':
+        return Constant_Predicate(False)
+    return Attribute_Predicate(text)
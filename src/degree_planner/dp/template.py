@@ -3,8 +3,17 @@ Course Template object
 '''
 
 import copy
+import itertools
 from .course import Course
 from .fulfillment_status import Fulfillment_Status
+from .predicate import Specification
+from .predicate import compile_attribute
+from ..math.attribute_index import Attribute_Index
+from ..math.lru_cache import LRU_Cache
+
+# attributes fulfillment depends on, assigning one increases the template's version, as do add_specification
+# and remove_specification. Specifications changed in place any other way are not noticed
+SIGNATURE_ATTRIBUTES = frozenset(('name', 'specifications', 'replacement', 'courses_required'))
 
 class Template():
     '''
@@ -29,19 +38,51 @@ class Template():
         self.replacement = replacement
         self.importance = 0 # used internally by degree, higher the number the more important it is
 
+        # specifications compiled into an expression tree, recompiled only when the specifications change
+        self.predicate = None
+        self.predicate_key = None
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in SIGNATURE_ATTRIBUTES:
+            # the degree recomputes its signature only when the version of one of its templates changed
+            super().__setattr__('version', self.__dict__.get('version', 0) + 1)
+
+    def compile(self) -> Specification:
+        '''
+        compiles the specifications into an expression tree so courses can be evaluated without
+        parsing strings. Called by the degree when the template is added, and again automatically
+        if the specifications were modified since.
+        '''
+        self.predicate_key = tuple(self.specifications)
+        self.predicate = Specification(self.specifications)
+        return self.predicate
+
+    def get_predicate(self) -> Specification:
+        if self.predicate is None or self.predicate_key != tuple(self.specifications):
+            return self.compile()
+        return self.predicate
+
     def add_specification(self, attr):
         self.specifications.append(attr)
+        self.version += 1
 
     def remove_specification(self, attr):
-        self.specifications.remove(attr, None)
+        if attr in self.specifications:
+            self.specifications.remove(attr)
+            self.version += 1
 
     def get_required_count(self):
         return self.courses_required
     
-    def get_course_match(self, courses) -> list:
+    def get_course_match(self, courses, index:Attribute_Index=None) -> list:
         '''
         Finds all courses that fulfills the given template
 
+        If an attribute index is provided, the matches are found through set operations on the index
+        instead of evaluating every course. courses may then be None to match against every indexed
+        course, courses that are not indexed are evaluated individually.
+
         Wildcards (*) may be used to dictate the fact that all courses within this template's fulfillment
         set must have the same values for that attribute. It doesn't matter which one, just so long as
         it's consistent. This is useful if we want a rule that says all courses must be in the same subject
@@ -65,14 +106,31 @@ class Template():
 
         fulfillment_sets = list() # all possible fulfillments based on different combinations resulting from wildcard sauge
         all_conditions = dict() # all possible wildcard replacement conditions that can influence the result (wildcard branching)
+        matched = list() # [(course, conditions)] of every matched course that reported wildcard values
 
         # current fulfillment set, will be added only if current template does not contain wildcards
         # (recursive calls remove one wildcard at a time), so essentially "leaf" branches
         # get to add their fulfillment to fulfillment_sets
         curr_fulfillment = Fulfillment_Status(self, self.courses_required, set())
+        predicate = self.get_predicate()
+
+        if self.original_specifications is None:
+            self.original_specifications = list(self.specifications)
+
+        candidates = courses
+        if index is not None:
+            universe = None if courses is None else set(courses)
+            candidates = predicate.match(index, universe)
+            if universe is not None:
+                candidates.update([c for c in universe if c not in index.items and predicate.evaluate(c)[0]])
+
+            # every candidate is a good match, without wildcards there are no conditions to collect
+            if not predicate.wildcards:
+                curr_fulfillment.set_fulfillment_set(candidates)
+                candidates = list()
 
-        for course in courses:
-            good_match, conditions = template_parsing.course_fulfills_template(self, course)
+        for course in candidates:
+            good_match, conditions = predicate.evaluate(course)
 
             # updates all_conditions with possible values for wildcard replacement
             for condition, condition_sat_set in conditions.items():
@@ -83,47 +141,88 @@ class Template():
             # if this is a leaf call (no wildcard branching), add to current fulfillment set
             if good_match and not len(conditions):
                 curr_fulfillment.add_fulfillment_course(course)
+            elif good_match:
+                matched.append((course, conditions))
 
         # if this is a leaf call (no wildcard branching), add to main fulfillment set
         if not len(all_conditions):
             fulfillment_sets.append(curr_fulfillment)
+            return fulfillment_sets
 
-        if self.original_specifications is None:
-            self.original_specifications = copy.deepcopy(self.specifications)
-
+        if predicate.conjunctive:
+            return self.group_wildcard_match(list(all_conditions.keys()), matched)
 
-        # if there are wildcard branching needed (we only need to pop the first one, the rest is handled by the following recursive calls
-        # as each recursive call only needs to handle one)
-        if not len(all_conditions):
-            return fulfillment_sets
+        # wildcards under an | may be skipped by some courses, so we branch on one wildcard at a time
+        # (the last one found, the rest is handled by the following recursive calls) and match again
         wildcard_attr, wildcard_choices = all_conditions.popitem()
 
-        for choice in wildcard_choices:
-            # for each branching choice, make a copy of the template with the wildcard replaced with a possible value
-            template_cpy = copy.deepcopy(self)
+        for choice in sorted(wildcard_choices):
+            # for each branching choice, make a template with the wildcard replaced with a possible value
+            template_cpy = self.substitute({wildcard_attr:choice})
 
-            # a temporary dictionary holding the old/new values, since we cannot update an object
-            # while iterating through it
-            replace_attributes = dict()
+            # recursively call this function, we're guaranteed that the final return values all are wildcard-free
+            fulfillment_sets.extend(template_cpy.get_course_match(courses, index))
 
-            for attribute_str in template_cpy.specifications:
-                if wildcard_attr not in attribute_str:
-                    continue
+        return fulfillment_sets
 
-                # we make a note of the replacements needed by storing it in replace_attributes
-                attribute_str_update = attribute_str.replace(wildcard_attr, choice)
-                replace_attributes.update({attribute_str:attribute_str_update})
+    def group_wildcard_match(self, wildcards:list, matched:list) -> list:
+        '''
+        Wildcard branching in a single pass, for templates where every wildcard is a conjunct
+        (e.g. subject.* & level.*). A matched course then fulfills the template with the wildcards
+        replaced by a tuple of values exactly when it has all of those values, so courses are
+        grouped by every value tuple they have instead of matching each replaced template again.
 
-            # we commit the changes to the specifications while iterating through the replace_attributes we made previously
-            for old, new in replace_attributes.items():
-                template_cpy.specifications.remove(old)
-                template_cpy.specifications.append(new)
+        Produces the same fulfillment sets as branching on one wildcard at a time, replacing
+        the last wildcard found first.
 
-            # recursively call this function, we're guaranteed that the final return values all are wildcard-free
-            fulfillment_sets.extend(template_cpy.get_course_match(courses))
+        Parameters:
+            wildcards (list): wildcard attributes in the order they were found
+            matched (list): [(course, conditions)] of every course matching this template
 
+        Returns:
+            fulfillment_sets (list): one wildcard-free fulfillment per value tuple, in sorted order
+        '''
+        wildcards = list(reversed(wildcards))
+        groups = dict() # {value tuple : {courses}}
+        for course, conditions in matched:
+            for values in itertools.product(*[sorted(conditions.get(wildcard)) for wildcard in wildcards]):
+                group = groups.get(values, None)
+                if group is None:
+                    group = set()
+                    groups.update({values:group})
+                group.add(course)
+
+        fulfillment_sets = list()
+        for values in sorted(groups.keys()):
+            template = self.substitute(dict(zip(wildcards, values)))
+            fulfillment_sets.append(Fulfillment_Status(template, template.courses_required, groups.get(values)))
         return fulfillment_sets
 
+    def substitute(self, replacements:dict):
+        '''
+        returns a new template with wildcards replaced by values, without copying this one
+
+        Parameters:
+            replacements (dict): {wildcard attribute : value}, applied in order. Specifications
+                that were changed are moved to the end, one replacement at a time
+        '''
+        specifications = list(self.specifications)
+        for wildcard_attr, choice in replacements.items():
+            unchanged = [attribute_str for attribute_str in specifications if wildcard_attr not in attribute_str]
+            changed = [attribute_str.replace(wildcard_attr, choice) for attribute_str in specifications if wildcard_attr in attribute_str]
+            specifications = unchanged + changed
+        return self.derive(specifications)
+
+    def derive(self, specifications:list):
+        '''
+        returns a new template like this one with different specifications, such as the wildcard
+        free specifications of one of its matches
+        '''
+        template = Template(self.name, list(specifications), self.replacement, self.courses_required)
+        template.importance = self.importance
+        template.original_specifications = list(self.original_specifications) if self.original_specifications is not None else None
+        return template
+
 
     def __repr__(self):
         string = f"Template {self.name}:\n"
@@ -165,43 +264,21 @@ class template_parsing():
     #
     # CONTEXT FREE GRAMMAR PARSING (thanks programming languages I do not miss you)
     #
+    # the grammar itself lives in predicate.py, specifications are compiled once into an
+    # expression tree and evaluated per course
+    #
     ###################################################################################################
 
-    @staticmethod
-    def course_fulfills_template(template:Template, course:Course):
-        conditions = dict()
-        for attr in template.specifications:
-            if 'NA' in attr or 'ANY' in attr or '-1' in attr:
-                continue
-            if not template_parsing.parse_attribute(attr, course, conditions):
-                return False, {}
-        return True, conditions
+    # {attribute string : Expression} for parse_attribute calls outside of templates, bounded since callers
+    # may parse any number of distinct strings over the life of the process
+    compiled_attributes = LRU_Cache(size=1024)
 
     @staticmethod
-    def single_attribute_evaluation(attr:str, course:Course):
-        attr = attr.strip()
-        if attr == '':
-            return True, {}
-        if attr in ('True', True):
-            return True, {}
-        if attr in ('False', False):
-            return False, {}
-
-        if len(attr) and attr[-1] == '+':
-            matches = course.get_attributes_ge(attr[:-1])
-            return (len(matches) > 0), {}
-        if len(attr) and attr[-1] == '-':
-            matches = course.get_attributes_le(attr[:-1])
-            return (len(matches) > 0), {}
-        if '*' in attr:
-            matches = course.get_attributes_by_head(attr[:attr.find('*') - 1])
-            return (len(matches) > 0), {attr:matches}
-        if '#' in attr:
-            return (len(course.get_attributes_by_head(attr[:attr.find('#') - 1])) > 0), {}
-        return (course.attr(attr) is not None), {}
+    def course_fulfills_template(template:Template, course:Course):
+        return template.get_predicate().evaluate(course)
 
     @staticmethod
-    def parse_attribute(input_text:str, course:Course, true_given_for_wildcards:dict=None) -> str:
+    def parse_attribute(input_text:str, course:Course, true_given_for_wildcards:dict=None) -> bool:
         '''
         Input -> Attribute
         Input -> True|False
@@ -209,39 +286,10 @@ class template_parsing():
         Input -> Input & Input
         Input -> Input | Input
 
-        single_attribute_evaluation(Attribute, course) -> True|False
-
         returns a True or False value based on whether the course fulfills the template
         '''
-        # print('accepted input ' + str(input))
-
-        if '(' in input_text:
-            open_bracket_loc = input_text.find('(')
-            close_bracket_loc = len(input_text) # we allow close brackets to be omitted if it's at the end of the input
-            passed_bracket_count = 0
-
-            # calculate the location of the closing bracket for the current bracket
-            for i in range(open_bracket_loc + 1, len(input_text)):
-                if input_text[i] == '(':
-                    passed_bracket_count += 1
-                if input_text[i] == ')':
-                    if passed_bracket_count == 0:
-                        close_bracket_loc = i
-                        break
-                    passed_bracket_count -= 1
-
-            new_string = input_text[: open_bracket_loc] + str(template_parsing.parse_attribute(input_text[open_bracket_loc + 1 : close_bracket_loc], course, true_given_for_wildcards)) + input_text[close_bracket_loc + 1:]
-            return template_parsing.parse_attribute(new_string, course, true_given_for_wildcards)
-        
-        if '&' in input_text:
-            and_loc = input_text.find('&')
-            return template_parsing.parse_attribute(input_text[: and_loc], course, true_given_for_wildcards) and template_parsing.parse_attribute(input_text[and_loc + 1:], course, true_given_for_wildcards)
-        
-        if '|' in input_text:
-            and_loc = input_text.find('|')
-            return template_parsing.parse_attribute(input_text[: and_loc], course, true_given_for_wildcards) or template_parsing.parse_attribute(input_text[and_loc + 1:], course, true_given_for_wildcards)
-
-        truth, true_given_entries = template_parsing.single_attribute_evaluation(input_text, course)
-        if len(true_given_entries):
-            true_given_for_wildcards.update(true_given_entries)
-        return truth
+        expression = template_parsing.compiled_attributes.get(input_text, None)
+        if expression is None:
+            expression = compile_attribute(input_text)
+            template_parsing.compiled_attributes.put(input_text, expression)
+        return expression.evaluate(course, true_given_for_wildcards)
@@ -162,6 +162,14 @@ class Output():
         return cache
 
     def debug(self, data) :
+        '''
+        data may be a function returning the message, which is only called when debug messages are logged,
+        for messages that are expensive to format
+        '''
+        if callable(data):
+            if not logging.getLogger().isEnabledFor(logging.DEBUG):
+                return
+            data = data()
         self.print(data, output_location=self.OUT.DEBUG)
     
     def info(self, data):
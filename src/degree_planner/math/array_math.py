@@ -1,5 +1,5 @@
 import numpy as np
-import copy
+import itertools
 from .sorting import sorting
 
 
@@ -51,25 +51,26 @@ class array_functions():
     @staticmethod
     def generate_combinatorics(bound:list, start_index=1) -> list:
         '''
-        recursively generates a list of all combinations from picking a wildcard evaluation possibility
+        generates a list of all combinations from picking a wildcard evaluation possibility
 
         e.g. suppose degree with two templates, 1) level.* and 2) subject.* resolves into
         1) level.1, level.4 and 2) subject.csci, subject.biol for a certain user
 
         this will return a list of 
-        [[level.1, subject.csci], [level.1, subject.biol], [level.4, subject.csci], [level.4, subject.biol]]
+        [[level.1, subject.csci], [level.4, subject.csci], [level.1, subject.biol], [level.4, subject.biol]]
 
         Returns:
             list: contains all possible combinations
         '''
-        if len(bound) == 0:
-            return [[]]
-        bound_cpy = copy.copy(bound)
-        last_num = bound_cpy.pop(-1)
-        nth_combo = []
-        for i in range(start_index, last_num + start_index):
-            prev_combos = array_functions.generate_combinatorics(bound_cpy)
-            for prev_combo in prev_combos:
-                prev_combo.append(i)
-                nth_combo.append(prev_combo)
-        return nth_combo
+        return list(array_functions.iterate_combinatorics(bound, start_index))
+
+    @staticmethod
+    def iterate_combinatorics(bound:list, start_index=1):
+        '''
+        lazy version of generate_combinatorics, the first element varies the fastest
+
+        Yields:
+            list: one combination, entry i is in [start_index, bound[i] + start_index)
+        '''
+        for combo in itertools.product(*[range(start_index, last_num + start_index) for last_num in reversed(bound)]):
+            yield list(reversed(combo))
@@ -0,0 +1,158 @@
+'''
+Inverted attribute index
+'''
+
+from bisect import bisect_left
+from bisect import bisect_right
+from .attributes import Attributes
+from .attributes import is_number
+from .attributes import value_ge
+from .attributes import value_le
+from .attributes import no_tail
+from .attributes import tail
+
+
+class Attribute_Index():
+    '''
+    Maps every attribute head to the set of items that have it, so that filtering
+    items by attribute becomes set intersections and unions instead of a scan.
+
+    The heads of an item are the same keys its Attributes object answers attr() for:
+    every prefix of every attribute, e.g. course with attribute subject.csci is indexed
+    under '', 'subject' and 'subject.csci'.
+
+    Items must be re-added after their attributes change.
+    '''
+
+    def __init__(self):
+        self.items = set()
+        self.heads = dict() # {head : {items}}
+        self.bodies = dict() # {head : {body : {items}}}
+        self.ranges = dict() # {head : Range_Index}, built on the first range query of a head
+
+    def add_item(self, item, attributes:Attributes) -> None:
+        self.items.add(item)
+        for head, bodies in attributes.attributes_head_to_body_str.items():
+            add_posting(self.heads, head, item)
+            self.ranges.pop(head, None)
+            head_bodies = self.bodies.get(head, None)
+            if head_bodies is None:
+                head_bodies = dict()
+                self.bodies.update({head:head_bodies})
+            for body in bodies:
+                add_posting(head_bodies, body, item)
+
+    def remove_item(self, item, attributes:Attributes) -> None:
+        if item not in self.items:
+            return
+        self.items.discard(item)
+        for head, bodies in attributes.attributes_head_to_body_str.items():
+            remove_posting(self.heads, head, item)
+            self.ranges.pop(head, None)
+            head_bodies = self.bodies.get(head, None)
+            if head_bodies is None:
+                continue
+            for body in bodies:
+                remove_posting(head_bodies, body, item)
+            if not len(head_bodies):
+                self.bodies.pop(head)
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.heads.clear()
+        self.bodies.clear()
+        self.ranges.clear()
+
+    def items_with(self, head:str) -> set:
+        '''
+        all items that have the head, the returned set must not be modified
+        '''
+        return self.heads.get(head, EMPTY)
+
+    def items_ge(self, attr:str) -> set:
+        '''
+        all items with an attribute under no_tail(attr) whose body is >= tail(attr), same
+        comparison as Attributes.get_attributes_ge
+        '''
+        return self.range_index(no_tail(attr)).ge(tail(attr))
+
+    def items_le(self, attr:str) -> set:
+        '''
+        all items with an attribute under no_tail(attr) whose body is <= tail(attr), same
+        comparison as Attributes.get_attributes_le
+        '''
+        return self.range_index(no_tail(attr)).le(tail(attr))
+
+    def range_index(self, head:str):
+        head_range = self.ranges.get(head, None)
+        if head_range is None:
+            head_range = Range_Index(self.bodies.get(head, {}))
+            self.ranges.update({head:head_range})
+        return head_range
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Range_Index():
+    '''
+    The bodies under one head sorted for range queries. Numbers are kept apart from the other
+    values and sorted as integers, so a range query is a bisect and a slice of each list.
+    '''
+
+    def __init__(self, bodies:dict):
+        numbers = sorted([(int(body), body) for body in bodies.keys() if is_number(body)])
+        texts = sorted([body for body in bodies.keys() if not is_number(body)])
+        self.numbers = [number for number, body in numbers]
+        self.number_bodies = [body for number, body in numbers]
+        self.number_items = [bodies.get(body) for number, body in numbers]
+        self.texts = texts
+        self.text_items = [bodies.get(body) for body in texts]
+
+    def ge(self, bound:str) -> set:
+        items = set()
+        for body_items in self.text_items[bisect_left(self.texts, bound):]:
+            items.update(body_items)
+        if is_number(bound):
+            for body_items in self.number_items[bisect_left(self.numbers, int(bound)):]:
+                items.update(body_items)
+            return items
+        # numbers are compared as strings against a bound that is not a number
+        for body, body_items in zip(self.number_bodies, self.number_items):
+            if value_ge(body, bound):
+                items.update(body_items)
+        return items
+
+    def le(self, bound:str) -> set:
+        items = set()
+        for body_items in self.text_items[: bisect_right(self.texts, bound)]:
+            items.update(body_items)
+        if is_number(bound):
+            for body_items in self.number_items[: bisect_right(self.numbers, int(bound))]:
+                items.update(body_items)
+            return items
+        for body, body_items in zip(self.number_bodies, self.number_items):
+            if value_le(body, bound):
+                items.update(body_items)
+        return items
+
+
+EMPTY = frozenset()
+
+def add_posting(dictionary:dict, key, item):
+    postings = dictionary.get(key, None)
+    if postings is None:
+        dictionary.update({key:{item}})
+    else:
+        postings.add(item)
+
+def remove_posting(dictionary:dict, key, item):
+    postings = dictionary.get(key, None)
+    if postings is None:
+        return
+    postings.discard(item)
+    if not len(postings):
+        dictionary.pop(key)
@@ -3,11 +3,13 @@ class Attributes():
     def __init__(self):
         self.attributes_head_to_body_str = dict()
         self.attributes_full_str_to_list = dict()
+        self.version = 0 # increases every time an attribute is added or removed
     
     def add_attribute(self, attr:str):
         attr = attr.casefold()
         attr_split = attr.split('.')
         self.attributes_full_str_to_list.update({attr:attr_split})
+        self.version += 1
         for i in range(0, len(attr_split) + 1):
             head = '.'.join(attr_split[:i])
             body = '.'.join(attr_split[i:])
@@ -18,6 +20,7 @@ class Attributes():
         attr_split = attr.split('.')
         if self.attributes_full_str_to_list.pop(attr, None) is None:
             return
+        self.version += 1
         for i in range(0, len(attr_split) + 1):
             head = '.'.join(attr_split[:i])
             body = '.'.join(attr_split[i:])
@@ -53,13 +56,13 @@ class Attributes():
 
     def get_attributes_ge(self, attr):
         bodies_of_head_matches = self.get_attributes_body_by_head(no_tail(attr))
-        bodies_ge = [possibility for possibility in bodies_of_head_matches if possibility >= tail(attr)]
+        bodies_ge = [possibility for possibility in bodies_of_head_matches if value_ge(possibility, tail(attr))]
         # print(f"attribute {attr} with no tail {no_tail(attr)} matched with bodies {bodies_of_head_matches} with bodies ge {bodies_ge}")
         return [f"{no_tail(attr)}.{body}" if no_tail(attr) != '' else body for body in bodies_ge]
     
     def get_attributes_le(self, attr):
         bodies_of_head_matches = self.get_attributes_body_by_head(no_tail(attr))
-        bodies_le = [possibility for possibility in bodies_of_head_matches if possibility <= tail(attr)]
+        bodies_le = [possibility for possibility in bodies_of_head_matches if value_le(possibility, tail(attr))]
         # print(f"attribute {attr} with no tail {no_tail(attr)} matched with bodies {bodies_of_head_matches} with bodies ge {bodies_ge}")
         return [f"{no_tail(attr)}.{body}" if no_tail(attr) != '' else body for body in bodies_le]
 
@@ -75,6 +78,12 @@ class Attributes():
             for body in bodies:
                 return body
         return bodies
+
+    def has_attr(self, head:str) -> bool:
+        '''
+        same as attr(head) is not None, without building the return value
+        '''
+        return head in self.attributes_head_to_body_str
     
     def next_attr(self, head:str):
         next_values = list()
@@ -127,6 +136,23 @@ def no_tail(attr) -> str:
         return ''
     return attr[:attr.rfind('.')]
 
+def is_number(value:str) -> bool:
+    return value.isdecimal()
+
+def value_ge(value:str, bound:str) -> bool:
+    '''
+    values are compared as integers if both are numbers, so course_id.10000 >= course_id.4000,
+    and as strings otherwise
+    '''
+    if is_number(value) and is_number(bound):
+        return int(value) >= int(bound)
+    return value >= bound
+
+def value_le(value:str, bound:str) -> bool:
+    if is_number(value) and is_number(bound):
+        return int(value) <= int(bound)
+    return value <= bound
+
 def update_dict(dictionary:dict, key, value, remove=False):
     if remove:
         dictionary.get(key).discard(value)
@@ -0,0 +1,181 @@
+'''
+Compact sets of indexed items
+
+Every item is given a dense integer id by a Bitset_Index, and a Bitset stores a set of
+items as a Python int where bit i is set if item i is in the set. Union, intersection,
+difference and counting become single integer operations.
+'''
+
+
+class Bitset_Index():
+    '''
+    Assigns dense integer ids to items. Ids are never reused, so bitsets created
+    before an item is removed stay valid: they still hold and yield the item, but
+    it is no longer found by lookups and is given a new id if added again.
+    '''
+
+    def __init__(self, items=None):
+        self.ids = dict() # {item : id}
+        self.items = list() # items[id] = item
+        if items is not None:
+            for item in items:
+                self.add(item)
+
+    def add(self, item) -> int:
+        '''
+        returns the id of the item, assigning a new one if the item was not indexed
+        '''
+        i = self.ids.get(item, None)
+        if i is None:
+            i = len(self.items)
+            self.ids.update({item:i})
+            self.items.append(item)
+        return i
+
+    def remove(self, item) -> None:
+        self.ids.pop(item, None)
+
+    def bit(self, item) -> int:
+        '''
+        returns the mask containing only this item, 0 if not indexed
+        '''
+        i = self.ids.get(item, None)
+        return 0 if i is None else 1 << i
+
+    def mask(self, items) -> int:
+        '''
+        returns the mask of all the items, indexing the ones that are not yet indexed
+        '''
+        if isinstance(items, Bitset) and items.index is self:
+            return items.mask
+        mask = 0
+        for item in items:
+            mask |= 1 << self.add(item)
+        return mask
+
+    def __contains__(self, item):
+        return item in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class Bitset():
+    '''
+    Set of items backed by an integer mask over a Bitset_Index. Supports the same
+    operations as the builtin set that are used on fulfillment sets, and iterates in
+    order of item id.
+    '''
+
+    __slots__ = ('index', 'mask')
+
+    def __init__(self, index:Bitset_Index, items=None, mask:int=0):
+        self.index = index
+        self.mask = mask
+        if items is not None:
+            self.mask |= index.mask(items)
+
+    def empty(self):
+        ''' returns a new empty set sharing the same index '''
+        return Bitset(self.index)
+
+    def add(self, item) -> None:
+        self.mask |= 1 << self.index.add(item)
+
+    def discard(self, item) -> None:
+        self.mask &= ~self.index.bit(item)
+
+    def remove(self, item) -> None:
+        if item not in self:
+            raise KeyError(item)
+        self.discard(item)
+
+    def update(self, *others) -> None:
+        for other in others:
+            self.mask |= self.index.mask(other)
+
+    def intersection_update(self, *others) -> None:
+        for other in others:
+            self.mask &= self.index.mask(other)
+
+    def difference_update(self, *others) -> None:
+        for other in others:
+            self.mask &= ~self.index.mask(other)
+
+    def clear(self) -> None:
+        self.mask = 0
+
+    def copy(self):
+        return Bitset(self.index, mask=self.mask)
+
+    def union(self, *others):
+        mask = self.mask
+        for other in others:
+            mask |= self.index.mask(other)
+        return Bitset(self.index, mask=mask)
+
+    def intersection(self, *others):
+        mask = self.mask
+        for other in others:
+            mask &= self.index.mask(other)
+        return Bitset(self.index, mask=mask)
+
+    def difference(self, *others):
+        mask = self.mask
+        for other in others:
+            mask &= ~self.index.mask(other)
+        return Bitset(self.index, mask=mask)
+
+    def isdisjoint(self, other) -> bool:
+        return not self.mask & self.index.mask(other)
+
+    def issubset(self, other) -> bool:
+        return not self.mask & ~self.index.mask(other)
+
+    def __contains__(self, item):
+        try:
+            i = self.index.ids.get(item, None)
+        except TypeError:
+            # same as the builtin set, unhashable items such as sets are never contained
+            return False
+        return i is not None and (self.mask >> i) & 1 == 1
+
+    def __iter__(self):
+        mask = self.mask
+        items = self.index.items
+        while mask:
+            low = mask & -mask
+            yield items[low.bit_length() - 1]
+            mask ^= low
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def __eq__(self, other):
+        if isinstance(other, Bitset) and other.index is self.index:
+            return self.mask == other.mask
+        if isinstance(other, (set, frozenset)):
+            return len(other) == len(self) and all([e in self for e in other])
+        return False
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        # the index is shared between every bitset created from it and must never be copied
+        return self.copy()
+
+    def __repr__(self):
+        return '{' + ', '.join([repr(e) for e in self]) + '}' if self.mask else 'set()'
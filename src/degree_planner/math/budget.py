@@ -0,0 +1,40 @@
+'''
+Time budgets for computations that can stop early with the best result found so far
+'''
+
+import timeit
+
+
+class Budgeted_Result(dict):
+    '''
+    Dictionary result of a computation that may have been cut short by its deadline.
+
+        optimal (bool): the computation looked at everything it would have without a deadline
+        truncated (bool): the deadline stopped the computation before it was done
+        explored (int): number of steps (wildcard combinations, templates ranked) that were computed
+        cached (bool): the result was looked up instead of computed, explored is what computing it took
+    '''
+
+    def __init__(self, result:dict=None, optimal:bool=True, truncated:bool=False, explored:int=0, cached:bool=False):
+        super().__init__()
+        if result is not None:
+            self.update(result)
+        self.optimal = optimal
+        self.truncated = truncated
+        self.explored = explored
+        self.cached = cached
+
+
+def budget_deadline(budget_ms:float=None, deadline:float=None) -> float:
+    '''
+    the earlier of deadline and budget_ms milliseconds from now, as a timeit.default_timer time.
+    None if neither is given, for no deadline
+    '''
+    if budget_ms is not None:
+        budget_end = timeit.default_timer() + budget_ms / 1000
+        deadline = budget_end if deadline is None else min(deadline, budget_end)
+    return deadline
+
+
+def budget_expired(deadline:float) -> bool:
+    return deadline is not None and timeit.default_timer() >= deadline
@@ -0,0 +1,179 @@
+'''
+maximum flow over integer capacity networks
+'''
+
+from collections import deque
+
+
+class Flow_Network():
+    '''
+    Directed network with integer capacities, solved with Dinic's algorithm. Nodes are the
+    integers 0 to size - 1. Every edge is stored next to its reverse edge, so edge e and
+    e ^ 1 are a residual pair.
+
+    max_flow may be called again after adding more edges, it continues from the flow that
+    was already pushed instead of starting over.
+    '''
+
+    def __init__(self, size:int):
+        self.size = size
+        self.adjacency = [list() for i in range(size)] # edge ids leaving each node
+        self.to = list() # to[e] = node edge e points to
+        self.capacity = list() # capacity[e] = residual capacity of edge e
+        self.original = list() # original[e] = capacity edge e was created with
+
+    def add_node(self) -> int:
+        self.adjacency.append(list())
+        self.size += 1
+        return self.size - 1
+
+    def add_edge(self, u:int, v:int, capacity:int) -> int:
+        '''
+        returns the id of the new edge, used to read its flow later
+        '''
+        e = len(self.to)
+        self.to.extend([v, u])
+        self.capacity.extend([capacity, 0])
+        self.original.extend([capacity, 0])
+        self.adjacency[u].append(e)
+        self.adjacency[v].append(e + 1)
+        return e
+
+    def flow(self, e:int) -> int:
+        return self.original[e] - self.capacity[e]
+
+    def levels(self, source:int, sink:int) -> list:
+        '''
+        bfs distances from the source over edges with residual capacity, -1 if unreachable
+        '''
+        level = [-1] * self.size
+        level[source] = 0
+        bfs_queue = deque()
+        bfs_queue.append(source)
+        while len(bfs_queue):
+            u = bfs_queue.popleft()
+            for e in self.adjacency[u]:
+                if self.capacity[e] > 0 and level[self.to[e]] < 0:
+                    level[self.to[e]] = level[u] + 1
+                    bfs_queue.append(self.to[e])
+        return level
+
+    def max_flow(self, source:int, sink:int) -> int:
+        '''
+        pushes as much additional flow as possible from source to sink
+
+        Returns:
+            flow (int): the flow pushed by this call
+        '''
+        total = 0
+        while True:
+            level = self.levels(source, sink)
+            if level[sink] < 0:
+                return total
+
+            # blocking flow, using an explicit stack so long augmenting paths do not hit the recursion limit
+            pointer = [0] * self.size
+            path = list() # edge ids from the source to u
+            u = source
+            while True:
+                if u == sink:
+                    pushed = min([self.capacity[e] for e in path])
+                    for e in path:
+                        self.capacity[e] -= pushed
+                        self.capacity[e ^ 1] += pushed
+                    total += pushed
+                    path = list()
+                    u = source
+                    continue
+
+                edges = self.adjacency[u]
+                while pointer[u] < len(edges):
+                    e = edges[pointer[u]]
+                    if self.capacity[e] > 0 and level[self.to[e]] == level[u] + 1:
+                        break
+                    pointer[u] += 1
+
+                if pointer[u] < len(edges):
+                    e = edges[pointer[u]]
+                    path.append(e)
+                    u = self.to[e]
+                    continue
+
+                # dead end, retreat and never come back to this node during this phase
+                if u == source:
+                    break
+                level[u] = -1
+                e = path.pop()
+                u = self.to[e ^ 1]
+                pointer[u] += 1
+
+
+class Cost_Flow_Network(Flow_Network):
+    '''
+    Flow network where every edge also has a cost per unit of flow. Costs may be negative
+    (and arbitrarily large python ints), as long as the network starts without negative cycles.
+    '''
+
+    def __init__(self, size:int):
+        super().__init__(size)
+        self.cost = list() # cost[e] = cost per unit of flow through edge e, cost[e ^ 1] = -cost[e]
+
+    def add_edge(self, u:int, v:int, capacity:int, cost:int=0) -> int:
+        self.cost.extend([cost, -cost])
+        return super().add_edge(u, v, capacity)
+
+    def shortest_paths(self, source:int) -> tuple:
+        '''
+        Bellman-Ford (queue based) distances over edges with residual capacity
+
+        Returns:
+            distance (list): cost of the cheapest path to every node, None if unreachable
+            parent (list): edge used to reach every node on its cheapest path
+        '''
+        distance = [None] * self.size
+        parent = [None] * self.size
+        in_queue = [False] * self.size
+        distance[source] = 0
+        bfs_queue = deque()
+        bfs_queue.append(source)
+        in_queue[source] = True
+        while len(bfs_queue):
+            u = bfs_queue.popleft()
+            in_queue[u] = False
+            for e in self.adjacency[u]:
+                v = self.to[e]
+                if self.capacity[e] > 0 and (distance[v] is None or distance[u] + self.cost[e] < distance[v]):
+                    distance[v] = distance[u] + self.cost[e]
+                    parent[v] = e
+                    if not in_queue[v]:
+                        in_queue[v] = True
+                        bfs_queue.append(v)
+        return distance, parent
+
+    def min_cost_flow(self, source:int, sink:int) -> tuple:
+        '''
+        pushes flow along the cheapest augmenting paths for as long as they lower the total cost,
+        so the result is the cheapest flow of any size rather than the cheapest maximum flow
+
+        Returns:
+            flow (int): the flow pushed
+            cost (int): the total cost of the flow pushed
+        '''
+        total_flow = 0
+        total_cost = 0
+        while True:
+            distance, parent = self.shortest_paths(source)
+            if distance[sink] is None or distance[sink] >= 0:
+                return total_flow, total_cost
+
+            path = list()
+            v = sink
+            while v != source:
+                path.append(parent[v])
+                v = self.to[parent[v] ^ 1]
+            pushed = min([self.capacity[e] for e in path])
+            for e in path:
+                self.capacity[e] -= pushed
+                self.capacity[e ^ 1] += pushed
+            total_flow += pushed
+            total_cost += pushed * distance[sink]
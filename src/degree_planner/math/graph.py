@@ -2,7 +2,6 @@
 graphs and bfs searching
 '''
 
-import copy
 import queue
 
 from ..dp.fulfillment_status import Fulfillment_Status
@@ -51,17 +50,131 @@ class Forwards_Overlap(Edge_Generator):
     def print_edge(self, value) -> str:
         return '-' if self.zero_value(value) else ', '.join([str(e) for e in value])
     
+class Dense_Adjacency():
+    '''
+    edges as an n by n grid of edge data, None where there is no edge. Neighbors are found by scanning
+    a whole row or column, and adding or removing a node reshapes every row
+    '''
+
+    def __init__(self, size:int, zero_value):
+        self.zero_value = zero_value
+        self.grid = [[None for j in range(size)] for i in range(size)]
+
+    def get(self, i:int, j:int):
+        return self.grid[i][j]
+
+    def set(self, i:int, j:int, value) -> None:
+        self.grid[i][j] = value
+
+    def outbound(self, i:int):
+        return [j for j in range(len(self.grid)) if not self.zero_value(self.grid[i][j])]
+
+    def inbound(self, j:int):
+        return [i for i in range(len(self.grid)) if not self.zero_value(self.grid[i][j])]
+
+    def add(self) -> None:
+        for row in self.grid:
+            row.append(None)
+        self.grid.append([None for j in range(len(self.grid) + 1)])
+
+    def remove(self, id:int) -> None:
+        '''
+        removes node id, the last node takes its id
+        '''
+        # bring the last element's info to the deleted element's place
+        if id != len(self.grid) - 1:
+            self.grid[id] = self.grid[-1]
+        self.grid.pop(-1)
+
+        # bring every element's last element to the deleted element's place
+        for row in self.grid:
+            row[id] = row[-1]
+            row.pop(-1)
+
+    def edges(self):
+        for i in range(len(self.grid)):
+            for j in range(len(self.grid[i])):
+                if self.zero_value(self.grid[i][j]):
+                    continue
+                yield (i, j, self.grid[i][j])
+
+    def __len__(self):
+        return len(self.grid)
+
+
+class Sparse_Adjacency():
+    '''
+    edges as a dict of the edges going out of and coming into every node, {node id : edge data}, only
+    holding edges whose data isn't a zero value. Neighbors are found in time of the number of neighbors
+    and memory is of the number of edges, for graphs where few nodes connect. Neighbors are given in
+    order of id, as a grid gives them, so searches over either backend visit nodes in the same order
+    '''
+
+    def __init__(self, size:int, zero_value):
+        self.zero_value = zero_value
+        self.out_edges = [dict() for i in range(size)]
+        self.in_edges = [dict() for i in range(size)]
+
+    def get(self, i:int, j:int):
+        return self.out_edges[i].get(j, None)
+
+    def set(self, i:int, j:int, value) -> None:
+        if self.zero_value(value):
+            self.out_edges[i].pop(j, None)
+            self.in_edges[j].pop(i, None)
+            return
+        self.out_edges[i].update({j:value})
+        self.in_edges[j].update({i:value})
+
+    def outbound(self, i:int):
+        return sorted(self.out_edges[i].keys())
+
+    def inbound(self, j:int):
+        return sorted(self.in_edges[j].keys())
+
+    def add(self) -> None:
+        self.out_edges.append(dict())
+        self.in_edges.append(dict())
+
+    def remove(self, id:int) -> None:
+        '''
+        removes node id, the last node takes its id
+        '''
+        for j in self.out_edges[id].keys():
+            self.in_edges[j].pop(id)
+        for i in self.in_edges[id].keys():
+            self.out_edges[i].pop(id)
+
+        last = len(self.out_edges) - 1
+        if id != last:
+            # only the neighbors of the last node refer to its id
+            self.out_edges[id] = self.out_edges[last]
+            self.in_edges[id] = self.in_edges[last]
+            for j in self.out_edges[id].keys():
+                self.in_edges[j].update({id:self.in_edges[j].pop(last)})
+            for i in self.in_edges[id].keys():
+                self.out_edges[i].update({id:self.out_edges[i].pop(last)})
+        self.out_edges.pop(-1)
+        self.in_edges.pop(-1)
+
+    def edges(self):
+        for i in range(len(self.out_edges)):
+            row = self.out_edges[i]
+            for j in sorted(row.keys()):
+                yield (i, j, row[j])
+
+    def __len__(self):
+        return len(self.out_edges)
+
+
 class Edge_Id_Iterator():
 
     def __init__(self, graph):
         self.graph = graph
 
     def __iter__(self):
-        for i in range(len(self.graph.grid)):
-            for j in range(len(self.graph.grid[i])):
-                if self.graph.edge_data_gen.zero_value(self.graph.grid[i][j]):
-                    continue
-                yield (i, j)
+        for i, j, value in self.graph.adjacency.edges():
+            yield (i, j)
 
 class Edge_Node_Iterator():
 
@@ -69,11 +182,8 @@ class Edge_Node_Iterator():
         self.graph = graph
 
     def __iter__(self):
-        for i in range(len(self.graph.grid)):
-            for j in range(len(self.graph.grid[i])):
-                if self.graph.edge_data_gen.zero_value(self.graph.grid[i][j]):
-                    continue
-                yield (self.graph._node_object(i), self.graph._node_object(j))
+        for i, j, value in self.graph.adjacency.edges():
+            yield (self.graph._node_object(i), self.graph._node_object(j))
 
 class Edge_Data_Iterator():
 
@@ -81,11 +191,8 @@ class Edge_Data_Iterator():
         self.graph = graph
 
     def __iter__(self):
-        for i in range(len(self.graph.grid)):
-            for j in range(len(self.graph.grid[i])):
-                if self.graph.edge_data_gen.zero_value(self.graph.grid[i][j]):
-                    continue
-                yield self.graph.grid[i][j]
+        for i, j, value in self.graph.adjacency.edges():
+            yield value
 
 class Edge_Items_Iterator():
     '''
@@ -96,11 +203,8 @@ class Edge_Items_Iterator():
         self.graph = graph
 
     def __iter__(self):
-        for i in range(len(self.graph.grid)):
-            for j in range(len(self.graph.grid[i])):
-                if self.graph.edge_data_gen.zero_value(self.graph.grid[i][j]):
-                    continue
-                yield (self.graph._node_object(i), self.graph._node_object(j), self.graph.grid[i][j])
+        for i, j, value in self.graph.adjacency.edges():
+            yield (self.graph._node_object(i), self.graph._node_object(j), value)
 
 class BFS_data():
     '''
@@ -153,9 +257,12 @@ class BFS_data():
 class Graph():
     '''
     adjacency graph that can store sets as edge data
+
+    edges are stored in a grid, or when sparse in dicts of the edges of every node (see Sparse_Adjacency)
+    for graphs where each node connects to few others. Both give the same results
     '''
 
-    def __init__(self, nodes:set=None, edge_data_gen:Edge_Generator=None):
+    def __init__(self, nodes:set=None, edge_data_gen:Edge_Generator=None, sparse:bool=False):
         if nodes is None:
             nodes = set()
 
@@ -164,7 +271,10 @@ class Graph():
         else:
             self.edge_data_gen = edge_data_gen
         
-        self.grid = [[None for j in range(len(nodes))] for i in range(len(nodes))]
+        if sparse:
+            self.adjacency = Sparse_Adjacency(len(nodes), self.edge_data_gen.zero_value)
+        else:
+            self.adjacency = Dense_Adjacency(len(nodes), self.edge_data_gen.zero_value)
         self.nodes_obj_to_id = dict()
         self.nodes_id_to_obj = dict()
         self.roots = set()
@@ -183,11 +293,9 @@ class Graph():
         if node in self:
             return False
         
-        for row in self.grid:
-            row.append(None)
-        self.grid.append([None for j in range(len(self.grid) + 1)])
-        self.nodes_obj_to_id.update({node:len(self.grid) - 1})
-        self.nodes_id_to_obj.update({len(self.grid) - 1:node})
+        self.adjacency.add()
+        self.nodes_obj_to_id.update({node:len(self.adjacency) - 1})
+        self.nodes_id_to_obj.update({len(self.adjacency) - 1:node})
 
         if compute_overlap:
             for target_node in self.nodes_obj_to_id.keys():
@@ -202,28 +310,16 @@ class Graph():
             return False
         
         id = self.nodes_obj_to_id.get(node)
+        last_pos = len(self.adjacency) - 1
+        self.adjacency.remove(id)
 
         # if it's the last one:
-        if id == len(self.grid) - 1:
-            self.grid.pop(-1)
-            for row in self.grid:
-                row.pop(-1)
+        if id == last_pos:
             self.nodes_obj_to_id.pop(node)
             self.nodes_id_to_obj.pop(id)
             return True
-        
-        last_pos = len(self.grid) - 1
-        moved_node = self.nodes_id_to_obj.get(last_pos)
-        
-        # bring the last element's info to the deleted element's place
-        self.grid[id] = self.grid[-1]
-        self.grid.pop(-1)
-
-        # bring every element's last element to the deleted element's place
-        for row in self.grid:
-            row[id] = row[-1]
-            row.pop(-1)
 
+        moved_node = self.nodes_id_to_obj.get(last_pos)
         self.nodes_obj_to_id.pop(node)
         self.nodes_obj_to_id.update({moved_node:id})
         self.nodes_id_to_obj.pop(last_pos)
@@ -246,7 +342,7 @@ class Graph():
             return
         if data_set is None:
             data_set = self.compute_overlap(node_origin, node_to)
-        self.grid[self._node_id(node_origin)][self._node_id(node_to)] = data_set
+        self.adjacency.set(self._node_id(node_origin), self._node_id(node_to), data_set)
 
 
     def remove_connection(self, node_origin, node_to):
@@ -255,18 +351,16 @@ class Graph():
         '''
         if node_origin == node_to:
             return
-        self.grid[self._node_id(node_origin)][self._node_id(node_to)] = None
+        self.adjacency.set(self._node_id(node_origin), self._node_id(node_to), None)
 
 
     def outbound_connections(self, node) -> set:
         '''
         returns set of nodes this node connects to
         '''
-        id = self._node_id(node)
         connected_nodes = set()
-        for i in range(0, len(self.grid)):
-            if not self.edge_data_gen.zero_value(self.grid[id][i]):
-                connected_nodes.add(self._node_object(i))
+        for i in self.adjacency.outbound(self._node_id(node)):
+            connected_nodes.add(self._node_object(i))
         return connected_nodes
 
 
@@ -274,16 +368,14 @@ class Graph():
         '''
         returns set of nodes that connect to this node
         '''
-        id = self._node_id(node)
         connected_nodes = set()
-        for i in range(0, len(self.grid)):
-            if not self.edge_data_gen.zero_value(self.grid[i][id]):
-                connected_nodes.add(self._node_object(i))
+        for i in self.adjacency.inbound(self._node_id(node)):
+            connected_nodes.add(self._node_object(i))
         return connected_nodes
     
     
     def edge_data(self, node1, node2, first_element_of_set:bool=False):
-        elements = self.grid[self._node_id(node1)][self._node_id(node2)]
+        elements = self.adjacency.get(self._node_id(node1), self._node_id(node2))
         if first_element_of_set and len(elements):
             for e in elements:
                 return e
@@ -313,13 +405,14 @@ class Graph():
 
         start_nodes.update(self.roots)
             
-        bfs = BFS_data(start_nodes)
+        # in order of node id, so paths don't depend on the order the set iterates in
+        bfs = BFS_data(sorted(start_nodes, key=lambda node: self.nodes_obj_to_id.get(node, -1)))
         while bfs.has_next():
             node_current = bfs.next()
             for node_next in self.outbound_connections(node_current):
                 if bfs.contains_node(node_next):
                     continue
-                trace = copy.deepcopy(bfs.get_path(node_current))
+                trace = list(bfs.get_path(node_current))
                 trace.append(node_next)
                 bfs.add_path(node_next, trace)
 
@@ -360,10 +453,10 @@ class Graph():
         STAGGERED = False
         if not STAGGERED:
             rstr = f"\n{'links'.ljust(WIDTH)}{''.join([str(self._node_object(i)).ljust(WIDTH) for i in range(0, len(self))])}\n"
-            for i in range(0, len(self.grid)):
+            for i in range(0, len(self)):
                 rstr += str(self._node_object(i)).ljust(WIDTH)
-                for j in range(0, len(self.grid)):
-                    data_set = self.grid[i][j]
+                for j in range(0, len(self)):
+                    data_set = self.adjacency.get(i, j)
                     value = self.edge_data_gen.print_edge(data_set)
                     if len(value) > 8:
                         value = value[:8]
@@ -373,10 +466,10 @@ class Graph():
         
         WIDTH += 12
         rstr = ''
-        for i in range(0, len(self.grid)):
+        for i in range(0, len(self)):
             rstr += f"\n\n{'links of'.ljust(WIDTH)}{(self._node_object(i))}\n"
-            for j in range(0, len(self.grid)):
-                data_set = self.grid[i][j]
+            for j in range(0, len(self)):
+                data_set = self.adjacency.get(i, j)
                 value = self.edge_data_gen.print_edge(data_set)
                 if len(value) > 8:
                     value = value[:8]
@@ -401,8 +494,8 @@ class Graph():
     
 
     def __eq__(self, other):
-        return self.grid == other.grid and self.nodes_obj_to_id == other.nodes_name_to_id
+        return self.nodes_obj_to_id == other.nodes_obj_to_id and list(self.adjacency.edges()) == list(other.adjacency.edges())
    
 
     def __len__(self):
-        return len(self.grid)
+        return len(self.adjacency)
@@ -0,0 +1,56 @@
+'''
+Bounded least recently used cache with optional expiry
+'''
+
+import time
+from collections import OrderedDict
+
+
+class LRU_Cache():
+    '''
+    Keeps at most size entries, evicting the least recently used one first. Entries older
+    than ttl seconds are treated as missing. A size of 0 disables the cache.
+    '''
+
+    def __init__(self, size:int=128, ttl:float=None):
+        self.size = size
+        self.ttl = ttl # seconds an entry stays valid, None to never expire
+        self.entries = OrderedDict() # {key : (time stored, value)}, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key, None)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value) -> None:
+        if self.size <= 0:
+            return
+        self.entries.update({key:(time.monotonic(), value)})
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def stats(self) -> dict:
+        return {'size':len(self.entries), 'capacity':self.size, 'hits':self.hits, 'misses':self.misses, 'hit rate':self.hit_rate()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
@@ -0,0 +1,152 @@
+'''
+Per phase wall time and event counts of a computation
+'''
+
+import timeit
+
+
+class Profile_Phase():
+    '''
+    context manager timing one entry into a phase of a Profiler
+    '''
+
+    def __init__(self, profiler, name:str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler.stack
+        self.path = self.name if not len(stack) else f'{stack[-1]}/{self.name}'
+        stack.append(self.path)
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, *exception):
+        seconds = timeit.default_timer() - self.start
+        self.profiler.stack.pop()
+        entry = self.profiler.phases.get(self.path)
+        if entry is None:
+            self.profiler.phases.update({self.path:[seconds, 1]})
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+        return False
+
+
+class Null_Phase():
+    '''
+    context manager of a disabled Profiler, does nothing
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+NULL_PHASE = Null_Phase()
+
+
+class Profiler():
+    '''
+    Records the wall time and number of entries of every phase of a computation, and counts of events
+    in total and per template.
+
+    Phases nest: a phase entered inside another is recorded under the path of both, such as
+    'search/combination/nr steal', so the time of a phase includes the time of the phases inside it and
+    its self time is what is left. A disabled profiler records nothing and costs one attribute check
+    per event, so profiling calls can be left in hot code.
+
+    Profilers are plain data and can be pickled, sent back from worker processes and merged, or merged
+    over many runs by a benchmark harness.
+    '''
+
+    def __init__(self, enabled:bool=True):
+        self.enabled = enabled
+        self.phases = dict() # {phase path : [seconds, entries]}
+        self.counters = dict() # {counter : count}
+        self.templates = dict() # {template name : {counter : count}}
+        self.stack = list() # paths of the phases currently entered
+
+    def phase(self, name:str):
+        '''
+        context manager timing the code inside it as phase name, nested in the phases already entered
+        '''
+        if not self.enabled:
+            return NULL_PHASE
+        return Profile_Phase(self, name)
+
+    def count(self, counter:str, amount:int=1, template=None) -> None:
+        '''
+        adds amount to counter, and to the counter of the template if one is given (a Template or its name)
+        '''
+        if not self.enabled:
+            return
+        self.counters.update({counter:self.counters.get(counter, 0) + amount})
+        if template is not None:
+            name = template if isinstance(template, str) else template.name
+            template_counters = self.templates.get(name)
+            if template_counters is None:
+                template_counters = dict()
+                self.templates.update({name:template_counters})
+            template_counters.update({counter:template_counters.get(counter, 0) + amount})
+
+    def merge(self, other, prefix:str=None) -> None:
+        '''
+        adds everything other recorded to this profiler, with its phases nested under prefix if given
+        '''
+        for path, (seconds, entries) in other.phases.items():
+            path = path if prefix is None else f'{prefix}/{path}'
+            entry = self.phases.get(path)
+            if entry is None:
+                self.phases.update({path:[seconds, entries]})
+            else:
+                entry[0] += seconds
+                entry[1] += entries
+        for counter, count in other.counters.items():
+            self.counters.update({counter:self.counters.get(counter, 0) + count})
+        for name, counters in other.templates.items():
+            template_counters = self.templates.setdefault(name, dict())
+            for counter, count in counters.items():
+                template_counters.update({counter:template_counters.get(counter, 0) + count})
+
+    def clear(self) -> None:
+        self.phases.clear()
+        self.counters.clear()
+        self.templates.clear()
+
+    def report(self) -> dict:
+        '''
+        Returns:
+            report (dict): {'phases' : {phase path : {'ms', 'self ms', 'calls'}}, 'counters' : {counter : count},
+                'templates' : {template name : {counter : count}}}, phases in order of their paths so every
+                phase follows the phase it is in. Self time leaves out the phases directly inside
+        '''
+        inner = dict() # {phase path : seconds of the phases directly inside}
+        for path, (seconds, entries) in self.phases.items():
+            if '/' in path:
+                parent = path.rsplit('/', 1)[0]
+                inner.update({parent:inner.get(parent, 0) + seconds})
+
+        phases = dict()
+        for path in sorted(self.phases.keys(), key=lambda path: path.split('/')):
+            seconds, entries = self.phases.get(path)
+            phases.update({path:{'ms':seconds * 1000, 'self ms':(seconds - inner.get(path, 0)) * 1000, 'calls':entries}})
+        return {'phases':phases, 'counters':dict(sorted(self.counters.items())),
+            'templates':{name:dict(sorted(counters.items())) for name, counters in sorted(self.templates.items())}}
+
+    def __str__(self):
+        report = self.report()
+        printout = f"  {'phase'.ljust(44)}{'ms'.rjust(12)}{'self ms'.rjust(12)}{'calls'.rjust(10)}\n"
+        for path, entry in report.get('phases').items():
+            depth = path.count('/')
+            name = '  ' * depth + path.rsplit('/', 1)[-1]
+            printout += f"  {name.ljust(44)}{entry.get('ms'):12.3f}{entry.get('self ms'):12.3f}{entry.get('calls'):10}\n"
+        printout += '\n  counters:\n'
+        for counter, count in report.get('counters').items():
+            printout += f'    {counter}: {count}\n'
+        if len(report.get('templates')):
+            printout += '\n  templates:\n'
+            for name, counters in report.get('templates').items():
+                printout += f"    {name}: {', '.join([f'{counter} {count}' for counter, count in counters.items()])}\n"
+        return printout
@@ -2,14 +2,32 @@
 DEGREE PLANNER MAIN CLASS
 '''
 
+import os
+import csv
+import json
+import timeit
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import wait
 from .io.output import Output
 from .io.parse import parsing
 from .dp.catalog import Catalog
 from .dp.command_handler import command_handler
 from .user.user import User
+from .dp.degree import total_unfulfilled_slots
+from .dp.degree import total_filled_slots
+from .math.budget import budget_deadline
 
 VERSION = "API 2.0"
 
+# match tables are generated data, kept in the user's cache folder rather than next to the package data
+MATCH_TABLE_FOLDER = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'degree_planner', 'match_tables')
+
+AUDIT_FORMATS = ('jsonl', 'csv')
+AUDIT_CSV_FIELDS = ['student', 'degree', 'template', 'required', 'actual', 'courses', 'error']
+
 class Planner():
     '''
     All interaction with a Planner is with this class, either by calling user_input
@@ -53,7 +71,7 @@ class Planner():
     It is essential to keep all user specific data inside the User class.
     '''
 
-    def __init__(self, io:Output=None, enable_tensorflow=True):
+    def __init__(self, io:Output=None, enable_tensorflow=True, budget_ms:float=None, match_table_folder:str=MATCH_TABLE_FOLDER):
         # each user is assigned a User object and stored in this dictionary
         # Users = <user id, User>
         self.users = dict()
@@ -65,6 +83,8 @@ class Planner():
 
         self.ENABLE_TENSORFLOW = enable_tensorflow
         self.SEMESTERS_MAX  = 12
+        self.budget_ms = budget_ms # default time budget of fulfillment and recommend commands in milliseconds, None for no limit
+        self.match_table_folder = match_table_folder # folder import_data persists match tables to, None to keep them in memory only
 
 
     def get_user(self, userid):
@@ -271,9 +291,231 @@ class Planner():
         parsing.parse_tags(self.catalog, io)
         io.print(f"parsed tags")
 
+        # match tables of the imported degrees are kept on disk, a restart with the same data loads them
+        self.catalog.match_table_folder = self.match_table_folder
         self.catalog.reindex()
 
 
+    def audit_many(self, students, out=None, output_format:str='jsonl', workers:int=0, chunk_size:int=32, io:Output=None) -> dict:
+        ''' Fulfillment of every student in a cohort, without going through commands or schedules
+
+        Course names are resolved once for the whole cohort. Audits are spread over a process pool
+        forked from this planner, so every process starts from the same catalog without pickling it,
+        and results are written as soon as they finish. Only a few chunks of students are read
+        ahead, so the cohort may be a generator of any length. A student that can't be audited is
+        written with its error and counted in the errors, and the cohort goes on.
+
+        Args:
+            students (iterable): (student id, degree name, [course names])
+            out (file): text file results are streamed to, None to only count them
+            output_format (str): 'jsonl' writes one json object per student, 'csv' one row per template
+                and one row with only the error for a student that failed
+            workers (int): number of processes, 0 or 1 to audit in this process
+            chunk_size (int): students sent to a process at a time
+            io (Output): user interface output for the throughput report
+
+        Returns:
+            report (dict): audits, errors (unknown degrees and failed audits), seconds and audits per second
+        '''
+        global audit_state
+        if io is None:
+            io = self.default_io
+        if output_format not in AUDIT_FORMATS:
+            raise ValueError(f'unknown audit format {output_format}, choose from {AUDIT_FORMATS}')
+
+        start = timeit.default_timer()
+        writer = None
+        if out is not None and output_format == 'csv':
+            writer = csv.DictWriter(out, fieldnames=AUDIT_CSV_FIELDS)
+            writer.writeheader()
+
+        report = {'audits':0, 'errors':0}
+        def write(results):
+            for result in results:
+                report['audits'] += 1
+                if result.get('error', None) is not None:
+                    report['errors'] += 1
+                if out is None:
+                    continue
+                if writer is None:
+                    # ids and degrees are written as they were given, ones json has no type for as strings
+                    out.write(json.dumps(result, default=str) + '\n')
+                    continue
+                if result.get('error', None) is not None:
+                    writer.writerow({'student':result.get('student'), 'degree':result.get('degree'), 'error':result.get('error')})
+                    continue
+                for template_name, status in result.get('templates', dict()).items():
+                    writer.writerow({'student':result.get('student'), 'degree':result.get('degree'), 'template':template_name,
+                        'required':status.get('required'), 'actual':len(status.get('courses')), 'courses':';'.join(status.get('courses'))})
+
+        # course names resolved once, {name : unique name or None}
+        resolved = dict()
+        def resolve(student):
+            try:
+                student_id, degree_name, course_names = student
+                unique_names = list()
+                for course_name in course_names:
+                    if course_name not in resolved:
+                        matches = self.catalog.search(course_name)
+                        resolved.update({course_name:matches[0] if len(matches) == 1 else None})
+                    unique_names.append(resolved.get(course_name) if resolved.get(course_name) is not None else course_name)
+                return (student_id, degree_name, unique_names)
+            except Exception:
+                # audited as it is, so the failure is written along with the other students
+                return student
+
+        students = iter(students)
+        def chunks():
+            while True:
+                chunk = [resolve(student) for student in itertools.islice(students, chunk_size)]
+                if not len(chunk):
+                    return
+                yield chunk
+
+        audit_state = (self.catalog, {course.unique_name:course for course in self.catalog.courses()})
+        try:
+            if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+                for chunk in chunks():
+                    write(audit_students(chunk))
+            else:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+                    pending = set()
+                    for chunk in chunks():
+                        pending.add(executor.submit(audit_students, chunk))
+                        # keep a couple of chunks per process queued, write whatever finished
+                        if len(pending) >= workers * 2:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                write(future.result())
+                    for future in pending:
+                        write(future.result())
+        finally:
+            audit_state = None
+
+        seconds = timeit.default_timer() - start
+        report.update({'seconds':seconds, 'audits per second':report['audits'] / seconds if seconds > 0 else 0})
+        io.print(f"audited {report['audits']} students in {seconds:.3f}s, {report['audits per second']:.1f} audits/sec, {report['errors']} errors")
+        return report
+
+
+    def rank_degrees(self, courses, workers:int=0, budget_ms:float=None, io:Output=None) -> list:
+        ''' Every degree of the catalog ranked by how close a transcript is to completing it
+
+        Templates with the same specifications in different degrees (a shared math or hass
+        requirement) are matched against the transcript once for all of them. Degrees are then
+        fulfilled in a process pool forked from this planner when workers is more than 1, so the
+        catalog and the matches are inherited instead of pickled.
+
+        Args:
+            courses (iterable): taken courses, as Course objects or unique course names
+            workers (int): number of processes, 0 or 1 to fulfill every degree in this process
+            budget_ms (float): milliseconds every degree must be done in together, None for no limit.
+                See Degree.fulfillment
+            io (Output): user interface output for the timing report
+
+        Returns:
+            ranking (list): one dictionary per degree with its name, unfulfilled, filled and required
+                slots, completion (share of required slots filled) and whether the deadline truncated it,
+                fewest unfulfilled slots first, then most filled slots
+        '''
+        global rank_state
+        if io is None:
+            io = self.default_io
+
+        start = timeit.default_timer()
+        deadline = budget_deadline(budget_ms)
+        taken_courses = set()
+        for course in courses:
+            if isinstance(course, str):
+                course = self.catalog.get_course(course)
+            if course is not None:
+                taken_courses.add(course)
+
+        # every distinct specification matched once, the degrees rebuild their matches from these
+        degrees = list(self.catalog.degrees())
+        matches = dict()
+        for degree in degrees:
+            degree.max_fulfillment_possibilities(taken_courses, matches)
+
+        rank_state = (degrees, taken_courses, matches, deadline)
+        try:
+            if workers <= 1 or len(degrees) <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+                ranking = [rank_degree(i) for i in range(len(degrees))]
+            else:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+                    ranking = list(executor.map(rank_degree, range(len(degrees))))
+        finally:
+            rank_state = None
+
+        ranking.sort(key=lambda entry: (entry.get('unfulfilled'), -entry.get('filled'), entry.get('degree')))
+        io.info(f"ranked {len(ranking)} degrees in {timeit.default_timer() - start:.3f}s, {len(matches)} distinct specifications matched")
+        return ranking
+
+
     def cache(self):
         if self.catalog.recommender is not None:
             self.catalog.recommender.recache()
+
+
+audit_state = None # (catalog, {unique name : course}) inherited by forked processes
+
+def audit_students(chunk:list) -> list:
+    '''
+    process pool task of Planner.audit_many
+
+    Returns:
+        results (list): one dictionary per student, ready to be written as json
+    '''
+    catalog, courses = audit_state
+    results = list()
+    for student in chunk:
+        try:
+            results.append(audit_student(catalog, courses, *student))
+        except Exception as e:
+            # a malformed record or a failed fulfillment only fails its own student
+            student_id = student[0] if isinstance(student, (tuple, list)) and len(student) else student
+            degree_name = student[1] if isinstance(student, (tuple, list)) and len(student) > 1 else None
+            results.append({'student':student_id, 'degree':degree_name, 'error':f'{type(e).__name__}: {e}'})
+    return results
+
+
+def audit_student(catalog, courses:dict, student_id, degree_name:str, unique_names:list) -> dict:
+    '''
+    audit of one student of Planner.audit_many
+
+    Returns:
+        result (dict): the audit, ready to be written as json
+    '''
+    result = {'student':student_id, 'degree':degree_name}
+    degree = catalog.get_degree(degree_name)
+    taken_courses = set([courses.get(name) for name in unique_names if name in courses])
+    result.update({'unknown courses':[name for name in unique_names if name not in courses]})
+    if degree is None:
+        result.update({'error':f'invalid degree {degree_name}'})
+        return result
+
+    fulfillment = degree.fulfillment(taken_courses)
+    result.update({'unfulfilled':total_unfulfilled_slots(fulfillment), 'filled':total_filled_slots(fulfillment)})
+    templates = dict()
+    for template, status in fulfillment.items():
+        templates.update({template.name:{'required':status.get_required_count(), 'courses':sorted([course.unique_name for course in status.get_fulfillment_set()])}})
+    result.update({'templates':templates})
+    return result
+
+
+rank_state = None # ([degree], taken courses, shared matches, deadline) inherited by forked processes
+
+def rank_degree(position:int) -> dict:
+    '''
+    process pool task of Planner.rank_degrees, only the position of the degree is sent to the process
+
+    Returns:
+        entry (dict): ranking entry of the degree
+    '''
+    degrees, taken_courses, matches, deadline = rank_state
+    degree = degrees[position]
+    fulfillment = degree.fulfillment(taken_courses, deadline=deadline, matches=matches)
+    required = sum([status.get_required_count() for status in fulfillment.values()])
+    unfulfilled = total_unfulfilled_slots(fulfillment)
+    return {'degree':degree.name, 'unfulfilled':unfulfilled, 'filled':total_filled_slots(fulfillment), 'required':required,
+        'completion':(required - unfulfilled) / required if required else 1, 'truncated':fulfillment.truncated}
@@ -4,6 +4,8 @@ Schedule class
 
 import json
 from ..dp.course import Course
+from ..math.budget import Budgeted_Result
+from ..math.budget import budget_deadline
 
 class Schedule():
     '''
@@ -22,6 +24,12 @@ class Schedule():
         self.name = name
         self.degree = None
 
+        self.last_fulfillment = None
+        self.last_courses = None # courses the last fulfillment was computed for
+        self.last_degree = None # degree the last fulfillment was computed for
+        self.last_version = None # version of its templates and of the catalog
+        self.last_attributes = None # {Course : version of its attributes} of the last courses
+
         # master_list must be initiated before use
         self.master_list_init()
 
@@ -94,6 +102,53 @@ class Schedule():
         return courses
 
 
+    def fulfillment(self, budget_ms:float=None, deadline:float=None) -> Budgeted_Result:
+        '''
+        Fulfillment of the schedule's degree, updated from the last fulfillment instead of computed
+        again when possible. Changes to courses no template can use keep the last result as is, other
+        changes are repaired locally by the degree, and a full fulfillment is computed only if the
+        repair can't be proven as good. Courses added and removed are found by comparing with the courses
+        of the last fulfillment, so a course added and removed again is no change. Changes to the catalog or
+        to the attributes of a course compute a full fulfillment.
+
+        Args:
+            budget_ms (float): time budget of the repair and the full fulfillment together, see Degree.fulfillment
+            deadline (float): deadline of the repair and the full fulfillment, see Degree.fulfillment
+
+        Returns:
+            fulfillment (Budgeted_Result): {Template:Fulfillment_Status}, None if the schedule has no degree.
+                A fulfillment cut short by the deadline isn't kept to be updated later
+        '''
+        if self.degree is None:
+            return None
+
+        courses = self.courses()
+        version = (self.degree.version(), self.degree.catalog.version if self.degree.catalog is not None else None)
+        deadline = budget_deadline(budget_ms, deadline)
+        fulfillment = None
+
+        # degrees are compared by identity, another degree object of the same name may have other templates.
+        # Courses whose attributes changed in place since may now match other templates, start over
+        if self.last_fulfillment is not None and self.last_degree is self.degree and self.last_version == version \
+            and all([course.attributes.version == attributes_version for course, attributes_version in self.last_attributes.items()]):
+            added = set([c for c in courses.difference(self.last_courses) if self.degree.relevant(c)])
+            removed = set([c for c in self.last_courses.difference(courses) if self.degree.relevant(c)])
+            if not len(added) and not len(removed):
+                fulfillment = self.last_fulfillment
+            else:
+                fulfillment = self.degree.repair_fulfillment(self.last_fulfillment, courses, added, removed, deadline)
+
+        if fulfillment is None:
+            fulfillment = self.degree.fulfillment(courses, deadline=deadline)
+
+        self.last_fulfillment = fulfillment if not fulfillment.truncated else None
+        self.last_courses = courses
+        self.last_degree = self.degree
+        self.last_version = version
+        self.last_attributes = {course:course.attributes.version for course in courses}
+        return fulfillment
+
+
     def find_course(self, course:Course) -> list:
         '''
         Args:
@@ -0,0 +1,388 @@
+'''
+Randomized fulfillment instances checked against an exhaustive oracle
+
+Small random catalogs, degrees and transcripts are generated, every fulfillment engine is run on
+them, and the results are compared with the true optimum found by trying every placement of every
+course. Failing instances are shrunk to a minimal repro that can be replayed with -i.
+
+Results are optimal, or fail by: an exception (error), breaking the rules of templates or beating every
+possible placement (invalid), with -compact a fulfillment other than the one of python sets (mismatch), leaving a template short for less important ones (priority), more
+unfulfilled slots than the optimum (unfulfilled), or as many and fewer filled slots (filled).
+
+usage: python fuzz.py [-n instances] [-s seed] [-c courses] [-t templates] [-b bins] [-e engine] [-i repro.json] [-noshrink] [-compact]
+'''
+
+import sys
+import re
+import json
+import random
+import logging
+import itertools
+import timeit
+from datetime import datetime
+
+from degree_planner.dp.course import Course
+from degree_planner.dp.degree import Degree
+from degree_planner.dp.template import Template
+from degree_planner.dp.degree import total_unfulfilled_slots
+from degree_planner.dp.degree import total_filled_slots
+from degree_planner.dp.degree import FULFILLMENT_ENGINES
+
+ORACLE_LIMIT = 200000 # most placements the oracle tries before giving up on an instance
+FAILURES = ('error', 'invalid', 'mismatch', 'priority', 'unfulfilled', 'filled') # worst first
+
+
+class Fulfillment_Instance():
+    '''
+    A degree and a transcript as plain data, so instances can be printed, saved and shrunk
+
+        courses (dict): {course name : [attributes]}
+        templates (list): [[name, specifications, replacement, courses required]] in order of importance
+        taken (list): names of the taken courses
+    '''
+
+    def __init__(self, courses:dict, templates:list, taken:list):
+        self.courses = courses
+        self.templates = templates
+        self.taken = taken
+
+    def build(self) -> tuple:
+        '''
+        Returns:
+            degree (Degree): new degree of the templates
+            taken_courses (set): new Course objects of the taken courses
+        '''
+        degree = Degree('fuzz')
+        for name, specifications, replacement, courses_required in self.templates:
+            degree.add_template(Template(name, list(specifications), replacement, courses_required))
+
+        # courses only differ by name, so removing one while shrinking doesn't reorder the others
+        taken_courses = set()
+        for name in self.courses.keys():
+            if name not in self.taken:
+                continue
+            course = Course(name, 'FUZZ', 1000)
+            for attribute in self.courses.get(name):
+                course.add_attribute(attribute)
+            taken_courses.add(course)
+        return degree, taken_courses
+
+    def reductions(self):
+        '''
+        smaller instances, the ones removing the most first
+        '''
+        if len(self.courses) > len(self.taken):
+            yield Fulfillment_Instance({name:self.courses.get(name) for name in self.taken}, self.templates, self.taken)
+        for i in range(len(self.templates)):
+            yield Fulfillment_Instance(self.courses, self.templates[:i] + self.templates[i + 1:], self.taken)
+        for name in self.taken:
+            courses = {course:attributes for course, attributes in self.courses.items() if course != name}
+            yield Fulfillment_Instance(courses, self.templates, [course for course in self.taken if course != name])
+        for i, (name, specifications, replacement, courses_required) in enumerate(self.templates):
+            # every attribute of a compound specification on its own
+            if len(specifications) == 1 and re.search(r'[&|]', specifications[0]):
+                for attribute in re.findall(r'[^\s&|()]+', specifications[0]):
+                    yield self.with_template(i, [name, [attribute], replacement, courses_required])
+            if courses_required > 1:
+                yield self.with_template(i, [name, specifications, replacement, courses_required - 1])
+            if replacement:
+                yield self.with_template(i, [name, specifications, False, courses_required])
+        for name, attributes in self.courses.items():
+            for attribute in attributes:
+                courses = dict(self.courses)
+                courses.update({name:[e for e in attributes if e != attribute]})
+                yield Fulfillment_Instance(courses, self.templates, self.taken)
+
+    def with_template(self, i:int, template:list):
+        return Fulfillment_Instance(self.courses, self.templates[:i] + [template] + self.templates[i + 1:], self.taken)
+
+    def json(self) -> str:
+        return json.dumps({'courses':self.courses, 'templates':self.templates, 'taken':self.taken})
+
+    @staticmethod
+    def from_json(text:str):
+        data = json.loads(text)
+        return Fulfillment_Instance(data.get('courses'), data.get('templates'), data.get('taken'))
+
+
+def random_instance(rng:random.Random, courses:int=8, templates:int=4, bins:int=4) -> Fulfillment_Instance:
+    '''
+    courses with one to three of the given number of bins and sometimes a concentration, templates over
+    plain, & and | and nested specifications and concentration wildcards, about half of the courses taken
+    '''
+    course_attributes = dict()
+    for i in range(courses):
+        attributes = [f'bin.{b}' for b in rng.sample(range(1, bins + 1), rng.randint(1, min(3, bins)))]
+        for concentration in rng.sample(('ai', 'systems', 'theory'), rng.choice((0, 0, 1, 2))):
+            attributes.append(f'concentration.{concentration}')
+        course_attributes.update({f'c{i}':sorted(attributes)})
+
+    def atom() -> str:
+        return f'bin.{rng.randint(1, bins)}'
+
+    degree_templates = list()
+    for i in range(templates):
+        kind = rng.choice(('atom', 'atom', 'and', 'or', 'nested', 'wildcard', 'wildcard and'))
+        if kind == 'atom':
+            specification = atom()
+        elif kind == 'and':
+            specification = f'{atom()} & {atom()}'
+        elif kind == 'or':
+            specification = f'{atom()} | {atom()}'
+        elif kind == 'nested':
+            specification = f'{atom()} | ({atom()} & {atom()})'
+        elif kind == 'wildcard':
+            specification = 'concentration.*'
+        else:
+            specification = f'concentration.* & {atom()}'
+        degree_templates.append([f't{i}', [specification], rng.random() < 0.4, rng.randint(1, 3)])
+
+    taken = sorted([name for name in course_attributes.keys() if rng.random() < 0.6])
+    return Fulfillment_Instance(course_attributes, degree_templates, taken)
+
+
+def oracle(degree:Degree, taken_courses:set, priority:bool=True) -> tuple:
+    '''
+    The true optimum by exhaustive search: for every combination of wildcard templates, every course is
+    placed in one non replacement template wanting it or in every replacement template wanting it (a
+    course in no template is never better than in every replacement template that wants it)
+
+    With priority, placements follow the rule of Degree: templates in order of importance each get as many
+    of their required slots filled as possible, then the most filled slots, and the combination with the
+    fewest unfulfilled slots and then the most filled slots is the optimum, like in Degree.fulfillment.
+    Without it the placement is free to leave an important template short for two less important ones
+
+    Returns:
+        optimum (tuple): (fewest unfulfilled slots, most filled slots with that many unfulfilled), None if
+            the instance needs more than ORACLE_LIMIT placements
+    '''
+    possibilities = degree.max_fulfillment_possibilities(taken_courses)
+    combos = list(itertools.product(*possibilities))
+    placements = list()
+    total = 0
+    for combo in combos:
+        courses = set()
+        for status in combo:
+            courses.update(status.get_fulfillment_set())
+        choices = list()
+        for course in sorted(courses, key=lambda course: course.unique_name):
+            wanting = [i for i, status in enumerate(combo) if course in status.get_fulfillment_set()]
+            nr = [(i,) for i in wanting if not combo[i].get_template().replacement]
+            r = tuple([i for i in wanting if combo[i].get_template().replacement])
+            choices.append(nr + [r] if len(r) else nr)
+        count = 1
+        for options in choices:
+            count *= len(options)
+        total += count
+        if total > ORACLE_LIMIT:
+            return None
+        placements.append(choices)
+
+    best = None
+    for combo, choices in zip(combos, placements):
+        # templates of a combination are in order of importance
+        required = [status.get_required_count() for status in combo]
+        combo_best = None # (key, unfulfilled, filled)
+        for placement in itertools.product(*choices):
+            counts = [0] * len(combo)
+            for targets in placement:
+                for i in targets:
+                    counts[i] += 1
+            unfulfilled = sum([max(0, required[i] - counts[i]) for i in range(len(combo))])
+            if priority:
+                key = tuple([-min(required[i], counts[i]) for i in range(len(combo))]) + (-sum(counts),)
+            else:
+                key = (unfulfilled, -sum(counts))
+            if combo_best is None or key < combo_best[0]:
+                combo_best = (key, unfulfilled, sum(counts))
+        score = (combo_best[1], -combo_best[2])
+        if best is None or score < best:
+            best = score
+    if best is None:
+        return (0, 0)
+    return best[0], -best[1]
+
+
+def check_fulfillment(degree:Degree, taken_courses:set, fulfillment:dict) -> list:
+    '''
+    Returns:
+        problems (list): every way the fulfillment breaks the rules, empty if it is a valid fulfillment
+    '''
+    problems = list()
+    names = [template.name for template in degree.templates]
+    if sorted([template.name for template in fulfillment.keys()]) != sorted(names):
+        problems.append(f'templates {sorted([template.name for template in fulfillment.keys()])} instead of {sorted(names)}')
+
+    nr_courses = dict() # {course : non replacement template holding it}
+    r_courses = set()
+    for template, status in fulfillment.items():
+        for course in status.get_fulfillment_set():
+            if course not in taken_courses:
+                problems.append(f'{template.name} holds untaken course {course.unique_name}')
+            elif not template.get_predicate().evaluate(course)[0]:
+                problems.append(f'{template.name} {template.specifications} holds unmatched course {course.unique_name}')
+            if template.replacement:
+                r_courses.add(course)
+            elif course in nr_courses:
+                problems.append(f'{course.unique_name} held by non replacement templates {nr_courses.get(course)} and {template.name}')
+            else:
+                nr_courses.update({course:template.name})
+    for course in r_courses.intersection(nr_courses.keys()):
+        problems.append(f'{course.unique_name} held by non replacement template {nr_courses.get(course)} and replacement templates')
+    return problems
+
+
+def fulfillment_names(fulfillment:dict) -> list:
+    return sorted([(template.name, sorted([course.unique_name for course in status.get_fulfillment_set()])) for template, status in fulfillment.items()])
+
+
+def run_engine(instance:Fulfillment_Instance, engine:str, optimum:tuple, slot_optimum:tuple, compact:bool=False) -> tuple:
+    '''
+    Parameters:
+        optimum (tuple): oracle optimum following the importance of templates
+        slot_optimum (tuple): oracle optimum without it, nothing valid can do better
+        compact (bool): run the engine on bitsets, and compare with the fulfillment of python sets
+
+    Returns:
+        verdict (str): 'optimal' or one of FAILURES, 'priority' if the engine beat the optimum by leaving
+            an important template short
+        detail (str): what went wrong
+        seconds (float): runtime of the fulfillment
+    '''
+    degree, taken_courses = instance.build()
+    start = timeit.default_timer()
+    try:
+        fulfillment = degree.fulfillment(taken_courses, engine=engine, cached=False, compact=compact)
+    except Exception as e:
+        return 'error', f'{type(e).__name__}: {e}', timeit.default_timer() - start
+    seconds = timeit.default_timer() - start
+
+    def better(a:tuple, b:tuple) -> bool:
+        return a[0] < b[0] or (a[0] == b[0] and a[1] > b[1])
+
+    problems = check_fulfillment(degree, taken_courses, fulfillment)
+    result = (total_unfulfilled_slots(fulfillment), total_filled_slots(fulfillment))
+    if not len(problems) and better(result, slot_optimum):
+        problems.append(f'beats the oracle optimum {slot_optimum} of any placement')
+    if len(problems):
+        return 'invalid', '; '.join(problems), seconds
+    if compact:
+        plain_degree, plain_courses = instance.build()
+        plain = fulfillment_names(plain_degree.fulfillment(plain_courses, engine=engine, cached=False))
+        if fulfillment_names(fulfillment) != plain:
+            return 'mismatch', f'{fulfillment_names(fulfillment)} against {plain} of python sets', seconds
+    if better(result, optimum):
+        return 'priority', f'{result} beats the optimum {optimum} of placements following importance', seconds
+    if result[0] > optimum[0]:
+        return 'unfulfilled', f'{result} against optimum {optimum}', seconds
+    if result[1] < optimum[1]:
+        return 'filled', f'{result} against optimum {optimum}', seconds
+    return 'optimal', '', seconds
+
+
+def verdict(instance:Fulfillment_Instance, engine:str, compact:bool=False) -> tuple:
+    optimum = oracle(*instance.build())
+    if optimum is None:
+        return None, ''
+    result, detail, seconds = run_engine(instance, engine, optimum, oracle(*instance.build(), priority=False), compact)
+    return result, detail
+
+
+def shrink(instance:Fulfillment_Instance, engine:str, failure:str, compact:bool=False) -> Fulfillment_Instance:
+    '''
+    greedily applies reductions that keep the engine failing the same way, until none does
+    '''
+    reduced = True
+    while reduced:
+        reduced = False
+        for smaller in instance.reductions():
+            if verdict(smaller, engine, compact)[0] == failure:
+                instance = smaller
+                reduced = True
+                break
+    return instance
+
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    instances = 200
+    seed = 0
+    courses = 8
+    templates = 4
+    bins = 4
+    engines = list(FULFILLMENT_ENGINES)
+    replay = None
+    shrinking = True
+    compact = False
+    for i in range(len(sys.argv)):
+        if i + 1 < len(sys.argv):
+            if sys.argv[i] == '-n':
+                instances = int(sys.argv[i + 1])
+            if sys.argv[i] == '-s':
+                seed = int(sys.argv[i + 1])
+            if sys.argv[i] == '-c':
+                courses = int(sys.argv[i + 1])
+            if sys.argv[i] == '-t':
+                templates = int(sys.argv[i + 1])
+            if sys.argv[i] == '-b':
+                bins = int(sys.argv[i + 1])
+            if sys.argv[i] == '-e':
+                engines = [sys.argv[i + 1]]
+            if sys.argv[i] == '-i':
+                with open(sys.argv[i + 1]) as f:
+                    replay = Fulfillment_Instance.from_json(f.read())
+        if sys.argv[i] == '-noshrink':
+            shrinking = False
+        if sys.argv[i] == '-compact':
+            compact = True
+
+    if replay is not None:
+        for engine in engines:
+            result, detail = verdict(replay, engine, compact)
+            print(f'{engine.ljust(8)}{result} {detail}')
+        return
+
+    print(f"beginning fuzzing {datetime.now()}, {instances} instances of {courses} courses and {templates} templates over {bins} bins, seed {seed}{', compact' if compact else ''}")
+    rng = random.Random(seed)
+    counts = {engine:{result:0 for result in ('optimal',) + FAILURES} for engine in engines}
+    times = {engine:0 for engine in engines}
+    oracle_time = 0
+    skipped = 0
+    priority_cost = 0 # instances where following importance costs slots
+    failures = dict() # {(engine, failure) : first failing instance}
+    for n in range(instances):
+        instance = random_instance(rng, courses, templates, bins)
+        start = timeit.default_timer()
+        optimum = oracle(*instance.build())
+        if optimum is None:
+            oracle_time += timeit.default_timer() - start
+            skipped += 1
+            continue
+        slot_optimum = oracle(*instance.build(), priority=False)
+        oracle_time += timeit.default_timer() - start
+        if slot_optimum != optimum:
+            priority_cost += 1
+        for engine in engines:
+            result, detail, seconds = run_engine(instance, engine, optimum, slot_optimum, compact)
+            counts.get(engine).update({result:counts.get(engine).get(result) + 1})
+            times.update({engine:times.get(engine) + seconds})
+            if result != 'optimal' and (engine, result) not in failures:
+                failures.update({(engine, result):instance})
+
+    print(f"\n{'engine'.ljust(10)}" + ''.join([result.ljust(13) for result in ('optimal',) + FAILURES]) + 'time (ms)')
+    for engine in engines:
+        print(engine.ljust(10) + ''.join([str(counts.get(engine).get(result)).ljust(13) for result in ('optimal',) + FAILURES]) + f'{times.get(engine) * 1000:.3f}')
+    print(f"{'oracle'.ljust(10)}{str(instances - skipped).ljust(13 * (len(FAILURES) + 1))}{oracle_time * 1000:.3f}")
+    print(f'{priority_cost} instances have more filled or fewer unfulfilled slots by leaving important templates short')
+    if skipped:
+        print(f'{skipped} instances were too large for the oracle')
+
+    for (engine, failure), instance in sorted(failures.items(), key=lambda entry: (entry[0][0], FAILURES.index(entry[0][1]))):
+        if shrinking:
+            instance = shrink(instance, engine, failure, compact)
+        print(f'\n{engine} {failure}: {verdict(instance, engine, compact)[1]}')
+        print(instance.json())
+
+
+if __name__ == '__main__':
+    main()
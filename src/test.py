@@ -14,18 +14,39 @@ mem_before = process_memory()
 import logging
 from datetime import datetime
 import timeit
+import io
+import contextlib
+import tempfile
+import shutil
+import json
+import csv
+import random
 
 from degree_planner.planner import Planner
 from degree_planner.dp.degree import Degree
+from degree_planner.dp.degree import FULFILLMENT_ENGINES
+from degree_planner.dp.degree_set import Degree_Set
+from degree_planner.dp.degree_set import shared_courses
+from degree_planner.dp.degree import total_unfulfilled_slots
+from degree_planner.dp.degree import total_filled_slots
 from degree_planner.dp.course import Course
 from degree_planner.dp.template import Template
 from degree_planner.dp.template import template_parsing
+from degree_planner.dp.match_table import Match_Table
+from degree_planner.dp.match_table import match_table_key
+from degree_planner.dp.fulfillment_status import Fulfillment_Status
+from degree_planner.dp.fulfillment_table import Fulfillment_Table
 from degree_planner.math.attributes import Attributes
 from degree_planner.math.graph import Graph
 from degree_planner.math.graph import Edge_Generator
 from degree_planner.math.sorting import sorting
 from degree_planner.user.user import User
+from degree_planner.user.schedule import Schedule
 from degree_planner.io.output import Output
+from degree_planner.math.bitset import Bitset
+from degree_planner.math.bitset import Bitset_Index
+from fuzz import check_fulfillment
+from fuzz import random_instance
 
 mem_after_imports = process_memory()
 
@@ -38,6 +59,21 @@ class Test_Graph_Edge_Data_Gen(Edge_Generator):
         return 'CON' if (int(node1) < int(node2) or (int(node1) + int(node2)) % 2 == 0) else None
     
 
+class Random_Edge_Data_Gen(Edge_Generator):
+
+    def __init__(self, rng:random.Random) -> None:
+        self.rng = rng
+
+    def edge_data(self, node1, node2):
+        return self.rng.choice([None, set(), {node1 + node2}, {node1, node2}])
+
+    def zero_value(self, value) -> bool:
+        return value is None or not len(value)
+
+    def print_edge(self, value) -> str:
+        return '-' if self.zero_value(value) else str(sorted(value))
+
+
 def test_graph():
     n1 = '1'
     n2 = '2'
@@ -103,7 +139,7 @@ def test_graph():
 
 
 def test_other():
-    planner = Planner(enable_tensorflow=False)
+    planner = Planner(enable_tensorflow=False, match_table_folder=None)
     
     catalog = planner.catalog
     degree = Degree("computer science", catalog)
@@ -197,6 +233,8 @@ def test_other():
         'credits.5-':True,
         'credits.3-':True,
         'credits.2-':False,
+        'credits.10-':True,
+        'credits.10+':False,
         'bin.-':False,
         'bin.z-':True
     }
@@ -231,7 +269,7 @@ def test_other():
 
 
 def test_fulfillment():
-    planner = Planner(enable_tensorflow=False)
+    planner = Planner(enable_tensorflow=False, match_table_folder=None)
     user = User(1)
     
     catalog = planner.catalog
@@ -290,10 +328,11 @@ def test_fulfillment():
     print('template 1 + template 2: ' + repr(testtemplate1 + testtemplate2))
 
     run_cmd(planner, user, 'degree, computer science, add, 1, bin 1, add, 2, bin 2, add, 3, bin 3, add, 4, bin 4, add, 5, bin 5, print, fulfillment')
+    return user.get_active_schedule()
 
 
 def test_fulfillment2():
-    planner = Planner(enable_tensorflow=False)
+    planner = Planner(enable_tensorflow=False, match_table_folder=None)
     user = User(1)
     
     catalog = planner.catalog
@@ -353,9 +392,10 @@ def test_fulfillment2():
     catalog.reindex()
 
     run_cmd(planner, user, 'degree, computer science, add, 1, bin 1, add, 2, bin 2, add, 3, bin 3, add, 4, bin 4, add, 5, bin 5, add, 6, bin 6, print, fulfillment')
+    return user.get_active_schedule()
 
 def test_fulfillment3():
-    planner = Planner(enable_tensorflow=False)
+    planner = Planner(enable_tensorflow=False, match_table_folder=None)
     user = User(1)
     
     catalog = planner.catalog
@@ -415,10 +455,11 @@ def test_fulfillment3():
 
     run_cmd(planner, user, 'degree, computer science, add, 1, bin 1, add, 2, bin 2, add, 3, bin 3, add, 4, bin 4, add, 5, bin 5, add, 6, bin 6')
     run_cmd(planner, user, 'print, fulfillment')
+    return user.get_active_schedule()
 
 
 def test_fulfillment4():
-    planner = Planner(enable_tensorflow=False)
+    planner = Planner(enable_tensorflow=False, match_table_folder=None)
     user = User(1)
     
     catalog = planner.catalog
@@ -451,10 +492,11 @@ def test_fulfillment4():
 
     run_cmd(planner, user, 'degree, computer science, add, 1, bin 1, add, 2, bin 2, add, 3, bin 3, add, 4, bin 4, add, 5, bin 5, add, 6, bin 6')
     run_cmd(planner, user, 'print, fulfillment')
+    return user.get_active_schedule()
 
 
 def test_fulfillment5():
-    planner = Planner(enable_tensorflow=False)
+    planner = Planner(enable_tensorflow=False, match_table_folder=None)
     user = User(1)
     
     catalog = planner.catalog
@@ -511,9 +553,10 @@ def test_fulfillment5():
 
     run_cmd(planner, user, 'degree, computer science, add, 1, bin 1, add, 2, bin 2, add, 3, bin 3, add, 4, bin 4, add, 5, bin 5, add, 6, bin 6')
     run_cmd(planner, user, 'print, fulfillment')
+    return user.get_active_schedule()
 
 def test_fulfillment6():
-    planner = Planner(enable_tensorflow=False)
+    planner = Planner(enable_tensorflow=False, match_table_folder=None)
     user = User(1)
     
     catalog = planner.catalog
@@ -655,6 +698,7 @@ def test_fulfillment6():
     run_cmd(planner, user, 'degree, computer science, add, 1, bin 01, add, 2, bin 02, add, 3, bin 03, add, 4, bin 04, add, 5, bin 05, add, 6, bin 06')
     run_cmd(planner, user, 'add, 7, bin 07, add, 7, bin 08, add, 7, bin 09, add, 7, bin 10, add, 7, bin 11, add, 8, bin 11')
     run_cmd(planner, user, 'print, fulfillment')
+    return user.get_active_schedule()
 
     
     #print('\ntesting fulfillment recommendations: \n')
@@ -662,7 +706,7 @@ def test_fulfillment6():
 
 def test_recommender(recache, tf_disabled):
 
-    planner = Planner(enable_tensorflow=(not tf_disabled))
+    planner = Planner(enable_tensorflow=(not tf_disabled), match_table_folder=None)
     user1 = User(1)
     user2 = User(2)
     user3 = User(3)
@@ -695,6 +739,513 @@ def test_recommender(recache, tf_disabled):
         run_cmd(planner, user, "print, fulfillment")
         print('\n\n')
 
+def check(description, response, answer):
+    print(f"{description}\n  response: {response}\n  correct response: {answer}")
+    print(f"  answer is {'correct :)' if response == answer else 'INCORRECT INCORRECT INCORRECT!'}")
+
+
+def fulfillment_names(fulfillment) -> list:
+    return sorted([(template.name, sorted([course.unique_name for course in status.get_fulfillment_set()])) for template, status in fulfillment.items()])
+
+
+def bundled_schedules() -> list:
+    '''
+    schedules of the fulfillment test cases above, built without printing
+    '''
+    schedules = list()
+    logging.disable(logging.CRITICAL)
+    for test_case in (test_fulfillment, test_fulfillment2, test_fulfillment3, test_fulfillment4, test_fulfillment5, test_fulfillment6):
+        with contextlib.redirect_stdout(io.StringIO()):
+            schedules.append((test_case.__name__, test_case()))
+    logging.disable(logging.NOTSET)
+    return schedules
+
+
+def test_compact():
+    index = Bitset_Index(['a', 'b', 'c'])
+    bitset = Bitset(index, ['a', 'c'])
+    check('bitset of a, c', sorted(bitset), ['a', 'c'])
+    check('bitset union b', sorted(bitset | {'b'}), ['a', 'b', 'c'])
+    check('bitset difference a', sorted(bitset - {'a'}), ['c'])
+    index.remove('c')
+    check('bitset after c is removed from the index', sorted(bitset), ['a', 'c'])
+    check('c is no longer found', 'c' in bitset, False)
+
+    for name, schedule in bundled_schedules():
+        for engine in FULFILLMENT_ENGINES:
+            plain = schedule.degree.fulfillment(schedule.courses(), engine=engine, cached=False)
+            compact = schedule.degree.fulfillment(schedule.courses(), engine=engine, cached=False, compact=True)
+            check(f'{name} {engine} engine compact fulfillment', fulfillment_names(compact), fulfillment_names(plain))
+
+
+def test_engines():
+    for name, schedule in bundled_schedules():
+        courses = schedule.courses()
+        for engine in FULFILLMENT_ENGINES:
+            fulfillment = schedule.degree.fulfillment(courses, engine=engine, cached=False)
+            check(f'{name} {engine} engine rule violations', check_fulfillment(schedule.degree, courses, fulfillment), [])
+        steal = schedule.degree.fulfillment(courses, engine='steal', cached=False)
+        flow = schedule.degree.fulfillment(courses, engine='flow', cached=False)
+        check(f'{name} flow engine (unfulfilled, filled) slots', (total_unfulfilled_slots(flow), total_filled_slots(flow)),
+            (total_unfulfilled_slots(steal), total_filled_slots(steal)))
+
+    # the weighted engine is a heuristic, this instance is the one in the docstring of template_weighted_fill
+    degree = Degree('weighted heuristic')
+    for name, specifications, replacement in (('t0', 'bin.4 | bin.2', True), ('t1', 'bin.2', True), ('t2', 'bin.1', False), ('t3', 'bin.4', False)):
+        degree.add_template(Template(name, [specifications], replacement, 1))
+    courses = set()
+    for name, attributes in (('c1', ('bin.1', 'bin.2')), ('c5', ('bin.4',))):
+        course = Course(name, 'TEST', 1000)
+        for attribute in attributes:
+            course.add_attribute(attribute)
+        courses.add(course)
+    for engine in FULFILLMENT_ENGINES:
+        fulfillment = degree.fulfillment(courses, engine=engine, cached=False)
+        check(f'weighted heuristic instance {engine} engine rule violations', check_fulfillment(degree, courses, fulfillment), [])
+        if engine != 'weighted':
+            check(f'weighted heuristic instance {engine} engine (unfulfilled, filled) slots', (total_unfulfilled_slots(fulfillment), total_filled_slots(fulfillment)), (1, 3))
+        else:
+            print(f'weighted heuristic instance weighted engine (unfulfilled, filled) slots: {(total_unfulfilled_slots(fulfillment), total_filled_slots(fulfillment))}')
+
+
+def test_parallel():
+    for name, schedule in bundled_schedules():
+        for engine in FULFILLMENT_ENGINES:
+            serial = schedule.degree.fulfillment(schedule.courses(), engine=engine, cached=False)
+            parallel = schedule.degree.fulfillment(schedule.courses(), engine=engine, workers=2, cached=False)
+            check(f'{name} {engine} engine fulfillment with 2 workers', fulfillment_names(parallel), fulfillment_names(serial))
+
+    # the bundled cases have few wildcard combinations, random instances of the fuzzer have more
+    rng = random.Random(9)
+    for n in range(20):
+        degree, courses = random_instance(rng, courses=10, templates=6).build()
+        serial = degree.fulfillment(courses, cached=False)
+        parallel = degree.fulfillment(courses, workers=2, cached=False)
+        check(f'random instance {n} fulfillment with 2 workers', fulfillment_names(parallel), fulfillment_names(serial))
+
+
+def test_repair():
+    def slots(fulfillment):
+        return (total_unfulfilled_slots(fulfillment), total_filled_slots(fulfillment))
+
+    for name, schedule in bundled_schedules():
+        schedule.fulfillment()
+        for course in sorted(schedule.courses(), key=lambda course: course.unique_name):
+            semester = schedule.find_course(course)[0]
+            schedule.remove_course(semester, course)
+            check(f'{name} (unfulfilled, filled) slots after removing {course.unique_name}', slots(schedule.fulfillment()),
+                slots(schedule.degree.fulfillment(schedule.courses(), cached=False)))
+            schedule.add_course(semester, course)
+            check(f'{name} (unfulfilled, filled) slots after adding {course.unique_name} back', slots(schedule.fulfillment()),
+                slots(schedule.degree.fulfillment(schedule.courses(), cached=False)))
+
+    name, schedule = bundled_schedules()[0]
+    courses = sorted(schedule.courses(), key=lambda course: course.unique_name)
+    fulfillment = schedule.degree.fulfillment(set(courses[1:]), cached=False)
+    check('repair after the deadline', schedule.degree.repair_fulfillment(fulfillment, set(courses), set(courses[:1]), set(), timeit.default_timer()), None)
+    check('repair without a deadline', slots(schedule.degree.repair_fulfillment(fulfillment, set(courses), set(courses[:1]), set())),
+        slots(schedule.degree.fulfillment(set(courses), cached=False)))
+
+    # another degree object of the same name is not the degree the last fulfillment was computed for
+    schedule.fulfillment()
+    schedule.degree = Degree(schedule.degree.name)
+    check('fulfillment of a new degree of the same name', len(schedule.fulfillment()), 0)
+
+    # attributes changed in place may make a course match other templates
+    course = Course('c1', 'TEST', 1000)
+    course.add_attribute('bin.1')
+    schedule = Schedule('attributes')
+    schedule.degree = Degree('attributes')
+    schedule.degree.add_template(Template('bin', 'bin.1'))
+    schedule.add_course(0, course)
+    check('(unfulfilled, filled) slots before the attribute changes', slots(schedule.fulfillment()), (0, 1))
+    course.remove_attribute('bin.1')
+    course.add_attribute('bin.2')
+    check('(unfulfilled, filled) slots after the attribute changes', slots(schedule.fulfillment()), slots(schedule.degree.fulfillment(schedule.courses(), cached=False)))
+    check('cached fulfillment after the attribute changes', slots(schedule.degree.fulfillment(schedule.courses())), (1, 0))
+
+    # so may a reindexed catalog
+    name, schedule = bundled_schedules()[5]
+    catalog = schedule.degree.catalog
+    schedule.fulfillment()
+    last = schedule.last_fulfillment
+    logging.disable(logging.CRITICAL)
+    catalog.reindex()
+    logging.disable(logging.NOTSET)
+    schedule.fulfillment()
+    check('last fulfillment kept after the catalog is reindexed', schedule.last_fulfillment is last, False)
+
+
+def test_cache():
+    name, schedule = bundled_schedules()[5]
+    degree = schedule.degree
+    courses = schedule.courses()
+    degree.cache.clear()
+    uncached = degree.fulfillment(courses, cached=False)
+    degree.fulfillment(courses)
+    check(f'{name} cached fulfillment', fulfillment_names(degree.fulfillment(courses)), fulfillment_names(uncached))
+    compact = degree.fulfillment(courses, compact=True)
+    check(f'{name} cached compact fulfillment', fulfillment_names(compact), fulfillment_names(uncached))
+    check(f'{name} cached compact fulfillment sets are bitsets', all([isinstance(status.get_fulfillment_set(), Bitset) for status in compact.values()]), True)
+
+    version = degree.version()
+    check('template version without changes', degree.version(), version)
+    template = degree.templates[0]
+    template.courses_required += 1
+    check('template version after a template changed', degree.version(), version + 1)
+    check(f'{name} cached fulfillment after a template changed', fulfillment_names(degree.fulfillment(courses)), fulfillment_names(degree.fulfillment(courses, cached=False)))
+    template.courses_required -= 1
+
+    # attributes changed in place are only seen by the catalog once it is reindexed
+    degree.fulfillment(courses)
+    course = sorted(courses, key=lambda course: course.unique_name)[0]
+    attributes = list(course.attributes)
+    for attribute in attributes:
+        course.remove_attribute(attribute)
+    degree.catalog.reindex(recompute_cache=False)
+    check(f'{name} cached fulfillment after {course.unique_name} lost its attributes', fulfillment_names(degree.fulfillment(courses)),
+        fulfillment_names(degree.fulfillment(courses, cached=False)))
+    for attribute in attributes:
+        course.add_attribute(attribute)
+    degree.catalog.reindex(recompute_cache=False)
+
+
+def test_audit_many():
+    logging.disable(logging.CRITICAL)
+    planner = Planner(io=Output(Output.OUT.NONE), enable_tensorflow=False, match_table_folder=None)
+    planner.import_data()
+    logging.disable(logging.NOTSET)
+    courses = ['csci 1200 data structures', 'csci 2300 introduction to algorithms', 'csci 4100 machine learning from data']
+    cohort = [(0, 'computer science', courses), (1, 'no such degree', courses), None, (3, 'computer science', 5), (4, 'computer science', courses[:1])]
+
+    degree = planner.catalog.get_degree('computer science')
+    fulfillment = degree.fulfillment(set([planner.catalog.get_course(name) for name in courses]), cached=False)
+    for workers in (0, 2):
+        out = io.StringIO()
+        report = planner.audit_many(cohort, out, workers=workers, io=Output(Output.OUT.NONE))
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        check(f'audits and errors with {workers} workers', (report.get('audits'), report.get('errors')), (5, 3))
+        check(f'students written with {workers} workers', [result.get('student') for result in results], [0, 1, None, 3, 4])
+        check(f'(student, degree) of errors with {workers} workers', [(result.get('student'), result.get('degree')) for result in results if result.get('error') is not None],
+            [(1, 'no such degree'), (None, None), (3, 'computer science')])
+        check(f'(unfulfilled, filled) slots of student 0 with {workers} workers', [(result.get('unfulfilled'), result.get('filled')) for result in results if result.get('student') == 0],
+            [(total_unfulfilled_slots(fulfillment), total_filled_slots(fulfillment))])
+
+    out = io.StringIO()
+    planner.audit_many(cohort, out, output_format='csv', io=Output(Output.OUT.NONE))
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    check('csv error rows', [(row.get('student'), row.get('degree')) for row in rows if row.get('error')], [('1', 'no such degree'), ('', ''), ('3', 'computer science')])
+    check('csv template rows of student 0', len([row for row in rows if row.get('student') == '0']), len(fulfillment))
+
+
+def test_fulfillment_table():
+    def incidence(table) -> list:
+        # counts of every course the brute force way, by scanning every fulfillment set
+        counts = list()
+        for course in sorted(set().union(*[status.get_fulfillment_set() for status in table.values()]), key=lambda course: course.unique_name):
+            holders = [template for template, status in table.items() if course in status.get_fulfillment_set()]
+            counts.append((course.unique_name, len(holders), len([template for template in holders if template.replacement])))
+        return counts
+
+    def table_incidence(table) -> list:
+        return [(course.unique_name, table.count(course), table.count(course, True)) for course in sorted(table.bound_courses(), key=lambda course: course.unique_name)]
+
+    for name, schedule in bundled_schedules():
+        fulfillment = schedule.degree.fulfillment(schedule.courses(), cached=False)
+        table = Fulfillment_Table({template:Fulfillment_Status(template, status.get_required_count(), set(status.get_fulfillment_set())) for template, status in fulfillment.items()})
+        check(f'{name} table course counts', table_incidence(table), incidence(table))
+        check(f'{name} table unfulfilled rows', sorted([template.name for template in table.templates(table.unfulfilled)]),
+            sorted([template.name for template, status in table.items() if status.unfulfilled_count()]))
+
+        # statuses report their changes to the table
+        template = list(table.keys())[0]
+        courses = sorted(schedule.courses(), key=lambda course: course.unique_name)
+        table.get(template).add_fulfillment_course(courses[0])
+        table.get(template).remove_fulfillment_course(courses[-1])
+        table.get(list(table.keys())[-1]).set_fulfillment_set(set(courses[1:3]))
+        table.pop(list(table.keys())[1])
+        check(f'{name} table course counts after changes', table_incidence(table), incidence(table))
+        check(f'{name} table templates of every row in order', table.templates(table.present), list(table.keys()))
+
+
+def test_journal():
+    def state(table) -> tuple:
+        return (fulfillment_names(table), sorted([(course.unique_name, table.count(course), table.count(course, True)) for course in table.bound_courses()]),
+            sorted([template.name for template in table.templates(table.unfulfilled)]), sorted([template.name for template in table.templates(table.excess)]))
+
+    for name, schedule in bundled_schedules():
+        fulfillment = schedule.degree.fulfillment(schedule.courses(), cached=False)
+        table = Fulfillment_Table({template:Fulfillment_Status(template, status.get_required_count(), set(status.get_fulfillment_set())) for template, status in fulfillment.items()})
+        templates = list(table.keys())
+        courses = sorted(schedule.courses(), key=lambda course: course.unique_name)
+        original = state(table)
+
+        point = table.checkpoint()
+        table.get(templates[0]).add_fulfillment_course(courses[0])
+        table.get(templates[0]).remove_fulfillment_course(courses[-1])
+        removed = table.pop(templates[1])
+        before_inner = state(table)
+        inner = table.checkpoint()
+        table.get(templates[-1]).set_fulfillment_set(set(courses[1:3]))
+        inserted = Template('journal test', 'bin.1')
+        table.update({inserted:Fulfillment_Status(inserted, 1, set(courses[:1]))})
+        table.get(templates[2]).add_fulfillment_course(courses[1])
+        table.rollback(inner)
+        check(f'{name} table after rolling back the inner checkpoint', state(table), before_inner)
+        table.rollback(point)
+        check(f'{name} table after rolling back every change', state(table), original)
+        check(f'{name} journal after rolling back to the first checkpoint', table.journal, None)
+        check(f'{name} removed status reports to the table again', removed.table is table, True)
+
+        point = table.checkpoint()
+        table.get(templates[0]).add_fulfillment_course(courses[0])
+        kept = state(table)
+        table.commit(point)
+        check(f'{name} table after committing', state(table), kept)
+        check(f'{name} journal after committing the first checkpoint', table.journal, None)
+
+
+def test_components():
+    for name, schedule in bundled_schedules():
+        for engine in FULFILLMENT_ENGINES:
+            schedule.degree.decompose = False
+            whole = schedule.degree.fulfillment(schedule.courses(), engine=engine, cached=False)
+            schedule.degree.decompose = True
+            components = schedule.degree.fulfillment(schedule.courses(), engine=engine, cached=False)
+            check(f'{name} {engine} engine fulfillment by components', fulfillment_names(components), fulfillment_names(whole))
+
+    # templates sharing no courses are in different components
+    rng = random.Random(17)
+    for n in range(20):
+        instance = random_instance(rng, courses=10, templates=6)
+        degree, courses = instance.build()
+        possibilities = degree.max_fulfillment_possibilities(courses)
+        wanted = [set().union(*[max_fulfillment.get_fulfillment_set() for max_fulfillment in options]) for options in possibilities]
+        components = degree.template_components(possibilities)
+        check(f'random instance {n} components share no courses', any([wanted[i] & wanted[j] for a in components for b in components if a is not b for i in a for j in b]), False)
+        degree.decompose = False
+        whole = degree.fulfillment(courses, cached=False)
+        degree, courses = instance.build()
+        check(f'random instance {n} fulfillment by components', fulfillment_names(degree.fulfillment(courses, cached=False)), fulfillment_names(whole))
+
+
+def test_budget():
+    check('default planner budget', Planner(io=Output(Output.OUT.NONE), enable_tensorflow=False).budget_ms, None)
+
+    # the first random instance with wildcard combinations to cut short
+    rng = random.Random(18)
+    while True:
+        degree, courses = random_instance(rng, courses=10, templates=6).build()
+        combinations = 1
+        for possibilities in degree.max_fulfillment_possibilities(courses):
+            combinations *= len(possibilities)
+        if combinations > 4:
+            break
+
+    fulfillment = degree.fulfillment(courses, deadline=timeit.default_timer())
+    check('(truncated, optimal, explored) after the deadline', (fulfillment.truncated, fulfillment.optimal, fulfillment.explored), (True, False, 1))
+    fulfillment = degree.fulfillment(courses)
+    check('(truncated, optimal, cached) without a budget', (fulfillment.truncated, fulfillment.optimal, fulfillment.cached), (False, True, False))
+    cached = degree.fulfillment(courses)
+    check('(cached, explored) of a cached fulfillment', (cached.cached, cached.explored), (True, fulfillment.explored))
+    check('cached fulfillment', fulfillment_names(cached), fulfillment_names(fulfillment))
+
+
+def test_degree_set():
+    def course(name):
+        course = Course(name, 'TEST', 1000)
+        course.add_attribute('bin.1')
+        return course
+
+    def bin_degree(name):
+        degree = Degree(name)
+        degree.add_template(Template('bin1', 'bin.1'))
+        return degree
+
+    # one course both degrees want, counted twice only if the limit allows sharing it
+    c1 = course('c1')
+    for limit, answer in ((0, 1), (1, 0), (None, 0)):
+        fulfillments = Degree_Set([bin_degree('a'), bin_degree('b')], limit).fulfillment({c1}, cached=False)
+        check(f'unfulfilled slots of two degrees over one course, shared limit {limit}', sum([total_unfulfilled_slots(e) for e in fulfillments.values()]), answer)
+    fulfillments = Degree_Set([bin_degree('a'), bin_degree('b')], 0).fulfillment({c1, course('c2')}, cached=False)
+    check('two degrees over two courses, shared limit 0', (sum([total_unfulfilled_slots(e) for e in fulfillments.values()]), len(shared_courses(fulfillments))), (0, 0))
+
+    # random degrees over the same courses never share more than the limit and keep the rules of their templates
+    rng = random.Random(19)
+    for n in range(20):
+        instance = random_instance(rng, courses=10, templates=4)
+        other = random_instance(rng, courses=10, templates=4)
+        first, courses = instance.build()
+        second = Degree('fuzz 2')
+        for name, specifications, replacement, courses_required in other.templates:
+            second.add_template(Template(name, list(specifications), replacement, courses_required))
+        for limit in (0, 1, 2):
+            fulfillments = Degree_Set([first, second], limit).fulfillment(courses, cached=False)
+            check(f'random degrees {n} shared courses within shared limit {limit}', len(shared_courses(fulfillments)) <= limit, True)
+            check(f'random degrees {n} rule violations with shared limit {limit}',
+                check_fulfillment(first, courses, fulfillments.get('fuzz')) + check_fulfillment(second, courses, fulfillments.get('fuzz 2')), [])
+
+    # the approximation in the class description, a wildcard template is given the courses of all its matches
+    c1 = Course('c1', 'TEST', 1000)
+    c1.add_attribute('concentration.x')
+    c2 = Course('c2', 'TEST', 1000)
+    c2.add_attribute('concentration.y')
+    first = Degree('a')
+    first.add_template(Template('concentration', 'concentration.*', False, 2))
+    second = Degree('b')
+    second.add_template(Template('y', 'concentration.y'))
+    fulfillments = Degree_Set([first, second], 0).fulfillment({c1, c2}, cached=False)
+    check('unfulfilled slots of each degree of the wildcard approximation', [total_unfulfilled_slots(fulfillments.get(name)) for name in ('a', 'b')], [1, 1])
+
+
+def test_marginal_gain():
+    def named(gains) -> list:
+        return sorted([(course.unique_name, gain) for course, gain in gains.items() if gain])
+
+    for name, schedule in bundled_schedules():
+        degree = schedule.degree
+        if degree.catalog is None:
+            continue
+        courses = schedule.courses()
+        base = degree.fulfillment(courses, cached=False)
+        candidates = sorted([course for course in degree.catalog.courses() if course not in courses], key=lambda course: course.unique_name)
+        gains = degree.marginal_gain(courses, candidates, base)
+        # without matches made before every template is matched against the candidates again
+        check(f'{name} gains read from the match table', named(gains), named(degree.marginal_gain(courses, candidates, base, dict())))
+
+        # a full fulfillment with the candidate may choose other wildcards and gain more, but never less
+        unfulfilled = total_unfulfilled_slots(base)
+        check(f'{name} candidates gaining more than a full fulfillment with them', [course.unique_name for course in candidates
+            if gains.get(course) > unfulfilled - total_unfulfilled_slots(degree.fulfillment(courses.union([course]), cached=False))], [])
+        check(f'{name} gains of taken courses', set(degree.marginal_gain(courses, courses, base).values()), {0})
+
+    # the catalog of the planner, candidates that gain are checked against a full fulfillment
+    logging.disable(logging.CRITICAL)
+    planner = Planner(io=Output(Output.OUT.NONE), enable_tensorflow=False, match_table_folder=None)
+    planner.import_data()
+    degree = planner.catalog.get_degree('computer science')
+    courses = set([planner.catalog.get_course(name) for name in ['csci 1200 data structures', 'csci 2300 introduction to algorithms', 'csci 4100 machine learning from data']])
+    base = degree.fulfillment(courses, cached=False)
+    candidates = sorted([course for course in planner.catalog.courses() if course not in courses], key=lambda course: course.unique_name)
+    gains = degree.marginal_gain(courses, candidates, base)
+    check('computer science gains read from the match table', named(gains), named(degree.marginal_gain(courses, candidates, base, dict())))
+    unfulfilled = total_unfulfilled_slots(base)
+    check('computer science candidates gaining more than a full fulfillment with them', [course.unique_name for course in candidates
+        if gains.get(course) and gains.get(course) > unfulfilled - total_unfulfilled_slots(degree.fulfillment(courses.union([course]), cached=False))], [])
+    logging.disable(logging.NOTSET)
+
+
+def test_rank_degrees():
+    logging.disable(logging.CRITICAL)
+    planner = Planner(io=Output(Output.OUT.NONE), enable_tensorflow=False, match_table_folder=None)
+    planner.import_data()
+    names = ['csci 1200 data structures', 'csci 2300 introduction to algorithms', 'csci 4100 machine learning from data', 'math 2010 multivariable calculus and matrix algebra']
+    courses = set([planner.catalog.get_course(name) for name in names]) - {None}
+
+    # a minor sharing templates with computer science, whose specifications are matched once for both
+    minor = Degree('computer science minor', planner.catalog)
+    for template in planner.catalog.get_degree('computer science').templates[:4]:
+        specifications = template.original_specifications if template.original_specifications is not None else template.specifications
+        minor.add_template(Template(template.name, list(specifications), template.replacement, template.courses_required))
+    planner.catalog.add_degree(minor)
+
+    ranking = planner.rank_degrees(names, io=Output(Output.OUT.NONE))
+    check('degrees ranked', sorted([entry.get('degree') for entry in ranking]), sorted([degree.name for degree in planner.catalog.degrees()]))
+    check('ranking order', [entry.get('degree') for entry in ranking], [entry.get('degree') for entry in sorted(ranking, key=lambda entry: (entry.get('unfulfilled'), -entry.get('filled'), entry.get('degree')))])
+    for entry in ranking:
+        fulfillment = planner.catalog.get_degree(entry.get('degree')).fulfillment(courses, cached=False)
+        check(f"{entry.get('degree')} (unfulfilled, filled) slots", (entry.get('unfulfilled'), entry.get('filled')), (total_unfulfilled_slots(fulfillment), total_filled_slots(fulfillment)))
+    check('ranking with 2 workers', planner.rank_degrees(courses, workers=2, io=Output(Output.OUT.NONE)), ranking)
+    logging.disable(logging.NOTSET)
+
+
+def test_match_table():
+    logging.disable(logging.CRITICAL)
+    folder = tempfile.mkdtemp()
+    try:
+        planner = Planner(io=Output(Output.OUT.NONE), enable_tensorflow=False, match_table_folder=folder)
+        check('default match table folder outside the package data', Planner(io=Output(Output.OUT.NONE), enable_tensorflow=False).match_table_folder.startswith(Output.DATA_FOLDER_PATH), False)
+        planner.import_data()
+        catalog = planner.catalog
+        degree = catalog.get_degree('computer science')
+        check('match tables compiled by importing', list(catalog.match_tables.keys()), [])
+
+        table = catalog.match_table(degree)
+        check('match table files after first use', os.listdir(folder), [f'{table.key}.json'])
+        check('match table of an unchanged catalog', catalog.match_table(degree) is table, True)
+        for template in degree.templates:
+            original = Template(template.name, list(template.original_specifications if template.original_specifications is not None else template.specifications))
+            check(f'{template.name} table matches', [(e.get_template().specifications, sorted([course.unique_name for course in e.get_fulfillment_set()])) for e in table.get_course_match(catalog, original)],
+                [(e.get_template().specifications, sorted([course.unique_name for course in e.get_fulfillment_set()])) for e in catalog.course_match(original)])
+        loaded = Match_Table.load(folder, table.key, {course.unique_name:course for course in catalog.courses()})
+        check('stored match table', loaded.matches, table.matches)
+
+        # keys only follow the attribute heads the templates test, unless a bracket builds the attribute
+        courses = [Course('c1', 'TEST', 1000)]
+        courses[0].add_attribute('bin.1')
+        test_degree = Degree('match table test')
+        test_degree.add_template(Template('bin', 'bin.1'))
+        key = match_table_key(courses, test_degree)
+        courses[0].add_attribute('other.1')
+        check('key after an untested attribute is added', match_table_key(courses, test_degree), key)
+        courses[0].add_attribute('bin.2')
+        check('key after a tested attribute is added', match_table_key(courses, test_degree) == key, False)
+        test_degree.add_template(Template('composite', '(bin.1)&bin.(1)'))
+        check('attribute built from a bracket is an attribute', 'Composite_Predicate' in [type(e).__name__ for e in test_degree.templates[1].get_predicate().attributes()], True)
+        key = match_table_key(courses, test_degree)
+        courses[0].add_attribute('unrelated.1')
+        check('key after any attribute is added to a degree with a composite attribute', match_table_key(courses, test_degree) == key, False)
+
+        # a folder that can't be written to keeps the table in memory only
+        blocker = os.path.join(folder, 'blocker')
+        open(blocker, 'w').close()
+        unwritable = Planner(io=Output(Output.OUT.NONE), enable_tensorflow=False, match_table_folder=os.path.join(blocker, 'match_tables'))
+        unwritable.import_data()
+        unwritable_table = unwritable.catalog.match_table(unwritable.catalog.get_degree('computer science'))
+        check('match table of an unwritable folder equal to the stored one', unwritable_table.matches == table.matches, True)
+        check('unwritable folder match table kept in memory', unwritable.catalog.match_table(unwritable.catalog.get_degree('computer science')) is unwritable_table, True)
+        table.store(folder)
+        check('temporary files left by storing', sorted([name for name in os.listdir(folder) if name.endswith('.tmp')]), [])
+    finally:
+        shutil.rmtree(folder)
+        logging.disable(logging.NOTSET)
+
+
+def test_sparse_graph():
+    # the same random operations on a dense and a sparse graph, everything read from them must be the same
+    for seed in range(30):
+        logs = list()
+        for sparse in (False, True):
+            rng = random.Random(seed)
+            graph = Graph([f'n{i}' for i in range(rng.randint(0, 8))], Random_Edge_Data_Gen(random.Random(seed)), sparse=sparse)
+            log = list()
+            for n in range(60):
+                k = rng.random()
+                nodes = sorted(graph, key=str)
+                if k < 0.15:
+                    graph.add_node(f'n{rng.randint(0, 12)}')
+                elif k < 0.25 and len(nodes):
+                    graph.remove_node(rng.choice(nodes))
+                elif k < 0.6 and len(nodes):
+                    graph.update_connection(rng.choice(nodes), rng.choice(nodes))
+                elif k < 0.7 and len(nodes):
+                    graph.remove_connection(rng.choice(nodes), rng.choice(nodes))
+                elif len(nodes):
+                    node = rng.choice(nodes)
+                    log.append((list(graph.outbound_connections(node)), list(graph.inbound_connections(node)), str(graph.bfs({node})), graph.edge_data(node, rng.choice(nodes)) or None))
+            log.append((list(graph.edge_items()), str(graph), len(graph), list(graph)))
+            logs.append(log)
+        check(f'random graph {seed} reads the same from a sparse graph ({len(logs[0])} reads)', logs[1] == logs[0], True)
+
+    for name, schedule in bundled_schedules():
+        for engine in FULFILLMENT_ENGINES:
+            schedule.degree.sparse_graphs = False
+            dense = schedule.degree.fulfillment(schedule.courses(), engine=engine, cached=False)
+            schedule.degree.sparse_graphs = True
+            sparse = schedule.degree.fulfillment(schedule.courses(), engine=engine, cached=False)
+            check(f'{name} {engine} engine fulfillment with sparse graphs', fulfillment_names(sparse), fulfillment_names(dense))
+
+
 def visualize_fulfillment():
     from degree_planner.io.visualization import Fulfillment_Visualizer
     Output.visualizers.update({'degree':Fulfillment_Visualizer()})
@@ -742,6 +1293,51 @@ def main():
             elif test_case == '6':
                 test_fulfillment6()
                 return
+            elif test_case == 'compact':
+                test_compact()
+                return
+            elif test_case == 'engines':
+                test_engines()
+                return
+            elif test_case == 'parallel':
+                test_parallel()
+                return
+            elif test_case == 'repair':
+                test_repair()
+                return
+            elif test_case == 'cache':
+                test_cache()
+                return
+            elif test_case == 'audit_many':
+                test_audit_many()
+                return
+            elif test_case == 'fulfillment_table':
+                test_fulfillment_table()
+                return
+            elif test_case == 'journal':
+                test_journal()
+                return
+            elif test_case == 'components':
+                test_components()
+                return
+            elif test_case == 'budget':
+                test_budget()
+                return
+            elif test_case == 'degree_set':
+                test_degree_set()
+                return
+            elif test_case == 'marginal_gain':
+                test_marginal_gain()
+                return
+            elif test_case == 'rank_degrees':
+                test_rank_degrees()
+                return
+            elif test_case == 'match_table':
+                test_match_table()
+                return
+            elif test_case == 'sparse_graph':
+                test_sparse_graph()
+                return
             elif test_case == 'recommender':
                 user_input = input('INPUT C TO RECOMPUTE CACHE, INPUT F TO DISABLE TENSORFLOW, then press enter to continue\n')
                 test_recommender('c' in user_input.casefold(), 'f' in user_input.casefold())
@@ -767,6 +1363,36 @@ def main():
         test_fulfillment5()
         input('press enter to continue')
         test_fulfillment6()
+        input('press enter to continue')
+        test_compact()
+        input('press enter to continue')
+        test_engines()
+        input('press enter to continue')
+        test_parallel()
+        input('press enter to continue')
+        test_repair()
+        input('press enter to continue')
+        test_cache()
+        input('press enter to continue')
+        test_audit_many()
+        input('press enter to continue')
+        test_fulfillment_table()
+        input('press enter to continue')
+        test_journal()
+        input('press enter to continue')
+        test_components()
+        input('press enter to continue')
+        test_budget()
+        input('press enter to continue')
+        test_degree_set()
+        input('press enter to continue')
+        test_marginal_gain()
+        input('press enter to continue')
+        test_rank_degrees()
+        input('press enter to continue')
+        test_match_table()
+        input('press enter to continue')
+        test_sparse_graph()
 
     tracemalloc.start()
     user_input = input('INPUT C TO RECOMPUTE CACHE, INPUT F TO DISABLE TENSORFLOW, then press enter to continue\n')